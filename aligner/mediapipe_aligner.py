@@ -1,7 +1,9 @@
 import cv2
 import numpy as np
-import mediapipe as mp
 import os
+from utils.lazy_import import lazy_import
+
+mp = lazy_import("mediapipe")
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 os.environ['TF_FORCE_GPU_ALLOW_GROWTH'] = 'true'
 class FaceAligner:
@@ -22,6 +24,10 @@ class FaceAligner:
             [70.7299, 92.2041]
         ], dtype=np.float32)
 
+    def warmup(self):
+        """Chạy FaceMesh một lần trên ảnh rỗng để nạp graph MediaPipe trước frame đầu tiên"""
+        self.face_mesh.process(np.zeros((112, 112, 3), dtype=np.uint8))
+
     def get_five_landmarks(self, image, bbox):
         x1, y1, x2, y2 = map(int, bbox)
         roi = image[y1:y2, x1:x2]
@@ -15,7 +15,9 @@ from torch.nn import (
     AdaptiveAvgPool2d,
     Sequential,
     Module,
+    Identity,
 )
+from torch.nn.utils.fusion import fuse_conv_bn_eval
 
 # pylint: disable=super-with-arguments, too-many-instance-attributes, unused-argument, redefined-builtin, too-few-public-methods
 
@@ -139,6 +141,16 @@ def MiniFASNetV1SE(
     )
 
 
+def _fold_conv_bn(module, conv_name, bn_name):
+    """Fold an eval-mode BatchNorm2d into the preceding conv (conv gets a bias) and drop the BN"""
+    conv = getattr(module, conv_name)
+    bn = getattr(module, bn_name)
+    if isinstance(bn, Identity):
+        return
+    setattr(module, conv_name, fuse_conv_bn_eval(conv, bn))
+    setattr(module, bn_name, Identity())
+
+
 class Flatten(Module):
     def forward(self, input):
         return input.view(input.size(0), -1)
@@ -165,6 +177,9 @@ class Conv_block(Module):
         x = self.prelu(x)
         return x
 
+    def fuse(self):
+        _fold_conv_bn(self, "conv", "bn")
+
 
 class Linear_block(Module):
     def __init__(self, in_c, out_c, kernel=(1, 1), stride=(1, 1), padding=(0, 0), groups=1):
@@ -185,6 +200,9 @@ class Linear_block(Module):
         x = self.bn(x)
         return x
 
+    def fuse(self):
+        _fold_conv_bn(self, "conv", "bn")
+
 
 class Depth_Wise(Module):
     def __init__(
@@ -275,6 +293,10 @@ class SEModule(Module):
         x = self.sigmoid(x)
         return module_input * x
 
+    def fuse(self):
+        _fold_conv_bn(self, "fc1", "bn1")
+        _fold_conv_bn(self, "fc2", "bn2")
+
 
 class Residual(Module):
     def __init__(self, c1, c2, c3, num_block, groups, kernel=(3, 3), stride=(1, 1), padding=(1, 1)):
@@ -465,6 +487,37 @@ class MiniFASNet(Module):
         out = self.prob(out)
         return out
 
+    @torch.no_grad()
+    def optimize_for_inference(self):
+        """
+        Rewrite the network in place for eval-only use, the logits stay the same up to float rounding:
+        - every BatchNorm2d is folded into its conv (Conv_block, Linear_block, SEModule)
+        - Dropout is removed
+        - linear -> BatchNorm1d -> prob is precomputed into one Linear with bias
+        The model can no longer be trained or load the original state dict afterwards.
+        """
+        self.eval()
+        for module in self.modules():
+            if isinstance(module, (Conv_block, Linear_block, SEModule)):
+                module.fuse()
+
+        if isinstance(self.bn, BatchNorm1d):
+            # bn(z) = z * scale + shift, với z = linear(x) (hoặc x khi embedding_size == 512)
+            scale = self.bn.weight / torch.sqrt(self.bn.running_var + self.bn.eps)
+            shift = self.bn.bias - self.bn.running_mean * scale
+            weight = self.prob.weight * scale
+            if self.embedding_size != 512:
+                weight = weight @ self.linear.weight
+            head = Linear(weight.shape[1], weight.shape[0], bias=True).to(weight.device)
+            head.weight.copy_(weight)
+            head.bias.copy_(self.prob.weight @ shift)
+
+            self.linear = Identity()
+            self.bn = Identity()
+            self.prob = head
+        self.drop = Identity()
+        return self
+
 
 class MiniFASNetSE(MiniFASNet):
     def __init__(
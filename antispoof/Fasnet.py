@@ -1,11 +1,14 @@
 # built-in dependencies
-from typing import Union
+import functools
+from typing import List, Tuple, Union
 
 # 3rd party dependencies
 import cv2
 import os
 import numpy as np
 
+from . import backends
+
 # pylint: disable=line-too-long, too-few-public-methods, nested-min-max
 # CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 # FIRST_WEIGHTS_PATH = os.path.join(CURRENT_DIR, "./model/2.7_80x80_MiniFASNetV2.pth")
@@ -19,86 +22,114 @@ class Fasnet:
     Ref: github.com/minivision-ai/Silent-Face-Anti-Spoofing/blob/master/src/model_lib/MiniFASNet.py
     """
 
-    def __init__(self, first_model=None, second_model=None, force_cpu=False):
-        # pytorch is an opitonal dependency, enforce it to be installed if class imported
-        try:
-            import torch
-        except Exception as err:
-            raise ValueError(
-                "You must install torch with `pip install pytorch` command to use face anti spoofing module"
-            ) from err
-
-        # Allow forcing CPU execution regardless of CUDA availability
-        if force_cpu:
-            device = torch.device("cpu")
-        else:
-            try:
-                # Test CUDA compatibility before committing to it
-                if torch.cuda.is_available():
-                    device = torch.device("cuda:0")
-                    # Create a small test tensor to check if CUDA works
-                    test_tensor = torch.zeros((1, 3, 80, 80), device=device)
-                    _ = test_tensor + 1  # Simple operation to verify CUDA works
-                else:
-                    device = torch.device("cpu")
-            except Exception as e:
-                print(f"⚠️ CUDA error detected: {str(e)}")
-                print("⚠️ Falling back to CPU for anti-spoofing")
-                device = torch.device("cpu")
-        
-        self.device = device
-        print(f"Running Fasnet on {device}")
-
+    def __init__(self, first_model=None, second_model=None, force_cpu=False, backend="eager",
+                 quantization=None, calibration_dir=None, optimize=False,
+                 cascade=False, uncertainty_band=(0.1, 0.9), audit_interval=100, log_interval=500):
+        """
+        Args:
+            first_model (str): MiniFASNetV2 weights (.pth) for the 2.7 scale crop
+            second_model (str): MiniFASNetV1SE weights (.pth) for the 4.0 scale crop
+            force_cpu (bool): never use CUDA for the torch based backends
+            backend (str): one of "eager", "torchscript", "onnx", "tflite" or "auto".
+                Exported artefacts are looked up next to the .pth files (see antispoof/export.py);
+                when they are missing or their runtime is not installed, eager PyTorch is used.
+            quantization (str): None or "dynamic" int8 post-training quantization of the eager models
+                (see antispoof/quantization.py; static int8 is experimental and disabled). The models are
+                checked against fp32 and rejected with an error when they diverge. Quantized models
+                always run on CPU.
+            calibration_dir (str): folder with real/ and fake/ face crops, used as the inputs of the
+                quantization parity check (random crops otherwise)
+            optimize (bool): fold BatchNorm/Dropout/head of the eager models with
+                MiniFASNet.optimize_for_inference (same logits within ~1e-6, fewer ops; opt-in because
+                the CPU speedup is within noise, compare with `python -m antispoof.export --check-optimized`)
+            cascade (bool): run the cheaper MiniFASNetV2 first and the MiniFASNetV1SE model only for faces
+                whose first-stage real probability falls inside uncertainty_band
+            uncertainty_band (tuple): (low, high) real probability range treated as uncertain
+            audit_interval (int): every audit_interval-th cascaded call runs both models on all faces
+                and counts how often the cascade would have decided differently (0 disables audits)
+            log_interval (int): print the cascade stage statistics every log_interval faces (0 disables)
+        """
         # download pre-trained models if not installed yet
         first_model_weight_file = first_model
 
         second_model_weight_file = second_model
-        # guarantees Fasnet imported and torch installed
-        from . import FasNetBackbone
-        # Fasnet will use 2 distinct models to predict, then it will find the sum of predictions
-        # to make a final prediction
-
-        first_model = FasNetBackbone.MiniFASNetV2(conv6_kernel=(5, 5)).to(device)
-        second_model = FasNetBackbone.MiniFASNetV1SE(conv6_kernel=(5, 5)).to(device)
-
-        # load model weight for first model
-        state_dict = torch.load(first_model_weight_file, map_location=device)
-        keys = iter(state_dict)
-        first_layer_name = keys.__next__()
-
-        if first_layer_name.find("module.") >= 0:
-            from collections import OrderedDict
-
-            new_state_dict = OrderedDict()
-            for key, value in state_dict.items():
-                name_key = key[7:]
-                new_state_dict[name_key] = value
-            first_model.load_state_dict(new_state_dict)
-        else:
-            first_model.load_state_dict(state_dict)
 
-        # load model weight for second model
-        state_dict = torch.load(second_model_weight_file, map_location=device)
-        keys = iter(state_dict)
-        first_layer_name = keys.__next__()
+        self.backend = backends.resolve_backend(backend, [first_model_weight_file, second_model_weight_file])
 
-        if first_layer_name.find("module.") >= 0:
-            from collections import OrderedDict
+        if quantization and self.backend != "eager":
+            print(f"⚠️ Quantization only applies to the eager backend, ignored for {self.backend}")
+            quantization = None
+        self.quantization = quantization
 
-            new_state_dict = OrderedDict()
-            for key, value in state_dict.items():
-                name_key = key[7:]
-                new_state_dict[name_key] = value
-            second_model.load_state_dict(new_state_dict)
+        # onnx and tflite artefacts run without torch
+        if self.backend in ("onnx", "tflite"):
+            self.device = None
+            self.first_model = None
+            self.second_model = None
+            self.first_backend = backends.load_backend(self.backend, first_model_weight_file)
+            self.second_backend = backends.load_backend(self.backend, second_model_weight_file)
         else:
-            second_model.load_state_dict(state_dict)
-
-        # evaluate models
-        _ = first_model.eval()
-        _ = second_model.eval()
-
-        self.first_model = first_model
-        self.second_model = second_model
+            # int8 kernels chỉ chạy trên CPU
+            self.device = _select_device(force_cpu or bool(self.quantization))
+
+            if self.backend == "torchscript":
+                self.first_backend = backends.load_backend(self.backend, first_model_weight_file, self.device)
+                self.second_backend = backends.load_backend(self.backend, second_model_weight_file, self.device)
+            else:
+                # Fasnet will use 2 distinct models to predict, then it will find the sum of predictions
+                # to make a final prediction
+                self.first_backend = backends.EagerBackend(
+                    load_model("MiniFASNetV2", first_model_weight_file, self.device, optimize), self.device
+                )
+                self.second_backend = backends.EagerBackend(
+                    load_model("MiniFASNetV1SE", second_model_weight_file, self.device, optimize), self.device
+                )
+
+                if quantization:
+                    from . import quantization as fas_quantization
+
+                    # raises when the mode is unknown/disabled or the int8 models fail the fp32 parity gate
+                    first_quantized, second_quantized = fas_quantization.quantize_models(
+                        self.first_backend.model, self.second_backend.model, quantization, calibration_dir
+                    )
+                    self.first_backend = backends.EagerBackend(first_quantized, self.device)
+                    self.second_backend = backends.EagerBackend(second_quantized, self.device)
+
+            self.first_model = self.first_backend.model
+            self.second_model = self.second_backend.model
+
+        print(f"Running Fasnet with {self.backend} backend" + (f" on {self.device}" if self.device else "")
+              + (f" ({self.quantization} int8)" if self.quantization else ""))
+
+        self.cascade = cascade
+        self.uncertainty_band = uncertainty_band
+        self.audit_interval = audit_interval
+        self.log_interval = log_interval
+        self._cascade_calls = 0
+        self._cascade_counts = {
+            "faces": 0,
+            "first_stage_only": 0,
+            "second_stage": 0,
+            "audited_faces": 0,
+            "audit_disagreements": 0,
+        }
+        self._next_log = log_interval
+
+        # crop/input buffers shared between calls, grown on demand in _ensure_buffers
+        self._first_crops = None
+        self._second_crops = None
+        self._first_input = None
+        self._second_input = None
+
+    def warmup(self):
+        """
+        Run both models once on a blank batch so lazy allocations (CUDA context, interpreter
+        tensors, ORT session) happen at startup; the cascade counters are left untouched
+        """
+        self._ensure_buffers(1)
+        blank = np.zeros((1, 3, 80, 80), dtype=np.float32)
+        self.first_backend.predict(blank)
+        self.second_backend.predict(blank)
 
     def analyze(self, img: np.ndarray, facial_area: Union[list, tuple], force_cpu=False):
         """
@@ -110,48 +141,19 @@ class Fasnet:
         Returns:
             result (tuple): a result tuple consisting of is_real and score
         """
-        import torch
-        import torch.nn.functional as F
-        
-        # Handle force_cpu parameter
+        # Handle force_cpu parameter (only meaningful for the torch based backends)
         original_device = self.device
-        if force_cpu and self.device.type != "cpu":
-            temp_device = torch.device("cpu")
+        move_to_cpu = force_cpu and self.device is not None and self.device.type != "cpu"
+        if move_to_cpu:
+            import torch
+
             # Temporarily move models to CPU
-            self.first_model = self.first_model.to(temp_device)
-            self.second_model = self.second_model.to(temp_device)
-        else:
-            temp_device = self.device
+            self._move_backends(torch.device("cpu"))
         
         try:
-            x, y, w, h = facial_area
-            first_img = crop(img, (x, y, w, h), 2.7, 80, 80)
-            second_img = crop(img, (x, y, w, h), 4, 80, 80)
-
-            test_transform = Compose(
-                [
-                    ToTensor(),
-                ]
-            )
-
-            first_img = test_transform(first_img)
-            first_img = first_img.unsqueeze(0).to(temp_device)
-
-            second_img = test_transform(second_img)
-            second_img = second_img.unsqueeze(0).to(temp_device)
+            prediction = self._predict(img, [facial_area])
 
-            with torch.no_grad():
-                first_result = self.first_model.forward(first_img)
-                first_result = F.softmax(first_result).cpu().numpy()
-
-                second_result = self.second_model.forward(second_img)
-                second_result = F.softmax(second_result).cpu().numpy()
-
-            prediction = np.zeros((1, 3))
-            prediction += first_result
-            prediction += second_result
-
-            label = np.argmax(prediction)
+            label = np.argmax(prediction[0])
             is_real = True if label == 1 else False  # pylint: disable=simplifiable-if-expression
             score = prediction[0][label] / 2
 
@@ -159,51 +161,270 @@ class Fasnet:
         
         finally:
             # Restore models to original device if they were moved
-            if force_cpu and original_device.type != "cpu":
-                self.first_model = self.first_model.to(original_device)
-                self.second_model = self.second_model.to(original_device)
+            if move_to_cpu:
+                self._move_backends(original_device)
 
+    def analyze_batch(self, img: np.ndarray, facial_areas: List[Union[list, tuple]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Analyze all faces of one frame, running each model once for the whole batch
+        Args:
+            img (np.ndarray): pre loaded image
+            facial_areas (list): facial rectangle areas, each with x, y, w, h respectively
+        Returns:
+            result (tuple): per-face is_real (bool array) and score (float array)
+        """
+        if len(facial_areas) == 0:
+            return np.zeros(0, dtype=bool), np.zeros(0, dtype=np.float32)
 
-# subsdiary classes and functions
+        prediction = self._predict(img, facial_areas)
+        labels = np.argmax(prediction, axis=1)
+        is_real = labels == 1
+        scores = prediction[np.arange(len(labels)), labels] / 2
+        return is_real, scores
 
+    def real_probabilities(self, img: np.ndarray, facial_areas: List[Union[list, tuple]]) -> np.ndarray:
+        """
+        Probability that each face is real (class 1), averaged over the two models
+        Args:
+            img (np.ndarray): pre loaded image
+            facial_areas (list): facial rectangle areas, each with x, y, w, h respectively
+        Returns:
+            probabilities (np.ndarray): float array with one value per face
+        """
+        if len(facial_areas) == 0:
+            return np.zeros(0, dtype=np.float32)
+        return self._predict(img, facial_areas)[:, 1] / 2
+
+    def crop_faces(self, img: np.ndarray, facial_areas: List[Union[list, tuple]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Crop every face at the 2.7 and 4.0 scales used by the two models, so that crops from
+        several frames (cameras) can later be scored together with real_probabilities_from_crops
+        Args:
+            img (np.ndarray): pre loaded image
+            facial_areas (list): facial rectangle areas, each with x, y, w, h respectively
+        Returns:
+            crops (tuple): first and second model crops, uint8 arrays of shape (N, 80, 80, 3)
+        """
+        count = len(facial_areas)
+        first_crops = np.empty((count, 80, 80, 3), dtype=np.uint8)
+        second_crops = np.empty((count, 80, 80, 3), dtype=np.uint8)
+        for i, facial_area in enumerate(facial_areas):
+            crop(img, facial_area, 2.7, 80, 80, dst=first_crops[i])
+            crop(img, facial_area, 4, 80, 80, dst=second_crops[i])
+        return first_crops, second_crops
+
+    def real_probabilities_from_crops(self, first_crops: np.ndarray, second_crops: np.ndarray) -> np.ndarray:
+        """
+        Same as real_probabilities but for crops made by crop_faces
+        Args:
+            first_crops (np.ndarray): 2.7 scale crops, shape (N, 80, 80, 3)
+            second_crops (np.ndarray): 4.0 scale crops, shape (N, 80, 80, 3)
+        Returns:
+            probabilities (np.ndarray): float array with one value per face
+        """
+        count = len(first_crops)
+        if count == 0:
+            return np.zeros(0, dtype=np.float32)
+        self._ensure_buffers(count)
+
+        first_input = self._crops_to_input(first_crops, self._first_input)
 
-def to_tensor(pic):
-    """Convert a ``numpy.ndarray`` to tensor.
+        def second_input(indices):
+            return self._crops_to_input(second_crops[indices], self._second_input)
 
-    See ``ToTensor`` for more details.
+        return self._predict_inputs(first_input, second_input)[:, 1] / 2
 
-    Args:
-        pic (PIL Image or numpy.ndarray): Image to be converted to tensor.
+    def _predict(self, img: np.ndarray, facial_areas) -> np.ndarray:
+        """
+        Crop every face at both scales into the shared buffers and return the
+        summed softmax of the two models with shape (N, 3).
+        In cascade mode, faces decided by the first model alone get twice its softmax instead.
+        """
+        count = len(facial_areas)
+        self._ensure_buffers(count)
 
-    Returns:
-        Tensor: Converted image.
+        first_input = self._prepare_inputs(img, facial_areas, 2.7, self._first_crops, self._first_input)
+
+        # Crop 4.0 chỉ được tạo cho các khuôn mặt cần model thứ hai
+        def second_input(indices):
+            areas = [facial_areas[i] for i in indices]
+            return self._prepare_inputs(img, areas, 4, self._second_crops, self._second_input)
+
+        return self._predict_inputs(first_input, second_input)
+
+    def _predict_inputs(self, first_input, second_input):
+        """
+        Args:
+            first_input: NCHW float32 input of the first model
+            second_input: callable mapping face indices to the NCHW input of the second model
+        """
+        first_result = softmax(self.first_backend.predict(first_input))
+        if not self.cascade:
+            return first_result + softmax(self.second_backend.predict(second_input(np.arange(len(first_input)))))
+
+        return self._predict_cascade(first_result, second_input)
+
+    def _predict_cascade(self, first_result, second_input):
+        count = len(first_result)
+        low, high = self.uncertainty_band
+        real_prob = first_result[:, 1]
+        uncertain = (real_prob > low) & (real_prob < high)
+
+        self._cascade_calls += 1
+        audit = self.audit_interval > 0 and self._cascade_calls % self.audit_interval == 0
+
+        # Mặc định dùng kết quả model thứ nhất (x2 để giữ cùng thang điểm với tổng hai softmax)
+        prediction = first_result * 2
+        if audit:
+            # Kiểm tra định kỳ: chạy cả hai model cho mọi khuôn mặt và dùng kết quả đầy đủ
+            full = first_result + softmax(self.second_backend.predict(second_input(np.arange(count))))
+            prediction[uncertain] = full[uncertain]
+            self._cascade_counts["audited_faces"] += count
+            self._cascade_counts["audit_disagreements"] += int(
+                np.sum(prediction.argmax(axis=1) != full.argmax(axis=1))
+            )
+            prediction = full
+        elif uncertain.any():
+            indices = np.flatnonzero(uncertain)
+            prediction[indices] = first_result[indices] + softmax(self.second_backend.predict(second_input(indices)))
+
+        second_stage = count if audit else int(uncertain.sum())
+        self._cascade_counts["faces"] += count
+        self._cascade_counts["second_stage"] += second_stage
+        self._cascade_counts["first_stage_only"] += count - second_stage
+
+        if self.log_interval and self._cascade_counts["faces"] >= self._next_log:
+            self._next_log += self.log_interval
+            self._log_cascade_stats()
+        return prediction
+
+    def _prepare_inputs(self, img, facial_areas, scale, crops, inputs):
+        """Crop faces at `scale` into the uint8 buffer and convert to the NCHW float32 input buffer"""
+        count = len(facial_areas)
+        crops = crops[:count]
+        for i, (x, y, w, h) in enumerate(facial_areas):
+            crop(img, (x, y, w, h), scale, 80, 80, dst=crops[i])
+        return self._crops_to_input(crops, inputs)
+
+    @staticmethod
+    def _crops_to_input(crops, inputs):
+        """HWC uint8 crops -> NCHW float32 input buffer, values stay in 0-255 (the models expect unscaled pixels)"""
+        inputs = inputs[:len(crops)]
+        np.copyto(inputs, crops.transpose(0, 3, 1, 2))
+        return inputs
+
+    def cascade_stats(self) -> dict:
+        """Per-stage counters of the cascade mode plus the derived rates"""
+        stats = dict(self._cascade_counts)
+        faces = stats["faces"]
+        stats["first_stage_rate"] = stats["first_stage_only"] / faces if faces else 0.0
+        stats["second_stage_rate"] = stats["second_stage"] / faces if faces else 0.0
+        # Số lần chạy model trung bình cho mỗi khuôn mặt (2.0 khi không dùng cascade)
+        stats["models_per_face"] = 1.0 + stats["second_stage_rate"]
+        audited = stats["audited_faces"]
+        stats["audit_disagreement_rate"] = stats["audit_disagreements"] / audited if audited else 0.0
+        return stats
+
+    def _log_cascade_stats(self):
+        stats = self.cascade_stats()
+        print(f"🛡️ Antispoof cascade: {stats['faces']} faces, "
+              f"{stats['first_stage_rate']:.1%} first stage only, {stats['second_stage_rate']:.1%} second stage, "
+              f"{stats['models_per_face']:.2f} models/face, "
+              f"audit disagreement {stats['audit_disagreements']}/{stats['audited_faces']}")
+
+    def _ensure_buffers(self, count):
+        """(Re)allocate crop and input buffers when a frame has more faces than before"""
+        if self._first_crops is not None and len(self._first_crops) >= count:
+            return
+        capacity = max(count, 4)
+        self._first_crops = np.empty((capacity, 80, 80, 3), dtype=np.uint8)
+        self._second_crops = np.empty((capacity, 80, 80, 3), dtype=np.uint8)
+        self._first_input = np.empty((capacity, 3, 80, 80), dtype=np.float32)
+        self._second_input = np.empty((capacity, 3, 80, 80), dtype=np.float32)
+
+    def _move_backends(self, device):
+        self.first_backend.to(device)
+        self.second_backend.to(device)
+        self.first_model = self.first_backend.model
+        self.second_model = self.second_backend.model
+        self.device = device
+
+
+def _select_device(force_cpu=False):
+    # pytorch is an opitonal dependency, enforce it to be installed if class imported
+    try:
+        import torch
+    except Exception as err:
+        raise ValueError(
+            "You must install torch with `pip install pytorch` command to use face anti spoofing module"
+        ) from err
+
+    # Allow forcing CPU execution regardless of CUDA availability
+    if force_cpu or not _cuda_usable():
+        return torch.device("cpu")
+    return torch.device("cuda:0")
+
+
+@functools.lru_cache(maxsize=None)
+def _cuda_usable() -> bool:
+    """Probe CUDA once per process, every Fasnet instance reuses the result"""
+    import torch
+
+    try:
+        # Test CUDA compatibility before committing to it
+        if torch.cuda.is_available():
+            # Create a small test tensor to check if CUDA works
+            test_tensor = torch.zeros((1, 3, 80, 80), device=torch.device("cuda:0"))
+            _ = test_tensor + 1  # Simple operation to verify CUDA works
+            return True
+        return False
+    except Exception as e:
+        print(f"⚠️ CUDA error detected: {str(e)}")
+        print("⚠️ Falling back to CPU for anti-spoofing")
+        return False
+
+
+def load_model(model_name: str, weight_file: str, device, optimize=False):
+    """
+    Build MiniFASNetV2 or MiniFASNetV1SE and load its .pth weights in eval mode,
+    optionally folded for inference with MiniFASNet.optimize_for_inference
     """
     import torch
 
-    # handle numpy array
-    # IR image channel=1: modify by lzc --> 20190730
-    if pic.ndim == 2:
-        pic = pic.reshape((pic.shape[0], pic.shape[1], 1))
+    # guarantees Fasnet imported and torch installed
+    from . import FasNetBackbone
 
-    img = torch.from_numpy(pic.transpose((2, 0, 1)))
-    # backward compatibility
-    # return img.float().div(255)  modify by zkx
-    return img.float()
+    model = getattr(FasNetBackbone, model_name)(conv6_kernel=(5, 5)).to(device)
 
+    # load model weight
+    state_dict = torch.load(weight_file, map_location=device)
+    keys = iter(state_dict)
+    first_layer_name = keys.__next__()
 
-class Compose:
-    def __init__(self, transforms):
-        self.transforms = transforms
+    if first_layer_name.find("module.") >= 0:
+        from collections import OrderedDict
 
-    def __call__(self, img):
-        for t in self.transforms:
-            img = t(img)
-        return img
+        new_state_dict = OrderedDict()
+        for key, value in state_dict.items():
+            name_key = key[7:]
+            new_state_dict[name_key] = value
+        model.load_state_dict(new_state_dict)
+    else:
+        model.load_state_dict(state_dict)
 
+    # evaluate model
+    _ = model.eval()
+    if optimize:
+        model.optimize_for_inference()
+    return model
 
-class ToTensor:
-    def __call__(self, pic):
-        return to_tensor(pic)
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+# subsdiary classes and functions
 
 
 def _get_new_box(src_w, src_h, bbox, scale):
@@ -234,9 +455,9 @@ def _get_new_box(src_w, src_h, bbox, scale):
     return int(left_top_x), int(left_top_y), int(right_bottom_x), int(right_bottom_y)
 
 
-def crop(org_img, bbox, scale, out_w, out_h):
+def crop(org_img, bbox, scale, out_w, out_h, dst=None):
     src_h, src_w, _ = np.shape(org_img)
     left_top_x, left_top_y, right_bottom_x, right_bottom_y = _get_new_box(src_w, src_h, bbox, scale)
     img = org_img[left_top_y : right_bottom_y + 1, left_top_x : right_bottom_x + 1]
-    dst_img = cv2.resize(img, (out_w, out_h))
+    dst_img = cv2.resize(img, (out_w, out_h), dst=dst)
     return dst_img
\ No newline at end of file
@@ -0,0 +1,213 @@
+# Runtime backends for the MiniFASNet anti-spoofing models.
+# Every backend takes a float32 NCHW batch (values 0-255) and returns raw logits with shape (N, num_classes).
+# Only the eager and TorchScript backends need torch; ONNX and TFLite artefacts produced by
+# antispoof/export.py run on onnxruntime / tflite_runtime so the kiosk does not have to import torch.
+
+# built-in dependencies
+import os
+import platform
+
+# 3rd party dependencies
+import numpy as np
+
+# pylint: disable=import-outside-toplevel
+
+BACKENDS = ("eager", "torchscript", "onnx", "tflite")
+
+# file extension of the exported artefact for each backend, next to the .pth weights
+ARTEFACT_EXTENSIONS = {
+    "torchscript": ".pt",
+    "onnx": ".onnx",
+    "tflite": ".tflite",
+}
+
+# preference order used by backend="auto"
+AUTO_ORDER = ("tflite", "onnx", "torchscript", "eager")
+
+
+def artefact_path(weight_file: str, backend: str) -> str:
+    """Path of the exported artefact for a .pth weight file, e.g. model/x.pth -> model/x.onnx"""
+    if backend == "eager":
+        return weight_file
+    return os.path.splitext(weight_file)[0] + ARTEFACT_EXTENSIONS[backend]
+
+
+def runtime_available(backend: str) -> bool:
+    """Check whether the runtime library needed by a backend can be imported"""
+    try:
+        if backend in ("eager", "torchscript"):
+            import torch  # noqa: F401
+        elif backend == "onnx":
+            import onnxruntime  # noqa: F401
+        elif backend == "tflite":
+            _tflite_interpreter()
+        else:
+            return False
+    except Exception:
+        return False
+    return True
+
+
+def _tflite_interpreter():
+    # same runtime selection as detector/ultralight.py and embedder/mobilefacenet_embedder.py
+    if platform.system() == "Windows":
+        import tensorflow as tf
+
+        return tf.lite.Interpreter
+    import tflite_runtime.interpreter as tflite
+
+    return tflite.Interpreter
+
+
+class EagerBackend:
+    name = "eager"
+
+    def __init__(self, model, device):
+        self.model = model
+        self.device = device
+
+    def to(self, device):
+        self.model = self.model.to(device)
+        self.device = device
+        return self
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        import torch
+
+        with torch.inference_mode():
+            tensor = torch.from_numpy(batch)
+            if self.device.type != "cpu":
+                tensor = tensor.to(self.device)
+            return self.model(tensor).cpu().numpy()
+
+
+class TorchScriptBackend(EagerBackend):
+    name = "torchscript"
+
+    def __init__(self, path, device):
+        import torch
+
+        model = torch.jit.load(path, map_location=device)
+        model.eval()
+        super().__init__(model, device)
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, path):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(
+            path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+    def to(self, device):
+        return self
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class TFLiteBackend:
+    name = "tflite"
+
+    def __init__(self, path):
+        self.interpreter = _tflite_interpreter()(model_path=path)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()
+        self.output_details = self.interpreter.get_output_details()
+
+        shape = self.input_details[0]["shape"]
+        # onnx2tf converts the graph to NHWC, a hand-made model may keep NCHW
+        self.channels_last = int(shape[-1]) == 3
+        self.sample_shape = tuple(int(dim) for dim in shape[1:])
+        self._batch_size = int(shape[0])
+        self._dynamic_batch = True
+
+    def to(self, device):
+        return self
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        if self.channels_last:
+            batch = np.ascontiguousarray(batch.transpose(0, 2, 3, 1))
+
+        count = len(batch)
+        if self._resize_batch(count):
+            return self._invoke(batch)
+
+        # fixed batch model: run faces one by one
+        return np.concatenate([self._invoke(batch[i : i + 1]) for i in range(count)], axis=0)
+
+    def _invoke(self, batch):
+        self.interpreter.set_tensor(self.input_details[0]["index"], batch)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output_details[0]["index"]).copy()
+
+    def _resize_batch(self, batch_size):
+        if batch_size == self._batch_size:
+            return True
+        if not self._dynamic_batch:
+            return False
+        try:
+            self.interpreter.resize_tensor_input(
+                self.input_details[0]["index"], (batch_size,) + self.sample_shape
+            )
+            self.interpreter.allocate_tensors()
+            self._batch_size = batch_size
+            return True
+        except Exception as e:
+            print(f"⚠️ Anti-spoofing TFLite model has a fixed batch size ({e}), running faces one by one")
+            self._dynamic_batch = False
+            self.interpreter.resize_tensor_input(
+                self.input_details[0]["index"], (1,) + self.sample_shape
+            )
+            self.interpreter.allocate_tensors()
+            self._batch_size = 1
+            return False
+
+
+def load_backend(backend: str, weight_file: str, device=None):
+    """Load an exported artefact for a non-eager backend"""
+    path = artefact_path(weight_file, backend)
+    if backend == "torchscript":
+        return TorchScriptBackend(path, device)
+    if backend == "onnx":
+        return OnnxBackend(path)
+    if backend == "tflite":
+        return TFLiteBackend(path)
+    raise ValueError(f"Unknown anti-spoofing backend: {backend}")
+
+
+def resolve_backend(backend: str, weight_files) -> str:
+    """
+    Pick the backend to use for the given weight files.
+    backend="auto" takes the first entry of AUTO_ORDER whose artefacts exist and whose runtime
+    is installed; an explicit backend falls back to eager when that is not the case.
+    """
+    if backend == "eager":
+        return "eager"
+
+    candidates = AUTO_ORDER if backend == "auto" else (backend,)
+    for candidate in candidates:
+        if candidate not in BACKENDS:
+            raise ValueError(f"Unknown anti-spoofing backend: {candidate}")
+        if candidate == "eager":
+            return "eager"
+        paths = [artefact_path(weight_file, candidate) for weight_file in weight_files]
+        missing = [path for path in paths if not os.path.exists(path)]
+        if missing:
+            if backend != "auto":
+                print(f"⚠️ Missing {candidate} artefact(s): {', '.join(missing)}")
+            continue
+        if not runtime_available(candidate):
+            if backend != "auto":
+                print(f"⚠️ Runtime for the {candidate} backend is not installed")
+            continue
+        return candidate
+
+    print("⚠️ Falling back to eager PyTorch anti-spoofing models")
+    return "eager"
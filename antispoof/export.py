@@ -0,0 +1,225 @@
+# Export the MiniFASNet anti-spoofing models to TorchScript, ONNX or TFLite so the kiosk
+# can run them without eager PyTorch (see the `backend` argument of Fasnet).
+#
+# Usage:
+#   python -m antispoof.export --format onnx
+#   python -m antispoof.export --format tflite --verify
+#   python -m antispoof.export --verify-only --format onnx
+#   python -m antispoof.export --check-optimized
+#   python -m antispoof.export --self-test         # CI: export + parity + folding checks, exits 1 on failure
+#
+# Artefacts are written next to the .pth weights with the same file name and the backend's
+# extension (.pt, .onnx, .tflite), which is where Fasnet looks for them.
+
+# built-in dependencies
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+# 3rd party dependencies
+import numpy as np
+
+from . import backends
+from .Fasnet import Fasnet, load_model
+
+# pylint: disable=import-outside-toplevel
+
+DEFAULT_FIRST_MODEL = os.path.join("model", "2.7_80x80_MiniFASNetV2.pth")
+DEFAULT_SECOND_MODEL = os.path.join("model", "4_0_0_80x80_MiniFASNetV1SE.pth")
+INPUT_SHAPE = (1, 3, 80, 80)
+
+
+def export_torchscript(model, path):
+    import torch
+
+    example = torch.zeros(INPUT_SHAPE)
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example)
+        frozen = torch.jit.freeze(traced.eval())
+    frozen.save(path)
+
+
+def export_onnx(model, path, opset=11):
+    import torch
+
+    example = torch.zeros(INPUT_SHAPE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            example,
+            path,
+            input_names=["input"],
+            output_names=["logits"],
+            dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+
+
+def export_tflite(model, path):
+    """ONNX -> TFLite through onnx2tf (`pip install onnx2tf`), the converted graph is NHWC"""
+    try:
+        import onnx2tf
+    except Exception as err:
+        raise ValueError("TFLite export needs onnx2tf, install it with `pip install onnx2tf`") from err
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        onnx_path = os.path.join(work_dir, "model.onnx")
+        export_onnx(model, onnx_path)
+        onnx2tf.convert(input_onnx_file_path=onnx_path, output_folder_path=work_dir, non_verbose=True)
+        shutil.move(os.path.join(work_dir, "model_float32.tflite"), path)
+
+
+EXPORTERS = {
+    "torchscript": export_torchscript,
+    "onnx": export_onnx,
+    "tflite": export_tflite,
+}
+
+
+def export(fmt, first_model=DEFAULT_FIRST_MODEL, second_model=DEFAULT_SECOND_MODEL):
+    """Fold (optimize_for_inference) and export both models, returns the written artefact paths"""
+    import torch
+
+    device = torch.device("cpu")
+    written = []
+    for model_name, weight_file in (("MiniFASNetV2", first_model), ("MiniFASNetV1SE", second_model)):
+        model = load_model(model_name, weight_file, device, optimize=True)
+        path = backends.artefact_path(weight_file, fmt)
+        EXPORTERS[fmt](model, path)
+        print(f"✅ Exported {model_name} to {path}")
+        written.append(path)
+    return written
+
+
+def verify_parity(fmt, first_model=DEFAULT_FIRST_MODEL, second_model=DEFAULT_SECOND_MODEL,
+                  samples=32, atol=1e-3, seed=0):
+    """
+    Run the same random crops through the original eager models and the exported backend and compare
+    the summed softmax and the real/fake decisions. Returns True when both agree within atol.
+    """
+    # Reference is the original (unfolded) eager model, so the check covers folding as well as export
+    eager = Fasnet(first_model, second_model, force_cpu=True, backend="eager", optimize=False)
+    exported = Fasnet(first_model, second_model, force_cpu=True, backend=fmt)
+    if exported.backend != fmt:
+        print(f"❌ Could not load the {fmt} artefacts, nothing to compare")
+        return False
+
+    rng = np.random.default_rng(seed)
+    img = rng.integers(0, 256, size=(480, 640, 3), dtype=np.uint8)
+    facial_areas = []
+    for _ in range(samples):
+        w, h = rng.integers(60, 200, size=2)
+        x, y = rng.integers(0, 640 - w), rng.integers(0, 480 - h)
+        facial_areas.append((int(x), int(y), int(w), int(h)))
+
+    expected = eager._predict(img, facial_areas)
+    actual = exported._predict(img, facial_areas)
+    max_diff = float(np.abs(expected - actual).max())
+    agreement = float(np.mean(expected.argmax(axis=1) == actual.argmax(axis=1)))
+
+    passed = max_diff <= atol and agreement == 1.0
+    print(f"{'✅' if passed else '❌'} eager vs {fmt}: max |Δ softmax| = {max_diff:.2e}, "
+          f"label agreement = {agreement:.1%} over {samples} faces")
+    return passed
+
+
+def check_optimization(first_model=DEFAULT_FIRST_MODEL, second_model=DEFAULT_SECOND_MODEL,
+                       batch_size=8, runs=50, rtol=1e-4, seed=0):
+    """
+    Compare the original and the optimize_for_inference() graphs of both models: max logit difference
+    (relative to the logit range) and median latency of one batch on CPU. Returns True when all logits match.
+    """
+    import torch
+
+    device = torch.device("cpu")
+    rng = np.random.default_rng(seed)
+    batch = torch.from_numpy(rng.uniform(0, 255, size=(batch_size, 3, 80, 80)).astype(np.float32))
+
+    passed = True
+    for model_name, weight_file in (("MiniFASNetV2", first_model), ("MiniFASNetV1SE", second_model)):
+        models = (load_model(model_name, weight_file, device), load_model(model_name, weight_file, device, optimize=True))
+        timings = ([], [])
+        with torch.inference_mode():
+            expected, actual = (model(batch).numpy() for model in models)  # also the warmup
+            # chạy xen kẽ hai model để nhiễu CPU ảnh hưởng đều cả hai
+            for _ in range(runs):
+                for model, timing in zip(models, timings):
+                    start = time.perf_counter()
+                    model(batch)
+                    timing.append(time.perf_counter() - start)
+        base_ms, optimized_ms = (float(np.median(timing)) * 1000 for timing in timings)
+
+        max_diff = float(np.abs(expected - actual).max())
+        ok = max_diff <= rtol * max(1.0, float(np.abs(expected).max()))
+        passed = passed and ok
+        print(f"{'✅' if ok else '❌'} {model_name}: max |Δ logits| = {max_diff:.2e}, "
+              f"{base_ms:.2f} ms -> {optimized_ms:.2f} ms per batch of {batch_size} "
+              f"({base_ms / optimized_ms:.2f}x)")
+    return passed
+
+
+def self_test(first_model=DEFAULT_FIRST_MODEL, second_model=DEFAULT_SECOND_MODEL, formats=None):
+    """
+    Smoke test for CI: export to a temporary folder (model/ is not touched), check each exported
+    backend against the unfolded eager models (verify_parity) and the folded graph against the
+    original (check_optimization). Returns True when every check is within tolerance.
+
+    Args:
+        formats: Export formats to test; default TorchScript plus ONNX when onnx and onnxruntime are installed
+    """
+    if formats is None:
+        formats = ["torchscript"]
+        try:
+            import onnx  # noqa: F401
+
+            if backends.runtime_available("onnx"):
+                formats.append("onnx")
+        except ImportError:
+            pass
+
+    passed = check_optimization(first_model, second_model)
+    with tempfile.TemporaryDirectory() as work_dir:
+        first_copy = shutil.copy(first_model, work_dir)
+        second_copy = shutil.copy(second_model, work_dir)
+        for fmt in formats:
+            export(fmt, first_copy, second_copy)
+            passed = verify_parity(fmt, first_copy, second_copy) and passed
+    print(f"{'✅' if passed else '❌'} Anti-spoofing export self-test ({', '.join(formats)})")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export MiniFASNet anti-spoofing models")
+    parser.add_argument("--format", choices=sorted(EXPORTERS), default="onnx")
+    parser.add_argument("--first-model", default=DEFAULT_FIRST_MODEL)
+    parser.add_argument("--second-model", default=DEFAULT_SECOND_MODEL)
+    parser.add_argument("--verify", action="store_true", help="compare the exported backend against eager PyTorch")
+    parser.add_argument("--verify-only", action="store_true", help="only run the parity check on existing artefacts")
+    parser.add_argument("--check-optimized", action="store_true",
+                        help="only compare the original and optimize_for_inference() eager models")
+    parser.add_argument("--self-test", action="store_true",
+                        help="export to a temporary folder and run every check, exit 1 on failure (for CI)")
+    args = parser.parse_args()
+
+    if args.self_test:
+        if not self_test(args.first_model, args.second_model):
+            raise SystemExit(1)
+        return
+
+    if args.check_optimized:
+        if not check_optimization(args.first_model, args.second_model):
+            raise SystemExit(1)
+        return
+
+    if not args.verify_only:
+        export(args.format, args.first_model, args.second_model)
+    if args.verify or args.verify_only:
+        if not verify_parity(args.format, args.first_model, args.second_model):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import math
+import time
+
+
+class LivenessAccumulator:
+    """
+    Tích lũy kết quả anti-spoofing theo từng track khuôn mặt bằng kiểm định tỉ số xác suất tuần tự (SPRT).
+
+    Mỗi lần Fasnet chạy, log-odds của xác suất "thật" được cộng dồn vào track. Khi tổng vượt ngưỡng
+    trên/dưới thì track được kết luận REAL/FAKE và không cần gọi model nữa cho tới khi hết
+    `recheck_interval` giây hoặc track được nhận diện thành người khác. Một frame nhiễu đơn lẻ
+    không thể lật ngược quyết định vì bằng chứng mỗi frame bị giới hạn bởi `max_frame_evidence`.
+    """
+
+    REAL = "real"
+    FAKE = "fake"
+    PENDING = "pending"
+
+    def __init__(self, false_accept_rate=0.01, false_reject_rate=0.01, max_frame_evidence=3.0,
+                 recheck_interval=3.0):
+        """
+        Args:
+            false_accept_rate: Xác suất chấp nhận nhầm khuôn mặt giả (alpha của SPRT)
+            false_reject_rate: Xác suất từ chối nhầm khuôn mặt thật (beta của SPRT)
+            max_frame_evidence: Giá trị tuyệt đối tối đa của log-odds đóng góp bởi một frame
+            recheck_interval: Số giây sau khi kết luận thì kiểm tra lại track (0 = không kiểm tra lại)
+        """
+        # Ngưỡng Wald: chấp nhận REAL khi llr >= upper, FAKE khi llr <= lower
+        self.upper = math.log((1 - false_reject_rate) / false_accept_rate)
+        self.lower = math.log(false_reject_rate / (1 - false_accept_rate))
+        self.max_frame_evidence = max_frame_evidence
+        self.recheck_interval = recheck_interval
+
+        # track_id -> {"name", "llr", "frames", "state", "checking", "decided_at"}
+        self.tracks = {}
+        self.model_calls = 0
+        self.skipped_calls = 0
+
+    def needs_check(self, track_id, name, now=None):
+        """
+        Cho biết có cần chạy anti-spoofing cho track này ở frame hiện tại không.
+        Bắt đầu lại từ đầu nếu track mới hoặc được nhận diện thành người khác.
+        """
+        now = time.monotonic() if now is None else now
+        track = self.tracks.get(track_id)
+        if track is None or track["name"] != name:
+            self.tracks[track_id] = {
+                "name": name,
+                "llr": 0.0,
+                "frames": 0,
+                "state": self.PENDING,
+                "checking": True,
+                "decided_at": 0.0,
+            }
+            return True
+
+        if track["checking"]:
+            return True
+
+        if self.recheck_interval and now - track["decided_at"] >= self.recheck_interval:
+            # Hết hạn: kiểm tra lại nhưng giữ quyết định cũ tới khi có đủ bằng chứng mới
+            track["llr"] = 0.0
+            track["frames"] = 0
+            track["checking"] = True
+            return True
+
+        self.skipped_calls += 1
+        return False
+
+    def update(self, track_id, real_probability, now=None):
+        """
+        Thêm một kết quả anti-spoofing (xác suất khuôn mặt là thật) vào track
+
+        Returns:
+            Tuple (state, is_real, score) giống result()
+        """
+        now = time.monotonic() if now is None else now
+        track = self.tracks[track_id]
+        self.model_calls += 1
+
+        p = min(max(float(real_probability), 1e-6), 1 - 1e-6)
+        evidence = math.log(p / (1 - p))
+        track["llr"] += max(-self.max_frame_evidence, min(self.max_frame_evidence, evidence))
+        track["frames"] += 1
+
+        if track["llr"] >= self.upper or track["llr"] <= self.lower:
+            track["state"] = self.REAL if track["llr"] > 0 else self.FAKE
+            track["checking"] = False
+            track["decided_at"] = now
+        return self.result(track_id)
+
+    def result(self, track_id):
+        """
+        Returns:
+            Tuple (state, is_real, score): state là REAL/FAKE/PENDING; khi còn PENDING is_real theo
+            dấu của bằng chứng đã tích lũy; score là độ tin cậy của is_real
+        """
+        track = self.tracks.get(track_id)
+        if track is None:
+            return self.PENDING, True, 0.0
+
+        if track["state"] == self.PENDING:
+            is_real = track["llr"] >= 0
+        else:
+            is_real = track["state"] == self.REAL
+        # Kết quả đã quyết định được giữ trong lúc kiểm tra lại, nên độ tin cậy tối thiểu theo ngưỡng
+        llr = track["llr"]
+        if track["state"] == self.REAL:
+            llr = max(llr, self.upper)
+        elif track["state"] == self.FAKE:
+            llr = min(llr, self.lower)
+        real_probability = 1.0 / (1.0 + math.exp(-llr))
+        return track["state"], is_real, real_probability if is_real else 1.0 - real_probability
+
+    def prune(self, active_track_ids):
+        """Xóa trạng thái của các track không còn được tracker theo dõi"""
+        for track_id in list(self.tracks):
+            if track_id not in active_track_ids:
+                del self.tracks[track_id]
+
+    def stats(self):
+        total = self.model_calls + self.skipped_calls
+        return {
+            "tracks": len(self.tracks),
+            "model_calls": self.model_calls,
+            "skipped_calls": self.skipped_calls,
+            "skip_rate": self.skipped_calls / total if total else 0.0,
+        }
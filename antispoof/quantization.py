@@ -0,0 +1,253 @@
+# Post-training int8 quantization of the MiniFASNet anti-spoofing models (CPU only).
+#
+# Modes, selected with Fasnet(quantization=...):
+#   "dynamic" - torch.ao.quantization.quantize_dynamic, needs no calibration data but PyTorch
+#               only has dynamic kernels for Linear layers, so only the classifier head is int8.
+#   "static"  - experimental, not accepted by Fasnet: FX graph mode PTQ of the conv stacks,
+#               calibrated on a folder of real/spoof face crops. PReLU stays in float: the int8
+#               PReLU kernel is off by up to ~60% of the output range (worse with the negative slopes
+#               of the shipped weights), which made every input collapse to the same logits. Even so
+#               the result drifts from fp32 (max |Δ softmax| 0.05-0.3 depending on the engine) and is
+#               slower than fp32 with the quant/dequant around every PReLU, so it stays behind the gate.
+#
+# Every quantized model goes through a parity gate against its fp32 reference: quantize_models
+# raises when the softmax of any crop moves more than `atol`. Run the gate on its own (exits 1 on failure):
+#   python -m antispoof.quantization --mode dynamic
+#   python -m antispoof.quantization --mode static --calibration-dir calibration_crops
+#
+# Calibration folder layout is the same as the spoof test set used by spoof_test2.py:
+#   <calibration_dir>/real/*.jpg
+#   <calibration_dir>/fake/*.jpg
+# Each image is a face crop; the whole image is used as the facial area so crop() clamps
+# the 2.7x / 4.0x boxes to the image like it does for close-up faces.
+
+# built-in dependencies
+import argparse
+import copy
+import os
+import platform
+import sys
+
+# 3rd party dependencies
+import cv2
+import numpy as np
+
+# pylint: disable=import-outside-toplevel
+
+# modes accepted by Fasnet; "static" is only reachable through quantize_models(..., allow_experimental=True)
+MODES = ("dynamic",)
+EXPERIMENTAL_MODES = ("static",)
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+DEFAULT_FIRST_MODEL = os.path.join("model", "2.7_80x80_MiniFASNetV2.pth")
+DEFAULT_SECOND_MODEL = os.path.join("model", "4_0_0_80x80_MiniFASNetV1SE.pth")
+# max |Δ softmax| of one model against fp32 (Fasnet sums two softmaxes, so the score moves at most 2x this)
+DEFAULT_ATOL = 0.05
+
+
+def select_engine():
+    """Pick the quantized kernel backend for this CPU: qnnpack on ARM, fbgemm on x86"""
+    import torch
+
+    machine = platform.machine().lower()
+    engine = "qnnpack" if machine.startswith(("arm", "aarch64")) else "fbgemm"
+    if engine not in torch.backends.quantized.supported_engines:
+        engine = torch.backends.quantized.supported_engines[-1]
+    torch.backends.quantized.engine = engine
+    return engine
+
+
+def load_calibration_images(calibration_dir, max_images=200):
+    """
+    Load up to max_images face crops from the real/ and fake/ sub folders, alternating
+    between the two so both classes are represented in the activation ranges
+    """
+    folders = []
+    for label in ("real", "fake"):
+        folder = os.path.join(calibration_dir, label)
+        if os.path.isdir(folder):
+            folders.append(sorted(
+                os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS)
+            ))
+
+    # xen kẽ real/fake, thư mục nhiều ảnh hơn được lấy tiếp khi thư mục kia đã hết
+    paths = []
+    longest = max((len(folder) for folder in folders), default=0)
+    for i in range(longest):
+        paths.extend(folder[i] for folder in folders if i < len(folder))
+
+    images = []
+    for path in paths[:max_images]:
+        img = cv2.imread(path)
+        if img is None:
+            print(f"⚠️ Could not read calibration image: {path}")
+            continue
+        images.append(img)
+    return images
+
+
+def calibration_batches(images, scale, batch_size=16):
+    """Yield float32 NCHW batches cropped at `scale` exactly like Fasnet._predict feeds the models"""
+    from .Fasnet import crop
+
+    batch = np.empty((batch_size, 3, 80, 80), dtype=np.float32)
+    count = 0
+    for img in images:
+        height, width = img.shape[:2]
+        face = crop(img, (0, 0, width, height), scale, 80, 80)
+        batch[count] = face.transpose(2, 0, 1)
+        count += 1
+        if count == batch_size:
+            yield batch
+            count = 0
+    if count:
+        yield batch[:count]
+
+
+def quantize_dynamic(model):
+    """int8 weights for the Linear layers, activations quantized on the fly"""
+    import torch
+
+    select_engine()
+    return torch.ao.quantization.quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def synthetic_images(count=32, seed=0):
+    """Random-noise crops of random sizes, used by the parity gate when there is no calibration folder"""
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, size=(int(h), int(w), 3), dtype=np.uint8)
+            for h, w in rng.integers(60, 200, size=(count, 2))]
+
+
+def parity(reference, quantized, images, scale, max_images=64):
+    """
+    Run the same crops through the fp32 and the quantized model
+
+    Returns:
+        Tuple (max |Δ softmax|, top-1 agreement)
+    """
+    import torch
+
+    batches = list(calibration_batches(images[:max_images], scale, batch_size=max_images))
+    if not batches:
+        return 0.0, 1.0
+    batch = torch.from_numpy(batches[0].copy())
+    with torch.inference_mode():
+        expected = torch.softmax(reference(batch), dim=1).numpy()
+        actual = torch.softmax(quantized(batch), dim=1).numpy()
+    return float(np.abs(expected - actual).max()), float(np.mean(expected.argmax(1) == actual.argmax(1)))
+
+
+def _float_prelu_class():
+    import torch
+
+    class FloatPReLU(torch.nn.Module):
+        """Leaf wrapper that keeps PReLU in float between dequant/quant nodes"""
+
+        def __init__(self, prelu):
+            super().__init__()
+            self.prelu = prelu
+
+        def forward(self, x):
+            return self.prelu(x)
+
+    return FloatPReLU
+
+
+def quantize_static(model, images, scale):
+    """
+    FX graph mode post-training quantization calibrated on `images`.
+
+    PReLU is wrapped in a non-traceable float module: the int8 PReLU kernel is inaccurate with these
+    weights, and setting its qconfig to None makes the FX lowering fail on the dequant/PReLU/quant pattern.
+    """
+    import torch
+    from torch.ao.quantization import QConfigMapping, get_default_qconfig
+    from torch.ao.quantization.fx.custom_config import PrepareCustomConfig
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    float_prelu = _float_prelu_class()
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if isinstance(child, torch.nn.PReLU):
+                setattr(parent, name, float_prelu(child))
+
+    engine = select_engine()
+    qconfig_mapping = QConfigMapping().set_global(get_default_qconfig(engine)).set_object_type(float_prelu, None)
+    custom_config = PrepareCustomConfig().set_non_traceable_module_classes([float_prelu])
+    example_inputs = (torch.zeros(1, 3, 80, 80),)
+    prepared = prepare_fx(model.eval(), qconfig_mapping, example_inputs=example_inputs,
+                          prepare_custom_config=custom_config)
+
+    with torch.inference_mode():
+        for batch in calibration_batches(images, scale):
+            prepared(torch.from_numpy(batch))
+
+    return convert_fx(prepared)
+
+
+def quantize_models(first_model, second_model, mode, calibration_dir=None, atol=DEFAULT_ATOL,
+                    allow_experimental=False):
+    """
+    Quantize both Fasnet models and check them against fp32, returns (first, second).
+
+    Raises:
+        ValueError for an unknown or disabled mode, or "static" without calibration images
+        (there is no silent fallback to another mode); RuntimeError when a quantized model fails
+        the parity gate.
+    """
+    if mode in EXPERIMENTAL_MODES and not allow_experimental:
+        raise ValueError(f"{mode} int8 quantization is disabled: it fails the fp32 parity gate on the shipped "
+                         f"weights. Check it with `python -m antispoof.quantization --mode {mode}`")
+    if mode not in MODES + EXPERIMENTAL_MODES:
+        raise ValueError(f"Unknown quantization mode: {mode}, expected one of {MODES}")
+
+    images = load_calibration_images(calibration_dir) if calibration_dir else []
+    if mode == "static" and not images:
+        raise ValueError(f"Static quantization needs face crops in {calibration_dir or '<calibration_dir>'}/real "
+                         f"and /fake, none were found")
+
+    results = []
+    for model_name, model, scale in (("MiniFASNetV2", first_model, 2.7), ("MiniFASNetV1SE", second_model, 4)):
+        reference = copy.deepcopy(model).eval()
+        if mode == "static":
+            quantized = quantize_static(model, images, scale)
+        else:
+            quantized = quantize_dynamic(model)
+
+        max_diff, agreement = parity(reference, quantized, images or synthetic_images(), scale)
+        ok = max_diff <= atol
+        print(f"{'✅' if ok else '❌'} {model_name} {mode} int8 vs fp32: max |Δ softmax| = {max_diff:.2e}, "
+              f"top-1 agreement = {agreement:.1%} ({'calibration crops' if images else 'random crops'})")
+        if not ok:
+            raise RuntimeError(f"{model_name} {mode} int8 diverges from fp32 "
+                               f"(max |Δ softmax| {max_diff:.3f} > {atol})")
+        results.append(quantized)
+    return tuple(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize the anti-spoofing models and check them against fp32")
+    parser.add_argument("--mode", choices=MODES + EXPERIMENTAL_MODES, default="dynamic")
+    parser.add_argument("--first-model", default=DEFAULT_FIRST_MODEL)
+    parser.add_argument("--second-model", default=DEFAULT_SECOND_MODEL)
+    parser.add_argument("--calibration-dir", default=None,
+                        help="folder with real/ and fake/ face crops (required for static, optional for dynamic)")
+    parser.add_argument("--atol", type=float, default=DEFAULT_ATOL, help="max |Δ softmax| per model")
+    args = parser.parse_args()
+
+    import torch
+
+    from .Fasnet import load_model
+
+    device = torch.device("cpu")
+    first_model = load_model("MiniFASNetV2", args.first_model, device)
+    second_model = load_model("MiniFASNetV1SE", args.second_model, device)
+    try:
+        quantize_models(first_model, second_model, args.mode, args.calibration_dir, args.atol, allow_experimental=True)
+    except (ValueError, RuntimeError) as err:
+        print(f"❌ {err}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
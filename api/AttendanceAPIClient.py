@@ -1,8 +1,10 @@
-import requests
 from datetime import datetime
 import time
 import threading
 import queue
+from utils.lazy_import import lazy_import
+
+requests = lazy_import("requests")
 
 class AttendanceAPIClient:
     def __init__(self, api_url="https://render-face-system-api.onrender.com/api/attendance", retry_interval=5, max_retries=1):
@@ -0,0 +1,102 @@
+# So sánh hai file JSON của bench/pipeline_benchmark.py (ví dụ commit cũ và commit mới).
+#
+# In frames/s, độ trễ mỗi frame, p50/p95 của từng stage và từng thành phần, peak RSS, rồi đánh dấu
+# các chỉ số chậm đi quá --threshold phần trăm. Thoát với mã 1 khi có regression để dùng trong CI.
+#
+# Usage (chạy từ thư mục gốc của repo):
+#   python bench/compare_benchmarks.py base.json new.json
+#   python bench/compare_benchmarks.py base.json new.json --threshold 5 --metric p95_ms
+
+import argparse
+import json
+import sys
+
+
+def _change(base, new):
+    """Phần trăm thay đổi từ base sang new, None nếu không so được"""
+    if base is None or new is None or base == 0:
+        return None
+    return 100.0 * (new - base) / base
+
+
+def compare_rows(title, base_rows, new_rows, metric, threshold, min_delta_ms=0.0):
+    """
+    In bảng so sánh cho từng stage/thành phần có trong cả hai lần đo; chỉ tính là regression khi
+    chậm đi quá threshold phần trăm và quá min_delta_ms (bỏ qua nhiễu của các stage rất nhanh)
+
+    Returns:
+        List tên các dòng bị chậm đi quá threshold
+    """
+    names = [name for name in base_rows if name in new_rows]
+    if not names:
+        return []
+    print(f"\n⏱️ {title} ({metric})")
+    regressions = []
+    for name in names:
+        base, new = base_rows[name][metric], new_rows[name][metric]
+        change = _change(base, new)
+        flag = ""
+        if change is not None and change > threshold and new - base > min_delta_ms:
+            flag = "  ⚠️ slower"
+            regressions.append(f"{title}: {name}")
+        change_text = f"{change:+6.1f}%" if change is not None else "   n/a"
+        print(f"   {name:<30} {base:8.2f} -> {new:8.2f} ms  {change_text}{flag}")
+    only = sorted(set(base_rows) ^ set(new_rows))
+    if only:
+        print(f"   (only in one run: {', '.join(only)})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two pipeline benchmark results")
+    parser.add_argument("base", help="JSON of the reference run")
+    parser.add_argument("new", help="JSON of the run to check")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent slowdown reported as a regression")
+    parser.add_argument("--metric", default="p50_ms", choices=["mean_ms", "p50_ms", "p95_ms", "p99_ms"])
+    parser.add_argument("--min-delta-ms", type=float, default=0.05,
+                        help="ignore slowdowns smaller than this many milliseconds")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    for label, report in (("base", base), ("new", new)):
+        dirty = " (uncommitted changes)" if report.get("git_dirty") else ""
+        print(f"{label}: {report.get('git_commit') or 'unknown commit'}{dirty}, {report['input']['source']}, "
+              f"{report['input']['frames']} frames, {report['created']}")
+    if base["input"] != new["input"] or base.get("antispoof") != new.get("antispoof"):
+        print("⚠️ The runs used different inputs or settings, numbers may not be comparable")
+
+    regressions = []
+    base_fps, new_fps = base["pipeline"]["fps"], new["pipeline"]["fps"]
+    fps_change = _change(base_fps, new_fps)
+    fps_change_text = f"{fps_change:+.1f}%" if fps_change is not None else "n/a"
+    print(f"\n🚀 Throughput: {base_fps:.1f} -> {new_fps:.1f} frames/s ({fps_change_text})")
+    # Thông lượng giảm là regression
+    if fps_change is not None and -fps_change > args.threshold:
+        regressions.append("pipeline: fps")
+
+    regressions += compare_rows("Frame latency", {"frame": base["pipeline"]["latency"]},
+                                {"frame": new["pipeline"]["latency"]}, args.metric, args.threshold, args.min_delta_ms)
+    regressions += compare_rows("Pipeline stages", base["pipeline"]["stages"], new["pipeline"]["stages"],
+                                args.metric, args.threshold, args.min_delta_ms)
+    if base.get("components") and new.get("components"):
+        regressions += compare_rows("Components", base["components"], new["components"],
+                                    args.metric, args.threshold, args.min_delta_ms)
+
+    base_rss, new_rss = base["peak_rss_mb"]["end"], new["peak_rss_mb"]["end"]
+    if base_rss is not None and new_rss is not None:
+        rss_change = _change(base_rss, new_rss)
+        rss_change_text = f"{rss_change:+.1f}%" if rss_change is not None else "n/a"
+        print(f"\n💾 Peak RSS: {base_rss:.0f} -> {new_rss:.0f} MB ({rss_change_text})")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) over {args.threshold:.0f}%: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"\n✅ No regression over {args.threshold:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+# Benchmark bộ so khớp (matcher) khi database lớn dần, ví dụ từ 10 tới 100k người.
+#
+# Database tổng hợp có cùng định dạng với FaceDatabaseManager.face_db: mỗi người một mục
+# "ID_Name" -> {"id_real", "full_name", "embedding"} và các biến thể góc nhìn "ID_Name_up"... như
+# save_face_augmentation. Embedding là vector chuẩn hóa L2 với số chiều của embedder (192 cho
+# mobilefacenet.tflite); biến thể và truy vấn là embedding gốc cộng nhiễu.
+#
+# Với mỗi kích thước và mỗi matcher (FaceVerifier: vòng lặp Python, MatrixFaceVerifier: nhân ma
+# trận) đo thời gian dựng, bộ nhớ, độ trễ truy vấn đơn và theo batch, và tỷ lệ top-1 trùng khớp
+# giữa các matcher (và với danh tính đúng của truy vấn).
+#
+# Usage (chạy từ thư mục gốc của repo):
+#   python bench/gallery_benchmark.py
+#   python bench/gallery_benchmark.py --sizes 10 1000 100000 --augmentations up down --json gallery.json
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from bench.pipeline_benchmark import git_revision, peak_rss_mb, to_ms  # noqa: E402
+from metrics.profiler import RollingHistogram  # noqa: E402
+from verifier.face_verifier import FaceVerifier, MatrixFaceVerifier  # noqa: E402
+
+MATCHERS = {
+    "loop": FaceVerifier,
+    "matrix": MatrixFaceVerifier,
+}
+
+
+def _normalized(vectors):
+    return (vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)).astype(np.float32)
+
+
+def synthetic_gallery(identities, dim, augmentations, noise, rng):
+    """
+    Returns:
+        Tuple (face_db, centers): face_db theo định dạng FaceDatabaseManager, centers là mảng
+        (identities, dim) embedding gốc của từng người
+    """
+    centers = _normalized(rng.standard_normal((identities, dim)))
+    face_db = {}
+    for index, center in enumerate(centers):
+        id_real, full_name = str(100000 + index), f"Person{index}"
+        face_db[f"{id_real}_{full_name}"] = {"id_real": id_real, "full_name": full_name, "embedding": center}
+        for pose_type in augmentations:
+            variant = _normalized(center + noise * rng.standard_normal(dim))
+            face_db[f"{id_real}_{full_name}_{pose_type}"] = {
+                "id_real": id_real,
+                "full_name": f"{full_name} ({pose_type})",
+                "embedding": variant,
+            }
+    return face_db, centers
+
+
+def synthetic_queries(centers, count, noise, impostor_rate, rng):
+    """
+    Returns:
+        Tuple (queries, identity): identity[i] là chỉ số người của truy vấn i, -1 nếu là người lạ
+    """
+    identities = rng.integers(0, len(centers), count)
+    queries = centers[identities] + noise * rng.standard_normal((count, centers.shape[1]))
+    impostors = rng.random(count) < impostor_rate
+    queries[impostors] = rng.standard_normal((int(impostors.sum()), centers.shape[1]))
+    identities[impostors] = -1
+    return _normalized(queries), identities
+
+
+def _identity(name):
+    """ID người của tên trả về ("100042_Person42_up" -> "100042"), None cho "Unknown" """
+    return None if name == "Unknown" else name.split("_", 1)[0]
+
+
+def _traced_peak(fn):
+    """Peak bộ nhớ (byte) được cấp phát trong lúc chạy fn, đo bằng tracemalloc"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_matcher(matcher_class, face_db, queries, single_queries, batch_size, threshold):
+    """
+    Returns:
+        Tuple (stats, matches): stats là thời gian dựng, bộ nhớ, độ trễ; matches là kết quả
+        find_best_match của single_queries truy vấn đầu
+    """
+    start = time.perf_counter()
+    matcher = matcher_class(face_db)
+    build_time = time.perf_counter() - start
+    # Bộ nhớ đo bằng một lần dựng riêng vì tracemalloc làm chậm việc cấp phát
+    build_peak = _traced_peak(lambda: matcher_class(face_db))
+
+    latency = RollingHistogram(window=max(1, single_queries))
+    matches = []
+    for query in queries[:single_queries]:
+        start = time.perf_counter()
+        matches.append(matcher.find_best_match(query, threshold=threshold))
+        latency.record(time.perf_counter() - start)
+
+    stats = {
+        "build_time_s": build_time,
+        "build_peak_mb": build_peak / (1024 * 1024),
+        "single": to_ms(latency.snapshot()),
+    }
+    if isinstance(matcher, MatrixFaceVerifier):
+        stats["matrix_mb"] = matcher.memory_bytes / (1024 * 1024)
+
+    if hasattr(matcher, "find_best_matches"):
+        batch_latency = RollingHistogram(window=max(1, len(queries) // batch_size + 1))
+        batched = []
+        for offset in range(0, len(queries), batch_size):
+            start = time.perf_counter()
+            batched += matcher.find_best_matches(queries[offset:offset + batch_size], threshold=threshold)
+            batch_latency.record(time.perf_counter() - start)
+        stats["batch"] = {**to_ms(batch_latency.snapshot()), "batch_size": batch_size,
+                          "per_query_ms": 1000 * batch_latency.total / len(queries)}
+        stats["batch_agreement"] = float(np.mean([a[0] == b[0] for a, b in zip(matches, batched)]))
+    return stats, matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark face matchers against growing galleries")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000],
+                        help="number of identities in the gallery")
+    parser.add_argument("--augmentations", nargs="*", default=["up", "down"],
+                        help="pose variants stored per identity (like add_face_with_augmentation)")
+    parser.add_argument("--dim", type=int, default=192, help="embedding size (192 for mobilefacenet.tflite)")
+    parser.add_argument("--queries", type=int, default=512)
+    parser.add_argument("--batch", type=int, default=32, help="queries per batched call")
+    parser.add_argument("--noise", type=float, default=0.03, help="per-dimension noise of variants and queries")
+    parser.add_argument("--impostors", type=float, default=0.2, help="fraction of queries from unknown people")
+    parser.add_argument("--threshold", type=float, default=0.67)
+    parser.add_argument("--loop-budget", type=float, default=2e6,
+                        help="max gallery entries x queries for the loop matcher (it is slow on large galleries)")
+    parser.add_argument("--matchers", nargs="+", choices=list(MATCHERS), default=list(MATCHERS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    results = []
+    for identities in args.sizes:
+        tracemalloc.start()
+        face_db, centers = synthetic_gallery(identities, args.dim, args.augmentations, args.noise, rng)
+        gallery_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        queries, truth = synthetic_queries(centers, args.queries, args.noise, args.impostors, rng)
+        entries = len(face_db)
+        # Mọi matcher dùng chung số truy vấn đơn để top-1 so được với nhau
+        single_queries = max(5, min(args.queries, int(args.loop_budget / entries))) \
+            if "loop" in args.matchers else args.queries
+        print(f"\n📚 {identities} identities, {entries} entries ({gallery_bytes / (1024 * 1024):.1f} MB as face_db), "
+              f"{single_queries} single queries")
+
+        row = {"identities": identities, "entries": entries, "gallery_mb": gallery_bytes / (1024 * 1024),
+               "single_queries": single_queries, "matchers": {}}
+        all_matches = {}
+        for name in args.matchers:
+            stats, matches = benchmark_matcher(MATCHERS[name], face_db, queries, single_queries, args.batch, args.threshold)
+            expected = [None if t < 0 else str(100000 + t) for t in truth[:single_queries]]
+            stats["top1_accuracy"] = float(np.mean([_identity(m[0]) == e for m, e in zip(matches, expected)]))
+            row["matchers"][name] = stats
+            all_matches[name] = matches
+
+            line = (f"   {name:<7} build {1000 * stats['build_time_s']:8.1f} ms, {stats['build_peak_mb']:7.1f} MB, "
+                    f"single p50 {stats['single']['p50_ms']:8.3f} / p95 {stats['single']['p95_ms']:8.3f} ms")
+            if "batch" in stats:
+                line += f", batch{args.batch} {stats['batch']['per_query_ms']:.4f} ms/query"
+            print(line + f", top-1 accuracy {stats['top1_accuracy']:.1%}")
+
+        names = list(all_matches)
+        agreement = {}
+        for i, first in enumerate(names):
+            for second in names[i + 1:]:
+                pairs = list(zip(all_matches[first], all_matches[second]))
+                agreement[f"{first}/{second}"] = {
+                    "top1": float(np.mean([a[0] == b[0] for a, b in pairs])),
+                    "max_score_diff": float(max(abs(a[1] - b[1]) for a, b in pairs)),
+                }
+                print(f"   top-1 agreement {first}/{second}: {agreement[f'{first}/{second}']['top1']:.1%} "
+                      f"(max score diff {agreement[f'{first}/{second}']['max_score_diff']:.2e})")
+        row["agreement"] = agreement
+        results.append(row)
+
+    commit, dirty = git_revision()
+    report = {
+        "benchmark": "gallery",
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "git_dirty": dirty,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "settings": {key: value for key, value in vars(args).items() if key != "json"},
+        "peak_rss_mb": peak_rss_mb(),
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Saved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
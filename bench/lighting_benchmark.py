@@ -0,0 +1,204 @@
+# So sánh cách cải thiện ánh sáng trước khi phát hiện khuôn mặt: bản gốc (convertScaleAbs + CLAHE
+# trên kênh L của LAB, như enhance_frame_for_detection trước đây) và LightingEnhancer (LUT).
+#
+# Ảnh trong face_database/ được làm xấu theo từng điều kiện ánh sáng (Very Dark, Too Dark, Low Contrast,
+# Too Bright), rồi cải thiện bằng từng phương pháp ("none" = giữ nguyên ảnh đã làm xấu). Với mỗi cặp
+# (điều kiện, phương pháp) đo:
+#   color      - độ lệch màu trung bình |Δa|, |Δb| (LAB) so với ảnh gốc
+#   time       - thời gian cải thiện mỗi frame 640x480 trên một luồng liên tục
+#   embedding  - cosine similarity giữa embedding của ảnh đã cải thiện và của ảnh gốc
+#                (FaceRecognitionSystem.prepare_enrollment), và tỷ lệ vẫn phát hiện được khuôn mặt;
+#                cần model/mobilefacenet.tflite và detector, bỏ qua bằng --no-embeddings
+#
+# Usage (chạy từ thư mục gốc của repo):
+#   python bench/lighting_benchmark.py --json lighting.json
+#   python bench/lighting_benchmark.py --no-embeddings --repeats 200
+
+import argparse
+import contextlib
+import datetime
+import glob
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from bench.pipeline_benchmark import git_revision, peak_rss_mb  # noqa: E402
+from normalizer.lighting import LightingEnhancer  # noqa: E402
+
+# Mỗi điều kiện: ảnh gốc (uint8) -> ảnh đã làm xấu
+DEGRADATIONS = {
+    "very_dark": lambda image: cv2.convertScaleAbs(image, alpha=0.15, beta=0),
+    "too_dark": lambda image: cv2.convertScaleAbs(image, alpha=0.45, beta=0),
+    "low_contrast": lambda image: cv2.convertScaleAbs(image, alpha=0.2, beta=100),
+    "too_bright": lambda image: cv2.convertScaleAbs(image, alpha=0.3, beta=190),
+}
+
+
+def baseline_enhance(frame):
+    """Bản gốc enhance_frame_for_detection (trước LightingEnhancer), giữ lại để so sánh"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    avg_brightness = cv2.mean(gray)[0]
+    std_dev = np.std(gray)
+
+    if avg_brightness < 40:
+        lighting_status = "Very Dark"
+    elif avg_brightness < 80:
+        lighting_status = "Too Dark"
+    elif avg_brightness > 220:
+        lighting_status = "Too Bright"
+    elif std_dev < 30:
+        lighting_status = "Low Contrast"
+    else:
+        return frame, "Good"
+
+    if lighting_status in ["Very Dark", "Too Dark"]:
+        darkness_ratio = min(max(1.0 - (avg_brightness / 120.0), 0), 1)
+        enhanced = cv2.convertScaleAbs(frame, alpha=1.0 + darkness_ratio, beta=int(30 * darkness_ratio))
+        if lighting_status == "Very Dark":
+            enhanced = _clahe_l(enhanced, 2.0)
+        return enhanced, lighting_status
+
+    if lighting_status == "Too Bright":
+        brightness_ratio = min(max((avg_brightness - 180) / 75.0, 0), 1)
+        enhanced = cv2.convertScaleAbs(frame, alpha=1.0 - (0.3 * brightness_ratio), beta=int(-20 * brightness_ratio))
+        return enhanced, lighting_status
+
+    return _clahe_l(frame, 2.5), lighting_status
+
+
+def _clahe_l(frame, clip_limit):
+    l, a, b = cv2.split(cv2.cvtColor(frame, cv2.COLOR_BGR2LAB))
+    l = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(8, 8)).apply(l)
+    return cv2.cvtColor(cv2.merge((l, a, b)), cv2.COLOR_LAB2BGR)
+
+
+# Mỗi phương pháp là một factory trả về hàm frame -> (enhanced_frame, lighting_status) cho một luồng camera;
+# LightingEnhancer dùng cấu hình như main_copy_pir.py (đánh giá lại mỗi 10 frame)
+METHODS = {
+    "none": lambda: (lambda frame: (frame, None)),
+    "baseline": lambda: baseline_enhance,
+    "lut": lambda: LightingEnhancer(refresh_interval=10).enhance,
+}
+
+
+def color_shift(image, reference):
+    """Returns: Tuple (mean |Δa|, mean |Δb|) trong không gian LAB"""
+    lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB).astype(np.int16)
+    ref = cv2.cvtColor(reference, cv2.COLOR_BGR2LAB).astype(np.int16)
+    return float(np.abs(lab[..., 1] - ref[..., 1]).mean()), float(np.abs(lab[..., 2] - ref[..., 2]).mean())
+
+
+def time_method(method, frame, repeats):
+    method(frame)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        method(frame)
+    return 1000 * (time.perf_counter() - start) / repeats
+
+
+def load_embedder(models_dir):
+    """Returns: hàm ảnh -> embedding (None nếu không có khuôn mặt), hoặc None nếu không nạp được model"""
+    try:
+        from pipeline.face_recognition_system import FaceRecognitionSystem
+        with contextlib.redirect_stdout(io.StringIO()):
+            system = FaceRecognitionSystem(models_dir=models_dir, enable_antispoof=False)
+    except Exception as e:
+        print(f"⚠️ Không nạp được model nhận diện ({e}), bỏ qua phần embedding")
+        return None
+
+    def embed(image):
+        prepared = system.prepare_enrollment(image)
+        return None if prepared is None else prepared["embedding"]
+    return embed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare lighting enhancement methods on degraded face images")
+    parser.add_argument("--faces-dir", default="face_database")
+    parser.add_argument("--models-dir", default="model")
+    parser.add_argument("--conditions", nargs="+", choices=list(DEGRADATIONS), default=list(DEGRADATIONS))
+    parser.add_argument("--repeats", type=int, default=50, help="timed runs per method on a 640x480 frame")
+    parser.add_argument("--no-embeddings", action="store_true", help="skip the embedding similarity part")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+    os.chdir(REPO_ROOT)
+
+    paths = sorted(p for ext in ("*.jpg", "*.jpeg", "*.png") for p in glob.glob(os.path.join(args.faces_dir, ext)))
+    images = [image for image in (cv2.imread(p) for p in paths) if image is not None]
+    if not images:
+        sys.exit(f"❌ Không có ảnh trong {args.faces_dir}")
+
+    embed = None if args.no_embeddings else load_embedder(args.models_dir)
+    references = [embed(image) for image in images] if embed else None
+
+    results = {}
+    for condition in args.conditions:
+        degrade = DEGRADATIONS[condition]
+        degraded = [degrade(image) for image in images]
+        frame = degrade(cv2.resize(images[0], (640, 480)))
+        print(f"\n💡 {condition}")
+
+        results[condition] = {}
+        for name, method in METHODS.items():
+            # Mỗi ảnh là một cảnh riêng: một luồng mới cho mỗi ảnh
+            enhanced = [method()(image)[0] for image in degraded]
+            shifts = np.array([color_shift(e, o) for e, o in zip(enhanced, images)])
+            row = {
+                "status": method()(degraded[0])[1],
+                "color_shift_a": float(shifts[:, 0].mean()),
+                "color_shift_b": float(shifts[:, 1].mean()),
+                "time_ms": time_method(method(), frame, args.repeats),
+            }
+
+            line = (f"   {name:<9} |Δa| {row['color_shift_a']:5.2f}, |Δb| {row['color_shift_b']:5.2f}, "
+                    f"{row['time_ms']:7.3f} ms/frame")
+            if references is not None:
+                similarities = []
+                for image, reference in zip(enhanced, references):
+                    if reference is None:
+                        continue
+                    embedding = embed(image)
+                    if embedding is not None:
+                        similarities.append(float(np.dot(embedding, reference) /
+                                                  (np.linalg.norm(embedding) * np.linalg.norm(reference))))
+                detectable = sum(reference is not None for reference in references)
+                row["detected"] = len(similarities) / max(detectable, 1)
+                row["mean_similarity"] = float(np.mean(similarities)) if similarities else None
+                if similarities:
+                    line += f", similarity {row['mean_similarity']:.4f}"
+                line += f", detected {row['detected']:.0%}"
+            print(line)
+            results[condition][name] = row
+
+    commit, dirty = git_revision()
+    report = {
+        "benchmark": "lighting",
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "git_dirty": dirty,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "opencv": cv2.__version__,
+        "images": len(images),
+        "embeddings": references is not None,
+        "settings": {key: value for key, value in vars(args).items() if key != "json"},
+        "peak_rss_mb": peak_rss_mb(),
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Saved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+# Benchmark thông lượng của pipeline nhận diện, tách khỏi các script đánh giá độ chính xác.
+#
+# Frame đầu vào được phát lại từ:
+#   --video      - video đã ghi (ví dụ clip từ camera ở cổng)
+#   --frames-dir - thư mục ảnh (sắp xếp theo tên)
+#   --synthetic  - frame tổng hợp: ảnh trong face_database/ dán lên nền cố định và di chuyển
+#                  chậm giữa các frame (có khuôn mặt thật nên detector/tracker/cache đều chạy)
+#
+# Hai phần đo:
+#   pipeline   - FaceRecognitionSystem.process_image trên từng frame: frames/s, độ trễ mỗi frame
+#                và thời gian từng stage (StageProfiler: detect, landmarks, align, normalize, embed...)
+#   components - từng thành phần chạy riêng lẻ trên cùng dữ liệu (detector, aligner, preprocessor,
+#                embedder đơn/batch, verifier, Fasnet)
+# Kết quả (kèm git commit, peak RSS, thông tin máy) được ghi ra JSON để so sánh giữa các commit
+# bằng bench/compare_benchmarks.py.
+#
+# Usage (chạy từ thư mục gốc của repo):
+#   python bench/pipeline_benchmark.py --synthetic --frames 300 --json bench-synthetic.json
+#   python bench/pipeline_benchmark.py --video gate.mp4 --frames 600 --no-antispoof --json gate.json
+#   python bench/pipeline_benchmark.py --frames-dir captures/ --skip-components
+
+import argparse
+import contextlib
+import datetime
+import glob
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from metrics.profiler import RollingHistogram, StageProfiler  # noqa: E402
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def load_video(path, max_frames):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open video {path}")
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def load_frames_dir(path, max_frames):
+    files = sorted(f for f in glob.glob(os.path.join(path, "*")) if f.lower().endswith(IMAGE_EXTENSIONS))
+    frames = [cv2.imread(f) for f in files[:max_frames]]
+    return [frame for frame in frames if frame is not None]
+
+
+def synthetic_frames(count, size=(640, 480), faces_dir="face_database", faces_per_frame=2, seed=0):
+    """
+    Frame tổng hợp có thể lặp lại: khuôn mặt lấy từ faces_dir (hoặc mảng nhiễu nếu thư mục trống)
+    được dán lên một nền nhiễu cố định và trôi vài pixel mỗi frame như người đi qua camera
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size
+    face_size = height // 3
+    faces = []
+    for path in sorted(glob.glob(os.path.join(REPO_ROOT, faces_dir, "*"))):
+        image = cv2.imread(path) if path.lower().endswith(IMAGE_EXTENSIONS) else None
+        if image is not None:
+            faces.append(cv2.resize(image, (face_size, face_size)))
+    if not faces:
+        faces = [rng.integers(0, 255, (face_size, face_size, 3), dtype=np.uint8)]
+
+    background = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (21, 21), 0)
+    slots = [(rng.integers(0, width - face_size), rng.integers(0, height - face_size), rng.choice([-2, 2]), faces[i % len(faces)])
+             for i in range(faces_per_frame)]
+    frames = []
+    for index in range(count):
+        frame = background.copy()
+        for x, y, dx, face in slots:
+            # Đi qua lại trong khung hình
+            span = width - face_size
+            offset = (x + dx * index) % (2 * span)
+            x_pos = offset if offset < span else 2 * span - offset
+            frame[y:y + face_size, x_pos:x_pos + face_size] = face
+        frames.append(frame)
+    return frames
+
+
+def git_revision():
+    """(commit hash, có thay đổi chưa commit hay không), None nếu không phải git repo"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def peak_rss_mb():
+    """Peak resident memory của tiến trình (MB), None nếu không đo được (Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả về KB, macOS trả về byte
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def to_ms(stats):
+    """Đổi snapshot của RollingHistogram (giây) sang ms"""
+    return {
+        "count": stats["count"],
+        "mean_ms": 1000 * stats["mean"],
+        "p50_ms": 1000 * stats["p50"],
+        "p95_ms": 1000 * stats["p95"],
+        "p99_ms": 1000 * stats["p99"],
+    }
+
+
+def benchmark_pipeline(system, frames, warmup):
+    """
+    Chạy process_image trên mọi frame (warmup frame đầu không được tính)
+
+    Returns:
+        Dict fps, độ trễ mỗi frame, thời gian từng stage và các counter
+    """
+    for frame in frames[:warmup]:
+        system.process_image(frame)
+
+    # Profiler mới để bỏ số liệu của warm-up; tracker/cache vẫn giữ trạng thái như khi chạy thật
+    system.profiler = profiler = StageProfiler(window=max(1024, len(frames)))
+    for pipeline in system.pipelines.values():
+        pipeline.profiler = profiler
+    latency = RollingHistogram(window=max(1, len(frames)))
+    faces = 0
+
+    start = time.perf_counter()
+    for frame in frames:
+        frame_start = time.perf_counter()
+        faces += len(system.process_image(frame))
+        latency.record(time.perf_counter() - frame_start)
+    elapsed = time.perf_counter() - start
+
+    snapshot = profiler.snapshot()
+    return {
+        "frames": len(frames),
+        "faces": faces,
+        "elapsed_s": elapsed,
+        "fps": len(frames) / elapsed if elapsed > 0 else 0.0,
+        "latency": to_ms(latency.snapshot()),
+        "stages": {name: to_ms(stats) for name, stats in snapshot["stages"].items()},
+        "counters": snapshot["counters"],
+    }
+
+
+def benchmark_components(system, frames, repeat):
+    """
+    Chạy từng thành phần riêng lẻ trên các khuôn mặt tìm được trong frames
+
+    Returns:
+        Dict {component: thống kê độ trễ (ms)}
+    """
+    profiler = StageProfiler(window=16384)
+    # Hộp khuôn mặt lấy từ kết quả pipeline (đã NMS và cắt theo ảnh)
+    samples = [(frame, result["box"]) for frame in frames for result in system.process_image(frame)]
+
+    for _ in range(repeat):
+        for frame in frames:
+            with profiler.stage("detector.detect_faces"):
+                system.detector.detect_faces(frame)
+
+    aligned = []
+    for _ in range(repeat):
+        aligned = []
+        for frame, box in samples:
+            with profiler.stage("aligner.get_five_landmarks"):
+                landmarks = system.aligner.get_five_landmarks(frame, box)
+            if landmarks is None:
+                continue
+            with profiler.stage("aligner.align_face"):
+                face = system.aligner.align_face(frame, landmarks)
+            if face is not None:
+                aligned.append((frame, box, face))
+
+    if aligned:
+        faces = [face for _, _, face in aligned]
+        for _ in range(repeat):
+            for face in faces:
+                with profiler.stage("preprocessor.normalize"):
+                    system.preprocessor.normalize(face)
+            with profiler.stage("preprocessor.normalize_batch"):
+                normalized = system.preprocessor.normalize_batch(faces)
+            for face in normalized:
+                with profiler.stage("embedder.single"):
+                    system.embedder.get_embeddings(face[np.newaxis])
+            batch = normalized[:system.embedder.max_batch_size]
+            with profiler.stage(f"embedder.batch{len(batch)}"):
+                embeddings = system.embedder.get_embeddings(batch)
+            for embedding in embeddings:
+                with profiler.stage("verifier.find_best_match"):
+                    system.verifier.find_best_match(embedding, threshold=0.67)
+
+        if system.fasnet is not None:
+            for _ in range(repeat):
+                for frame, (x1, y1, x2, y2), _ in aligned:
+                    with profiler.stage("fasnet.real_probabilities"):
+                        system.fasnet.real_probabilities(frame, [(x1, y1, x2 - x1, y2 - y1)])
+
+    return {name: to_ms(stats) for name, stats in profiler.snapshot()["stages"].items()}
+
+
+def print_table(title, rows):
+    print(f"\n⏱️ {title}")
+    for name, stats in rows.items():
+        print(f"   {name:<30} p50 {stats['p50_ms']:7.2f}  p95 {stats['p95_ms']:7.2f}  "
+              f"p99 {stats['p99_ms']:7.2f} ms  (n={stats['count']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark throughput of the face recognition pipeline")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--video", help="replay frames from this video file")
+    source.add_argument("--frames-dir", help="replay the images of this folder")
+    source.add_argument("--synthetic", action="store_true", help="generate frames from face_database/ images")
+    parser.add_argument("--frames", type=int, default=300, help="maximum number of frames to replay")
+    parser.add_argument("--warmup", type=int, default=10, help="frames processed before measuring")
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions of the component benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic frames")
+    parser.add_argument("--models-dir", default="model")
+    parser.add_argument("--no-antispoof", action="store_true", help="benchmark without Fasnet")
+    parser.add_argument("--skip-components", action="store_true", help="only benchmark the full pipeline")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    # Đường dẫn người dùng đưa vào tính theo thư mục hiện tại, còn model/ và face_db.pkl theo repo
+    for name in ("video", "frames_dir", "json"):
+        if getattr(args, name):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+    os.chdir(REPO_ROOT)
+    if args.video:
+        frames, source_name = load_video(args.video, args.frames), args.video
+    elif args.frames_dir:
+        frames, source_name = load_frames_dir(args.frames_dir, args.frames), args.frames_dir
+    else:
+        frames, source_name = synthetic_frames(args.frames, seed=args.seed), "synthetic"
+    if not frames:
+        print("❌ No frames to replay")
+        sys.exit(1)
+    print(f"Loaded {len(frames)} frames ({frames[0].shape[1]}x{frames[0].shape[0]}) from {source_name}")
+
+    from pipeline.face_recognition_system import FaceRecognitionSystem
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        system = FaceRecognitionSystem(models_dir=args.models_dir, enable_antispoof=not args.no_antispoof)
+    init_time = time.perf_counter() - start
+    rss_after_init = peak_rss_mb()
+
+    # Log của pipeline (anti-spoofing, cascade...) không làm nhiễu kết quả đo
+    with contextlib.redirect_stdout(io.StringIO()):
+        pipeline = benchmark_pipeline(system, frames, args.warmup)
+        components = None if args.skip_components else benchmark_components(system, frames, args.repeat)
+
+    commit, dirty = git_revision()
+    report = {
+        "benchmark": "pipeline",
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "git_dirty": dirty,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "input": {"source": source_name, "frames": len(frames), "shape": list(frames[0].shape),
+                  "seed": args.seed if args.synthetic else None},
+        "antispoof": not args.no_antispoof,
+        "init_time_s": init_time,
+        "peak_rss_mb": {"after_init": rss_after_init, "end": peak_rss_mb()},
+        "pipeline": pipeline,
+        "components": components,
+    }
+
+    print(f"\n🚀 Pipeline: {pipeline['fps']:.1f} frames/s over {pipeline['frames']} frames "
+          f"({pipeline['faces']} faces), latency p50 {pipeline['latency']['p50_ms']:.1f} / "
+          f"p95 {pipeline['latency']['p95_ms']:.1f} / p99 {pipeline['latency']['p99_ms']:.1f} ms")
+    print_table("Pipeline stages", pipeline["stages"])
+    if components:
+        print_table("Components in isolation", components)
+    rss = report["peak_rss_mb"]
+    if rss["end"] is not None:
+        print(f"\n💾 Peak RSS: {rss['after_init']:.0f} MB after init, {rss['end']:.0f} MB at the end")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Saved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Đo thời gian khởi động của hệ thống nhận diện.
+#
+# Mỗi lần đo chạy trong một tiến trình Python mới để module cache không ảnh hưởng kết quả:
+#   import     - chỉ import main_copy_pir (kiểm tra các thư viện nặng có được import trễ không)
+#   headless   - import + FaceRecognitionSystem(enable_antispoof=False), không UI, không torch
+#   full       - import + FaceRecognitionSystem() với anti-spoofing
+#
+# Usage (chạy từ thư mục gốc của repo):
+#   python bench/startup_benchmark.py
+#   python bench/startup_benchmark.py --scenarios import headless --repeat 5 --json startup.json
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Các thư viện nặng cần được import trễ
+HEAVY_MODULES = ("torch", "mediapipe", "pygame", "gpiozero", "requests", "sklearn", "matplotlib", "seaborn", "tensorflow")
+
+CHILD_CODE = """
+import json, sys, time, io, contextlib
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    import main_copy_pir
+import_time = time.perf_counter() - start
+result = {"import_time": import_time}
+if sys.argv[1] != "import":
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        system = main_copy_pir.FaceRecognitionSystem(enable_antispoof=sys.argv[1] == "full")
+    result["init_time"] = time.perf_counter() - start
+    result["components"] = {row["name"]: row["load_time"] + row["warmup_time"] for row in system.startup.timings()}
+result["total_time"] = import_time + result.get("init_time", 0.0)
+result["heavy_modules"] = sorted(name for name in json.loads(sys.argv[2]) if name in sys.modules)
+print(json.dumps(result))
+"""
+
+
+def run_scenario(scenario):
+    """Chạy một lần đo trong tiến trình con, trả về dict kết quả"""
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD_CODE, scenario, json.dumps(HEAVY_MODULES)],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if output.returncode != 0:
+        raise RuntimeError(f"{scenario} run failed:\n{output.stderr.strip()}")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark startup time of the face recognition system")
+    parser.add_argument("--scenarios", nargs="+", choices=["import", "headless", "full"], default=["import", "headless"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write the raw measurements to this file")
+    args = parser.parse_args()
+
+    report = {}
+    for scenario in args.scenarios:
+        runs = []
+        for _ in range(args.repeat):
+            try:
+                runs.append(run_scenario(scenario))
+            except RuntimeError as e:
+                print(f"❌ {e}")
+                break
+        if not runs:
+            continue
+        report[scenario] = runs
+
+        totals = [run["total_time"] for run in runs]
+        print(f"\n⏱️ {scenario}: median {statistics.median(totals):.3f}s "
+              f"(min {min(totals):.3f}s, max {max(totals):.3f}s over {len(runs)} runs)")
+        print(f"   import main_copy_pir: {statistics.median(run['import_time'] for run in runs):.3f}s")
+        if "components" in runs[-1]:
+            for name, seconds in runs[-1]["components"].items():
+                print(f"   {name:<12} {seconds:.3f}s")
+        heavy = runs[-1]["heavy_modules"]
+        print(f"   heavy modules imported: {', '.join(heavy) if heavy else 'none'}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Saved measurements to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,48 @@
-from flask import Flask, Response
-import cv2
-
-app = Flask(__name__)
-cap = cv2.VideoCapture(0)  # Dùng webcam laptop
-
-def generate_frames():
-    while True:
-        success, frame = cap.read()
-        if not success:
-            break
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame = buffer.tobytes()
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-
-@app.route('/video')
-def video():
-    return Response(generate_frames(),
-                    mimetype='multipart/x-mixed-replace; boundary=frame')
+# Server stream camera cho các máy khác (ví dụ --source http://pi-gate:8080/video của main_copy_pir.py).
+# Frame được đọc bởi VideoCaptureThread và phát qua MjpegStreamer: mỗi frame chỉ mã hóa một lần
+# cho mọi client, và không mã hóa gì khi không ai xem.
+#
+# Usage:
+#   python camera.py                                   # webcam 0 tại http://0.0.0.0:8080/video
+#   python camera.py --source 1 --port 8081 --quality 70 --width 640 --max-fps 15
+#
+# Trên máy đang chạy nhận diện, dùng `main_copy_pir.py --stream-port 8080` để phát frame của chính
+# pipeline thay vì mở camera lần thứ hai ở đây.
+
+import argparse
+import time
+
+from stream.mjpeg import MjpegStreamer
+from thread.thread import VideoCaptureThread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MJPEG camera stream server")
+    parser.add_argument("--source", default="0", help="USB index, RTSP URL or video file")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--quality", type=int, default=80, help="JPEG quality (0-100)")
+    parser.add_argument("--width", type=int, default=None, help="resize the stream to this width")
+    parser.add_argument("--max-fps", type=float, default=None, help="maximum encoded frames per second")
+    args = parser.parse_args()
+
+    streamer = MjpegStreamer(host=args.host, port=args.port, quality=args.quality,
+                             width=args.width, max_fps=args.max_fps).start()
+    # Chỉ đọc qua listener: không giữ frame cho get(), nên frames_dropped không tăng vô hạn
+    cap = VideoCaptureThread(args.source, drop_policy="none", loop=True)
+    cap.add_listener(streamer.on_frame)
+    cap.start()
+
+    try:
+        while cap.running and not cap.finished:
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        streamer.report()
+        cap.stop()
+        streamer.stop()
+
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8080)
+    main()
@@ -1,13 +1,18 @@
 import os
 import cv2
 import pickle
+import threading
 import numpy as np
-import requests
 from normalizer.image_preprocess import normalize_face
+from utils.lazy_import import lazy_import
 import time
 import traceback
+
+requests = lazy_import("requests")
+
 class FaceDatabaseManager:
-    def __init__(self, image_dir, backup_path, detector, aligner, embedder, api_url="https://render-face-system-api.onrender.com/api/faces"):
+    def __init__(self, image_dir, backup_path, detector, aligner, embedder, api_url="https://render-face-system-api.onrender.com/api/faces",
+                 lock=None):
         self.image_dir = image_dir
         self.backup_path = backup_path
         self.detector = detector
@@ -21,6 +26,9 @@ class FaceDatabaseManager:
         
         # Load database and check for updates
         self.face_db = {}
+        # Giữ khi thay đổi face_db lúc đang chạy; dùng chung lock với luồng nhận diện (FaceVerifier duyệt
+        # face_db) để thêm/xóa khuôn mặt không làm "dictionary changed size during iteration"
+        self.lock = lock if lock is not None else threading.RLock()
 
         self._load_face_database()
         self._update_from_image_files()
@@ -80,8 +88,10 @@ class FaceDatabaseManager:
     #     print("💾 Saved updated face database.")
     def _save_backup(self):
         """Save current face database to backup file"""
+        with self.lock:
+            data = pickle.dumps(self.face_db)
         with open(self.backup_path, 'wb') as f:
-            pickle.dump(self.face_db, f)
+            f.write(data)
         print("💾 Saved backup of face database")
 
 
@@ -91,6 +101,7 @@ class FaceDatabaseManager:
         """
         updated = False
         processed_ids = set()  # Track processed IDs to avoid duplicates
+        pending_faces = []  # (id_real, full_name, filename, norm_face) waiting for embedding
         
         # Create debug directory for visualization if needed
         debug_dir = os.path.join(self.image_dir, "debug_processing")
@@ -253,34 +264,11 @@ class FaceDatabaseManager:
                         # comparison_path = os.path.join(debug_dir, f"{id_real}_comparison.jpg")
                         # cv2.imwrite(comparison_path, combined_img)
                         
-                        # 5. Generate embedding
-                        embedding = self.embedder.get_embedding(norm_face)
-                        print(f"    ✅ Embedding generated (shape: {embedding.shape})")
+                        # 5. Queue for batched embedding (computed after all files are read)
+                        pending_faces.append((id_real, full_name, filename, norm_face))
+                        processed_ids.add(id_real)  # Mark as queued to avoid duplicates
                         # --- END OF FACE PROCESSING ---
 
-                        # Create database key
-                        db_key = f"{id_real}_{full_name}"
-
-                        # Save to local database (in memory)
-                        self.face_db[db_key] = {
-                            "id_real": id_real,
-                            "full_name": full_name,
-                            "embedding": embedding
-                        }
-                        print(f"    ➕ Added '{db_key}' to local face_db")
-
-                        # Save to API
-                        print(f"    🚀 Attempting to save '{db_key}' to API...")
-                        api_success = self._save_face_to_api(id_real, full_name, embedding)
-
-                        if api_success:
-                            print(f"    ✔️ API Save successful for '{db_key}'")
-                            updated = True  # Mark that changes need backup
-                            processed_ids.add(id_real)  # Mark this ID as successfully processed
-                        else:
-                            print(f"    ❌ API Save failed for '{db_key}'. Face remains in local DB for now.")
-                            processed_ids.add(id_real)  # Still mark as processed to avoid retrying
-
                     except Exception as e:
                         print(f"    ❌❌❌ Unexpected Error processing {filename}: {e}")
                         traceback.print_exc()  # Print detailed error
@@ -290,12 +278,60 @@ class FaceDatabaseManager:
                     # Notify if filename format is incorrect
                     print(f"  ⚠️ Skipping file '{filename}'. Name doesn't match 'ID_FullName.extension' format.")
 
+        if pending_faces:
+            updated = self._add_pending_faces(pending_faces)
+
         if updated:
             print("\n💾 Saving backup due to new faces added from files.")
             self._save_backup()
         else:
             print("\n✅ No new faces from files were added to the API or required backup.")
 
+    def _add_pending_faces(self, pending_faces):
+        """Generate embeddings for all queued faces in one batch, then save them locally and to API.
+        Returns True if at least one face was saved to the API.
+        """
+        print(f"\n🧮 Generating embeddings for {len(pending_faces)} new face(s)...")
+        try:
+            embeddings = self.embedder.get_embeddings([face for _, _, _, face in pending_faces])
+            embedded = list(zip(pending_faces, embeddings))
+        except Exception as e:
+            # Một crop lỗi không được làm mất cả batch: tính lại từng khuôn mặt, chỉ bỏ ảnh bị lỗi
+            print(f"⚠️ Batched embedding failed ({e}), retrying face by face...")
+            embedded = []
+            for pending in pending_faces:
+                try:
+                    embedded.append((pending, self.embedder.get_embeddings([pending[3]])[0]))
+                except Exception as e:
+                    print(f"    ❌ Failed to generate embedding for {pending[2]}: {e}")
+                    traceback.print_exc()
+
+        updated = False
+        for (id_real, full_name, filename, _), embedding in embedded:
+            print(f"    ✅ Embedding generated for {filename} (shape: {embedding.shape})")
+
+            # Create database key
+            db_key = f"{id_real}_{full_name}"
+
+            # Save to local database (in memory)
+            self.face_db[db_key] = {
+                "id_real": id_real,
+                "full_name": full_name,
+                "embedding": embedding
+            }
+            print(f"    ➕ Added '{db_key}' to local face_db")
+
+            # Save to API
+            print(f"    🚀 Attempting to save '{db_key}' to API...")
+            api_success = self._save_face_to_api(id_real, full_name, embedding)
+
+            if api_success:
+                print(f"    ✔️ API Save successful for '{db_key}'")
+                updated = True  # Mark that changes need backup
+            else:
+                print(f"    ❌ API Save failed for '{db_key}'. Face remains in local DB for now.")
+        return updated
+
     def _save_face_to_api(self, id_real, full_name, embedding):
         """Save face embedding to API"""
         try:
@@ -344,11 +380,12 @@ class FaceDatabaseManager:
             embedding_list = embedding.tolist()
             # Add to local database first
             db_key = f"{id_real}_{full_name}_{pose_type}"
-            self.face_db[db_key] = {
-                "id_real": id_real,
-                "full_name": f"{full_name} ({pose_type})",
-                "embedding": embedding
-            }
+            with self.lock:
+                self.face_db[db_key] = {
+                    "id_real": id_real,
+                    "full_name": f"{full_name} ({pose_type})",
+                    "embedding": embedding
+                }
             
             # Send to API
             response = requests.post(
@@ -374,11 +411,12 @@ class FaceDatabaseManager:
     def add_face(self, name, id_real, full_name, embedding):
         """Add a face to the database via API"""
         # Update in-memory database
-        self.face_db[name] = {
-            "id_real": id_real,
-            "full_name": full_name,
-            "embedding": embedding
-        }
+        with self.lock:
+            self.face_db[name] = {
+                "id_real": id_real,
+                "full_name": full_name,
+                "embedding": embedding
+            }
         
         # Save to API
         success = self._save_face_to_api(id_real, full_name, embedding)
@@ -392,13 +430,14 @@ class FaceDatabaseManager:
         """Delete a face from the database"""
         try:
             # First remove from in-memory database
-            to_remove = []
-            for name, data in self.face_db.items():
-                if data.get("id_real") == id_real:
-                    to_remove.append(name)
-            
-            for name in to_remove:
-                del self.face_db[name]
+            with self.lock:
+                to_remove = []
+                for name, data in self.face_db.items():
+                    if data.get("id_real") == id_real:
+                        to_remove.append(name)
+                
+                for name in to_remove:
+                    del self.face_db[name]
                 
             # Then remove from API
             response = requests.delete(f"{self.api_url}/{id_real}")
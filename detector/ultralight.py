@@ -73,6 +73,11 @@ class FaceDetector:
         boxes, scores = boxes[conf_mask], scores[conf_mask]
         return boxes, scores
 
+    def warmup(self):
+        """Chạy một lần suy luận trên ảnh đen để interpreter cấp phát trước frame đầu tiên"""
+        width, height = self._input_size[:, 0]
+        self.detect_faces(np.zeros((int(height), int(width), 3), dtype=np.uint8))
+
     def detect_faces(self, img):
         input_tensor = self._pre_processing(img)
         self._set_input_tensor(input_tensor)
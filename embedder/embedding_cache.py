@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    LRU cache cho embedding, khóa theo (track_id, perceptual hash của khuôn mặt đã căn chỉnh).
+
+    Khi một người đứng yên trước camera, các ảnh 112x112 đã căn chỉnh gần như giống hệt nhau,
+    nên có thể dùng lại embedding thay vì gọi lại TFLite. Mỗi entry chỉ sống tối đa `ttl` giây
+    để embedding không bị cũ quá lâu.
+    """
+
+    def __init__(self, max_size=256, ttl=2.0, max_distance=4):
+        """
+        Args:
+            max_size: Số entry tối đa trước khi loại bỏ entry ít dùng nhất
+            ttl: Thời gian sống (giây) của một embedding kể từ khi được tính
+            max_distance: Khoảng cách Hamming tối đa giữa hai hash để coi là trùng
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self._entries = OrderedDict()  # (track_id, fingerprint) -> (embedding, created_at)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def fingerprint(aligned_face):
+        """Tính difference hash 64-bit của khuôn mặt đã căn chỉnh (BGR uint8)"""
+        if aligned_face.ndim == 3:
+            gray = cv2.cvtColor(aligned_face, cv2.COLOR_BGR2GRAY)
+        else:
+            gray = aligned_face
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = small[:, 1:] > small[:, :-1]
+        return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+    def get(self, track_id, fingerprint):
+        """Trả về embedding đã cache cho track hoặc None nếu không có ảnh đủ giống"""
+        if track_id is None:
+            return None
+
+        now = time.time()
+        with self._lock:
+            key = (track_id, fingerprint)
+            if key not in self._entries:
+                key = self._find_near_duplicate(track_id, fingerprint)
+
+            if key is not None:
+                embedding, created_at = self._entries[key]
+                if now - created_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return embedding
+                del self._entries[key]
+
+            self.misses += 1
+            return None
+
+    def put(self, track_id, fingerprint, embedding):
+        if track_id is None:
+            return
+
+        with self._lock:
+            key = (track_id, fingerprint)
+            self._entries[key] = (embedding, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _find_near_duplicate(self, track_id, fingerprint):
+        """Tìm entry gần nhất (Hamming) của cùng track; gọi khi đã giữ lock"""
+        best_key, best_distance = None, self.max_distance + 1
+        for key in self._entries:
+            if key[0] != track_id:
+                continue
+            distance = bin(key[1] ^ fingerprint).count("1")
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+        return best_key
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Các chỉ số hit-rate của cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -9,15 +9,115 @@ else:
     tflite_interpreter = tflite.Interpreter
 
 class FaceEmbedder:
-    def __init__(self, model_path):
+    def __init__(self, model_path, max_batch_size=16):
         self.interpreter = tflite_interpreter(model_path=model_path)
         self.interpreter.allocate_tensors()
         self.input_details = self.interpreter.get_input_details()
         self.output_details = self.interpreter.get_output_details()
 
+        # Kích thước ảnh đầu vào (H, W, C) đọc từ model, ví dụ (112, 112, 3)
+        self.input_shape = tuple(self.input_details[0]['shape'][1:])
+        self.embedding_size = int(self.output_details[0]['shape'][-1])
+        self.max_batch_size = max_batch_size
+
+        # Batch size hiện tại của interpreter; _dynamic_batch = False nghĩa là model
+        # không hỗ trợ resize batch động và phải chạy từng ảnh một
+        self._batch_size = int(self.input_details[0]['shape'][0])
+        self._dynamic_batch = True
+
+        # Buffer dùng lại giữa các lần gọi để tránh cấp phát mỗi frame
+        self._input_buffer = np.empty((max_batch_size,) + self.input_shape, dtype=np.float32)
+        self._output_buffer = np.empty((max_batch_size, self.embedding_size), dtype=np.float32)
+
+    def warmup(self):
+        """Chạy model một lần với ảnh rỗng để cấp phát tensor trước frame đầu tiên"""
+        self.get_embedding(np.zeros(self.input_shape, dtype=np.float32))
+
     def get_embedding(self, face_img):
         input_data = np.expand_dims(face_img, axis=0).astype(np.float32)
+        self._resize_batch(1)
         self.interpreter.set_tensor(self.input_details[0]['index'], input_data)
         self.interpreter.invoke()
         embedding = self.interpreter.get_tensor(self.output_details[0]['index'])
         return embedding[0]
+
+    def get_embeddings(self, faces, normalize=True):
+        """
+        Tính embedding cho nhiều khuôn mặt trong một lần gọi interpreter
+
+        Args:
+            faces: List các ảnh khuôn mặt đã chuẩn hóa hoặc mảng (N, H, W, C)
+            normalize: Chuẩn hóa L2 các embedding đầu ra
+
+        Returns:
+            Mảng (N, embedding_size) float32
+        """
+        count = len(faces)
+        if count == 0:
+            return np.empty((0, self.embedding_size), dtype=np.float32)
+
+        embeddings = np.empty((count, self.embedding_size), dtype=np.float32)
+        for start in range(0, count, self.max_batch_size):
+            end = min(start + self.max_batch_size, count)
+            embeddings[start:end] = self._invoke_batch(faces[start:end])
+
+        if normalize:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            np.maximum(norms, 1e-10, out=norms)
+            embeddings /= norms
+        return embeddings
+
+    def batch_buffer(self, count):
+        """
+        Trả về buffer đầu vào (count, H, W, C) để bộ tiền xử lý ghi trực tiếp vào,
+        tránh phải sao chép thêm một lần trong get_embeddings
+        """
+        if count <= self.max_batch_size:
+            return self._input_buffer[:count]
+        return np.empty((count,) + self.input_shape, dtype=np.float32)
+
+    def _invoke_batch(self, faces):
+        """Chạy một batch (<= max_batch_size) qua interpreter, trả về view của output buffer"""
+        count = len(faces)
+        batch = self._input_buffer[:count]
+        # Bỏ qua bước sao chép nếu dữ liệu đã nằm sẵn trong buffer (xem batch_buffer)
+        if not (isinstance(faces, np.ndarray) and faces.ctypes.data == batch.ctypes.data):
+            for i, face in enumerate(faces):
+                batch[i] = face
+
+        output = self._output_buffer[:count]
+        if self._dynamic_batch and self._resize_batch(count):
+            self.interpreter.set_tensor(self.input_details[0]['index'], batch)
+            self.interpreter.invoke()
+            output[:] = self.interpreter.get_tensor(self.output_details[0]['index'])
+            return output
+
+        # Model có batch cố định: chạy lần lượt từng ảnh nhưng vẫn dùng chung buffer
+        for i in range(count):
+            self.interpreter.set_tensor(self.input_details[0]['index'], batch[i:i + 1])
+            self.interpreter.invoke()
+            output[i] = self.interpreter.get_tensor(self.output_details[0]['index'])[0]
+        return output
+
+    def _resize_batch(self, batch_size):
+        """Resize input tensor về batch_size, trả về False nếu model không hỗ trợ"""
+        if batch_size == self._batch_size:
+            return True
+        if not self._dynamic_batch:
+            return batch_size == 1
+
+        try:
+            self.interpreter.resize_tensor_input(
+                self.input_details[0]['index'], (batch_size,) + self.input_shape)
+            self.interpreter.allocate_tensors()
+            self._batch_size = batch_size
+            return True
+        except Exception as e:
+            print(f"⚠️ Embedder model does not support dynamic batch ({e}), falling back to per-face inference")
+            self._dynamic_batch = False
+            # Khôi phục batch 1 để get_embedding vẫn hoạt động
+            self.interpreter.resize_tensor_input(
+                self.input_details[0]['index'], (1,) + self.input_shape)
+            self.interpreter.allocate_tensors()
+            self._batch_size = 1
+            return batch_size == 1
@@ -54,13 +54,18 @@ class SpoofAlertManager:
         """
         current_time = time.time()
         
-        # Find fake faces in results
-        fake_faces = [r for r in results if not r.get("is_real", True) and r["name"].startswith("FAKE:")]
+        # Find fake faces in results (only recognized faces are checked for spoofing);
+        # faces whose liveness is still being accumulated are not alerted on yet
+        fake_faces = [
+            r for r in results
+            if not r.get("is_real", True) and r.get("liveness") != "pending" and self._original_name(r) != "Unknown"
+        ]
         
         # Process each fake face
+        current_fakes = set()
         for face in fake_faces:
-            # Extract original name from "FAKE: Name"
-            original_name = face["name"].replace("FAKE: ", "")
+            original_name = self._original_name(face)
+            current_fakes.add(original_name)
             
             # If this is a new fake face, start tracking it
             if original_name not in self.tracked_spoofs:
@@ -91,7 +96,6 @@ class SpoofAlertManager:
                 self.tracked_spoofs[original_name]['last_alert'] = current_time
                 
         # Remove tracked spoofs that are no longer detected (reset tracking)
-        current_fakes = [r["name"].replace("FAKE: ", "") for r in fake_faces]
         names_to_remove = []
         
         for name in self.tracked_spoofs:
@@ -101,6 +105,14 @@ class SpoofAlertManager:
         for name in names_to_remove:
             del self.tracked_spoofs[name]
     
+    @staticmethod
+    def _original_name(result):
+        """Recognized name of a result, falling back to stripping the "FAKE: " display prefix"""
+        if "original_name" in result:
+            return result["original_name"]
+        name = result["name"]
+        return name[len("FAKE: "):] if name.startswith("FAKE: ") else name
+    
     def _queue_email(self, name, face_img, full_frame):
         """Queue an email to be sent by the background thread"""
         with self.queue_lock:
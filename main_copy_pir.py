@@ -1,245 +1,30 @@
 import cv2
 import os
-from detector.ultralight import FaceDetector
-from aligner.mediapipe_aligner import FaceAligner
-from normalizer.image_preprocess import normalize_face
-from embedder.mobilefacenet_embedder import FaceEmbedder
-from verifier.face_verifier import FaceVerifier
-from database.face_database_manager import FaceDatabaseManager
-from antispoof.Fasnet import Fasnet
-from thread.thread import VideoCaptureThread
-from ui.ui import FaceRecognitionUI
-import pygame
+from normalizer.lighting import LightingEnhancer
+from antispoof.liveness import LivenessAccumulator
+from pipeline.face_recognition_system import FaceRecognitionSystem
+from thread.thread import CaptureManager
+from thread.recognition_worker import RecognitionWorker
+from tracker.box_interpolator import BoxInterpolator
+from ui.display import DISPLAY_BACKENDS, create_display
+from stream.mjpeg import MjpegStreamer
+from metrics.profiler import StageProfiler
+from metrics.prometheus import MetricsServer
+from utils.lazy_import import lazy_import, is_available
 import numpy as np
 import time
 import threading
 
+# UI và GPIO chỉ được import khi thật sự dùng (chế độ headless không cần)
+pygame = lazy_import("pygame")
+gpiozero = lazy_import("gpiozero")
+
 # Import GPIO for Raspberry Pi motion detection
-try:
-    from gpiozero import MotionSensor
-    from signal import pause
-    GPIO_AVAILABLE = True
+GPIO_AVAILABLE = is_available("gpiozero")
+if GPIO_AVAILABLE:
     print("✅ Motion sensor support available")
-except ImportError:
+else:
     print("⚠️ gpiozero module not found. Motion detection will be simulated.")
-    GPIO_AVAILABLE = False
-
-class FaceRecognitionSystem:
-    def __init__(self, models_dir="model"):
-        # Initialize components with correct model paths
-        detector_model = os.path.join(models_dir, "version-RFB-320_without_postprocessing.tflite")
-        embedder_model = os.path.join(models_dir, "mobilefacenet.tflite")
-        self.db_path = "./face_db.pkl"
-
-        # Initialize Fastnet
-        first_model = os.path.join(models_dir, "2.7_80x80_MiniFASNetV2.pth")
-        second_model = os.path.join(models_dir, "4_0_0_80x80_MiniFASNetV1SE.pth")
-        self.fasnet = Fasnet(first_model, second_model)
-        # Increase confidence threshold to reduce false positives
-        self.detector = FaceDetector(detector_model, conf_threshold=0.7)
-        self.aligner = FaceAligner()
-        self.embedder = FaceEmbedder(embedder_model)
-        self.db_manager = FaceDatabaseManager(
-            image_dir="./face_database",
-            backup_path= self.db_path,
-            detector=self.detector,
-            aligner=self.aligner,
-            embedder=self.embedder
-        )
-        
-        # Load face database if exists
-        self.face_db = self.db_manager.face_db
-        print(f"Face database loaded with {len(self.face_db)} entries.")
-        self.verifier = FaceVerifier(self.face_db)
-    
-    
-    def process_image(self, image):
-        # 1. Detect faces
-        boxes, scores = self.detector.detect_faces(image)
-        
-        # Apply non-maximum suppression
-        if len(boxes) > 0:
-            indices = cv2.dnn.NMSBoxes( 
-                boxes.tolist(), 
-                scores.tolist(), 
-                score_threshold=0.5, 
-                nms_threshold=0.3
-            )
-            
-            if len(indices) > 0:
-                # Handle the different return types based on OpenCV version
-                if isinstance(indices, tuple):  # OpenCV > 4.5.4
-                    indices = indices[0]
-                    
-                boxes = boxes[indices]
-                scores = scores[indices]
-        
-        results = []
-        for i, (box, score) in enumerate(zip(boxes, scores)):
-            # Format box to x1, y1, x2, y2
-            x1, y1, x2, y2 = map(int, box)
-            
-            # Make sure box coordinates are valid
-            x1, y1 = max(0, x1), max(0, y1)
-            x2, y2 = min(image.shape[1], x2), min(image.shape[0], y2)
-            
-            if x2 <= x1 or y2 <= y1:
-                continue  # Skip invalid boxes
-            
-            # 2. Get landmarks for alignment
-            landmarks = self.aligner.get_five_landmarks(image, (x1, y1, x2, y2))
-            if landmarks is None:
-                continue
-                
-            # Align face
-            aligned_face = self.aligner.align_face(image, landmarks)
-            if aligned_face is None:
-                continue
-            
-            # 3. Normalize face
-            normalized_face = normalize_face(aligned_face)
-            
-            # 4. Generate embedding
-            embedding = self.embedder.get_embedding(normalized_face)
-            
-            # 5. Verify face against database
-            name, confidence = self.verifier.find_best_match(embedding, threshold=0.67)
-            
-            # --- Tối ưu hóa Anti-spoofing ---
-            is_real = True  # Default to real for known faces initially
-            spoof_score = 0.0 # Default score
-            original_name = name # Lưu tên gốc trước khi kiểm tra fake
-
-            if name != "Unknown": # Chỉ kiểm tra real/fake nếu khuôn mặt được nhận diện
-                # 6. Anti spoofing for KNOWN faces
-                w, h = x2 - x1, y2 - y1
-                margin_x, margin_y = int(w * 0.1), int(h * 0.1)
-                face_x = max(0, x1 - margin_x)
-                face_y = max(0, y1 - margin_y)
-                face_w = min(image.shape[1] - face_x, w + 2 * margin_x)
-                face_h = min(image.shape[0] - face_y, h + 2 * margin_y)
-                facial_area = (face_x, face_y, face_w, face_h)
-                
-                try:
-                    is_real, spoof_score = self.fasnet.analyze(image, facial_area)
-                except Exception as e:
-                    print(f"Anti-spoofing error: {str(e)}")
-                    is_real = False # Mặc định là FAKE nếu có lỗi khi kiểm tra người đã biết
-                    spoof_score = -1.0 # Giá trị đặc biệt cho lỗi
-
-                # Mark fake faces only if they were initially recognized
-                if not is_real:
-                    name = f"FAKE: {original_name}" 
-            # else: # Khuôn mặt là "Unknown", không cần chạy anti-spoofing
-                # is_real vẫn là True (hoặc bạn có thể đặt là None/False tùy logic mong muốn)
-                # spoof_score vẫn là 0.0
-                # name vẫn là "Unknown"
-
-            results.append({
-                "box": (x1, y1, x2, y2),
-                "name": name, # Tên đã có thể bị sửa thành "FAKE: ..."
-                "confidence": confidence,
-                "embedding": embedding,
-                "is_real": is_real, # Chỉ có ý nghĩa nếu name != "Unknown" trong logic mới này
-                "spoof_score": spoof_score # Chỉ có ý nghĩa nếu name != "Unknown"
-            })
-            
-        return results
-
-    def add_face_with_augmentation(self, image, name):
-        """Thêm khuôn mặt vào cơ sở dữ liệu với các phiên bản tăng cường"""
-        results = self.process_image(image)
-        if not results:
-            print("❌ Không phát hiện được khuôn mặt")
-            return False
-        
-        # Lấy embedding ban đầu
-        embedding = results[0]["embedding"]
-        self.face_db[name] = embedding
-        
-        # Trích xuất khuôn mặt
-        x1, y1, x2, y2 = results[0]["box"]
-        face = image[y1:y2, x1:x2]
-        
-        # Tạo các phiên bản tăng cường mô phỏng các góc nghiêng khác nhau
-        augmented_images = []
-        
-        # Mô phỏng nhìn xuống bằng cách dịch hộp vùng cắt lên trên
-        shift_down = int((y2 - y1) * 0.15)  # Dịch 15%
-        if y1 - shift_down >= 0:
-            down_face = image[y1-shift_down:y2-shift_down, x1:x2]
-            augmented_images.append(("down", down_face))
-        
-        # Mô phỏng nhìn lên bằng cách dịch hộp vùng cắt xuống dưới
-        shift_up = int((y2 - y1) * 0.15)
-        if y2 + shift_up < image.shape[0]:
-            up_face = image[y1+shift_up:y2+shift_up, x1:x2]
-            augmented_images.append(("up", up_face))
-        
-        # Xử lý các hình ảnh đã tăng cường
-        for pose_type, aug_face in augmented_images:
-            # Thay đổi kích thước nếu cần
-            if aug_face.shape[:2] != (y2-y1, x2-x1):
-                aug_face = cv2.resize(aug_face, (x2-x1, y2-y1))
-                
-            # Xử lý khuôn mặt tăng cường này
-            try:
-                # Phát hiện landmarks
-                landmarks = self.aligner.get_five_landmarks(aug_face, (0, 0, aug_face.shape[1], aug_face.shape[0]))
-                if landmarks is None:
-                    continue
-                    
-                # Căn chỉnh và xử lý
-                aligned_face = self.aligner.align_face(aug_face, landmarks)
-                if aligned_face is None:
-                    continue
-                    
-                # Chuẩn hóa và tạo embedding
-                norm_face = normalize_face(aligned_face)
-                aug_embedding = self.embedder.get_embedding(norm_face)
-                
-                # Thêm vào cơ sở dữ liệu
-                aug_name = f"{name}_{pose_type}"
-                self.face_db[aug_name] = aug_embedding
-                print(f"✅ Đã thêm phiên bản {pose_type} cho '{name}'")
-            except Exception as e:
-                print(f"⚠️ Lỗi khi xử lý biến thể {pose_type}: {str(e)}")
-        
-        # Lưu cơ sở dữ liệu đã cập nhật
-        self.db_manager.face_db = self.face_db
-        self.db_manager._save_backup()
-        print(f"✅ Đã thêm khuôn mặt '{name}' vào cơ sở dữ liệu với các biến thể góc nhìn")
-        return True
-
-    def add_face_to_database(self, image, name):
-        results = self.process_image(image)
-        if results:
-            # Parse ID and name
-            parts = name.split('_', 1)
-            if len(parts) > 1 and parts[0].isalnum():
-                id_real = parts[0]
-                full_name = parts[1]
-            else:
-                # If no ID format provided, use name as both ID and name
-                id_real = name
-                full_name = name
-                
-                # Inform user about expected format
-                print(f"ℹ️ Tip: Use format 'ID_NAME' (e.g. '123_John Smith') for better organization")
-                
-            # Get the embedding
-            embedding = results[0]["embedding"]
-            
-            # Use db_manager.add_face instead of directly updating self.face_db
-            success = self.db_manager.add_face(name, id_real, full_name, embedding)
-            
-            if success:
-                print(f"✅ Added face for '{name}' (ID: {id_real}) to database via API")
-            else:
-                print(f"⚠️ Face was added to local database but API save failed")
-                
-            return success
-        return False
 
 class MotionController:
     """Motion controller using gpiozero's event-driven approach"""
@@ -260,7 +45,7 @@ class MotionController:
         
         if GPIO_AVAILABLE:
             try:
-                self.pir = MotionSensor(self.pin)
+                self.pir = gpiozero.MotionSensor(self.pin)
                 print(f"✅ PIR sensor initialized on GPIO pin {self.pin}")
                 
                 # Set up event handlers
@@ -415,93 +200,6 @@ class MotionController:
 #     else:
 #         return (0, 0, 255)  # Red
 
-def enhance_frame_for_detection(frame):
-    """
-    Cải thiện ánh sáng trên frame để tối ưu khả năng phát hiện khuôn mặt
-    Tập trung vào làm nổi bật đường viền và cấu trúc để phát hiện
-    
-    Args:
-        frame: Khung hình đầu vào (BGR)
-        
-    Returns:
-        Tuple (enhanced_frame, lighting_status)
-    """
-    # Đánh giá điều kiện ánh sáng
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    avg_brightness = cv2.mean(gray)[0]
-    std_dev = np.std(gray)
-    
-    # Phân loại điều kiện ánh sáng
-    if avg_brightness < 40:  # Quá tối
-        lighting_status = "Very Dark"
-    elif avg_brightness < 80:
-        lighting_status = "Too Dark"
-    elif avg_brightness > 220:
-        lighting_status = "Too Bright"
-    elif std_dev < 30:
-        lighting_status = "Low Contrast"
-    else:
-        # Nếu ánh sáng tốt, không cần xử lý
-        return frame, "Good"
-    
-    # Xử lý tùy thuộc vào điều kiện ánh sáng
-    if lighting_status in ["Very Dark", "Too Dark"]:
-        # Trường hợp quá tối: Tăng độ sáng và độ tương phản
-        # Tính toán mức độ điều chỉnh dựa trên độ tối
-        darkness_ratio = 1.0 - (avg_brightness / 120.0)  
-        darkness_ratio = min(max(darkness_ratio, 0), 1)  # Giới hạn trong [0,1]
-        
-        # Điều chỉnh alpha, beta dựa trên mức độ tối
-        alpha = 1.0 + darkness_ratio  # Từ 1.0 đến 2.0
-        beta = int(30 * darkness_ratio)  # Từ 0 đến 30
-        
-        # Áp dụng điều chỉnh trực tiếp
-        enhanced = cv2.convertScaleAbs(frame, alpha=alpha, beta=beta)
-        
-        # Cho trường hợp cực kỳ tối, thêm bước cân bằng histogram đơn giản
-        if lighting_status == "Very Dark":
-            # Chỉ áp dụng CLAHE cho trường hợp rất tối
-            # Sử dụng LAB để bảo tồn thông tin màu
-            lab = cv2.cvtColor(enhanced, cv2.COLOR_BGR2LAB)
-            l, a, b = cv2.split(lab)
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-            cl = clahe.apply(l)
-            enhanced_lab = cv2.merge((cl, a, b))
-            enhanced = cv2.cvtColor(enhanced_lab, cv2.COLOR_LAB2BGR)
-            
-        return enhanced, lighting_status
-        
-    elif lighting_status == "Too Bright":
-        # Trường hợp quá sáng: Giảm độ sáng
-        brightness_ratio = (avg_brightness - 180) / 75.0  # Từ 0 đến 1
-        brightness_ratio = min(max(brightness_ratio, 0), 1)
-        
-        # Giảm độ tương phản và độ sáng
-        alpha = 1.0 - (0.3 * brightness_ratio)  # Từ 1.0 đến 0.7
-        beta = int(-20 * brightness_ratio)  # Từ 0 đến -20
-        
-        enhanced = cv2.convertScaleAbs(frame, alpha=alpha, beta=beta)
-        return enhanced, lighting_status
-        
-    elif lighting_status == "Low Contrast":
-        # Trường hợp độ tương phản thấp: Tăng độ tương phản
-        # Sử dụng CLAHE nhẹ trong không gian LAB
-        lab = cv2.cvtColor(frame, cv2.COLOR_BGR2LAB)
-        l, a, b = cv2.split(lab)
-        
-        # Áp dụng CLAHE cho kênh L
-        clahe = cv2.createCLAHE(clipLimit=2.5, tileGridSize=(8, 8))
-        cl = clahe.apply(l)
-        
-        # Kết hợp và chuyển về BGR
-        enhanced_lab = cv2.merge((cl, a, b))
-        enhanced = cv2.cvtColor(enhanced_lab, cv2.COLOR_LAB2BGR)
-        
-        return enhanced, lighting_status
-    
-    # Trường hợp mặc định nếu không khớp với các điều kiện trên
-    return frame, "No Enhancement"
-  
 def draw_results(image, results):
     """Draw bounding boxes and names on the image"""
     for result in results:
@@ -538,6 +236,10 @@ def add_face_handler(ui, cap, face_system, motion_controller):
     1. Using the last frame if in standby
     2. Temporarily forcing active mode
     """
+    if not face_system.is_ready():
+        print("⏳ Models are still loading, try again in a moment")
+        return
+    
     was_standby = not motion_controller.is_active()
     
     # Force active mode if needed
@@ -567,21 +269,79 @@ def add_face_handler(ui, cap, face_system, motion_controller):
         time.sleep(3)
         motion_controller.force_active(False)
 
-def webcam_demo():
-    """Demo face recognition using webcam with motion-based power saving"""
+def print_runtime_stats(face_system):
+    """In thống kê cache/liveness/cascade khi thoát"""
+    for source_id, pipeline in face_system.pipelines.items():
+        prefix = f"[{source_id}] " if source_id is not None else ""
+        cache_stats = pipeline.embedding_cache.stats()
+        print(f"{prefix}Embedding cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+              f"(hit rate {cache_stats['hit_rate']:.1%})")
+        liveness_stats = pipeline.liveness.stats()
+        print(f"{prefix}Liveness: {liveness_stats['model_calls']} antispoof runs, "
+              f"{liveness_stats['skipped_calls']} skipped after a decision ({liveness_stats['skip_rate']:.1%})")
+    if face_system.fasnet is not None and face_system.fasnet.cascade:
+        spoof_stats = face_system.fasnet.cascade_stats()
+        print(f"Antispoof cascade: {spoof_stats['first_stage_rate']:.1%} first stage only, "
+              f"{spoof_stats['models_per_face']:.2f} models/face over {spoof_stats['faces']} faces")
+
+def webcam_demo(sources=None, display="pygame", display_options=None, stream_options=None,
+                profile=False, metrics_port=None):
+    """
+    Demo face recognition using webcam with motion-based power saving
+
+    Args:
+        sources: List nguồn video (chỉ số USB, URL RTSP/MJPEG, video file); mặc định webcam 0.
+            Frame của mọi nguồn được nhận diện chung một batch, UI hiển thị một nguồn (phím 'c' để đổi)
+        display: Backend hiển thị trong DISPLAY_BACKENDS ("pygame", "headless", "mjpeg")
+        display_options: Dict tham số cho backend (ví dụ {"port": 8080} cho mjpeg)
+        stream_options: Dict tham số MjpegStreamer (port, quality, width) để phát frame camera gốc của
+            nguồn đầu tiên, thay cho camera.py mở cùng thiết bị lần nữa; None để không phát
+        profile: Bật đo thời gian từng stage ngay từ đầu (phím 'p' bật/tắt overlay khi đang chạy)
+        metrics_port: Cổng phục vụ /metrics kiểu Prometheus (bật profiler); None để không mở
+    """
     print("Initializing face recognition system...")
-    face_system = FaceRecognitionSystem()
-    print("System initialized! Opening webcam...")
-    ui = FaceRecognitionUI()
+    # Model được nạp trong nền để UI và camera dùng được ngay
+    profiler = StageProfiler(enabled=profile or metrics_port is not None)
+    face_system = FaceRecognitionSystem(background=True, profiler=profiler)
+    ui = create_display(display, **(display_options or {}))
     ui.face_recognition_system = face_system
     
-    # Open webcam
-    cap = VideoCaptureThread().start()
-    print("Webcam opened successfully!")
+    # Open every video source, each one with its own reader thread
+    cap = CaptureManager()
+    for src in sources or [0]:
+        cap.add_source(src)
+    metrics_server = None
+    if metrics_port is not None:
+        # FPS của từng nguồn được xuất cùng thời gian các stage
+        metrics_server = MetricsServer(profiler, port=metrics_port, gauges=lambda: {
+            f"capture_fps_{source_id}": stats["fps"] for source_id, stats in cap.stats().items()
+        }).start()
+    
+    streamer = None
+    if stream_options is not None:
+        # Frame gốc được chia sẻ trực tiếp từ reader thread, encoder chỉ chạy khi có client
+        streamer = MjpegStreamer(**stream_options).start()
+        cap.add_listener(streamer.on_frame)
+    cap.start()
+    print(f"Opened video sources: {', '.join(cap.source_ids)}")
+    display_index = 0
     
     # Initialize variables
     use_enhancement = True
+    # Re-estimate lighting every 10 frames, enhance with a cached LUT in between (one per source)
+    lighting = {source_id: LightingEnhancer(refresh_interval=10) for source_id in cap.source_ids}
+    lighting_statuses = {}  # source_id -> trạng thái ánh sáng gần nhất, vẽ lên bản sao để hiển thị
+    
+    # Recognition runs in a worker thread, the UI renders every camera frame with boxes
+    # interpolated from the most recent result of each source
+    worker = RecognitionWorker(face_system).start()
+    interpolators = {source_id: BoxInterpolator() for source_id in cap.source_ids}
+    last_sequence = 0
+    last_result_time = 0.0
     last_frame = None
+    show_profile = profile
+    profile_lines = []
+    profile_refreshed = 0.0
     
     # Create standby frame
     blank_frame = np.zeros((480, 640, 3), dtype=np.uint8)
@@ -599,8 +359,9 @@ def webcam_demo():
         else:
             print("🛑 System entering low-power standby")
             # Save the last good frame when entering standby
-            if cap is not None:
-                last_frame = cap.read().copy()
+            frame = cap.read(cap.source_ids[display_index])
+            if frame is not None:
+                last_frame = frame.copy()
             # Clear recognition results when entering standby
             ui.update_recognition_results([])
     
@@ -618,19 +379,39 @@ def webcam_demo():
         motion_controller.force_active(not motion_controller.is_active())
         print(f"Motion detection: {'OVERRIDDEN' if motion_controller.is_active() else 'ENABLED'}")
     
-    # Register the handlers
-    ui.register_key_handler(pygame.K_a, 
-                           lambda: add_face_handler(ui, cap, face_system, motion_controller))
-    ui.register_key_handler(pygame.K_e, toggle_enhancement_handler)
-    ui.register_key_handler(pygame.K_m, toggle_motion_handler)
-    
-    # Print instructions
-    print("\n--- CONTROLS ---")
-    print("Press 'a' to add a face to the database")
-    print("Press 'e' to toggle lighting enhancement")
-    print("Press 'm' to toggle motion detection")
-    print("Press ESC to exit")
-    print("--------------\n")
+    def toggle_profile_handler():
+        nonlocal show_profile
+        show_profile = not show_profile
+        if show_profile:
+            profiler.enabled = True
+        print(f"Stage timing overlay: {'ON' if show_profile else 'OFF'}")
+    
+    def next_source_handler():
+        nonlocal display_index
+        display_index = (display_index + 1) % len(cap.source_ids)
+        ui.update_recognition_results([])
+        print(f"Displaying source: {cap.source_ids[display_index]}")
+    
+    if ui.interactive:
+        # Register the handlers
+        ui.register_key_handler(pygame.K_a, 
+                               lambda: add_face_handler(ui, cap.sources[cap.source_ids[display_index]], face_system, motion_controller))
+        ui.register_key_handler(pygame.K_e, toggle_enhancement_handler)
+        ui.register_key_handler(pygame.K_m, toggle_motion_handler)
+        ui.register_key_handler(pygame.K_c, next_source_handler)
+        ui.register_key_handler(pygame.K_p, toggle_profile_handler)
+        
+        # Print instructions
+        print("\n--- CONTROLS ---")
+        print("Press 'a' to add a face to the database")
+        print("Press 'e' to toggle lighting enhancement")
+        print("Press 'm' to toggle motion detection")
+        print("Press 'c' to switch the displayed camera")
+        print("Press 'p' to toggle the stage timing overlay")
+        print("Press ESC to exit")
+        print("--------------\n")
+    else:
+        print(f"Running without a keyboard ({display} display), press Ctrl+C to exit")
     
     while True:
         # Handle all events (keyboard, quit, etc.)
@@ -648,66 +429,127 @@ def webcam_demo():
             ui.update_recognition_results([])
             ui.update_frame(blank_frame)
             ui.draw_ui()
-            pygame.time.delay(100)  # Longer delay in standby
+            time.sleep(0.1)  # Longer delay in standby
             continue
         
-        # Get current frame from camera
-        frame = cap.read()
-        if frame is None:
+        # Get the new frames of every source
+        frames = cap.poll()
+        if not frames:
+            if not cap.is_running():
+                break  # every source was a video file and all of them ended
+            time.sleep(0.005)
             continue
+        display_id = cap.source_ids[display_index]
         
-        # Process current frame (active mode)
-        # Store the frame for potential face registration
-        last_frame = frame.copy()
-        
-        # If a key was pressed to start adding a face, capture the current frame
-        if ui.input_active and ui.input_purpose == "add_face" and ui.captured_frame is None:
-            ui.captured_frame = frame.copy()
-        
-        # Apply lighting enhancements if enabled
-        if use_enhancement:
-            processed_frame, lighting_status = enhance_frame_for_detection(frame)
+        processed_frames = {}
+        for source_id, captured in frames.items():
+            frame = captured.image
+            
+            if source_id == display_id:
+                # Store the frame for potential face registration
+                last_frame = frame.copy()
+                
+                # If a key was pressed to start adding a face, capture the current frame
+                if ui.input_active and ui.input_purpose == "add_face" and ui.captured_frame is None:
+                    ui.captured_frame = frame.copy()
+            
+            # Apply lighting enhancements if enabled
+            # (không vẽ lên processed_frame: khi không cần tăng cường nó chính là captured.image,
+            # frame gốc mà listener như MjpegStreamer có thể đang encode)
+            if use_enhancement:
+                processed_frame, lighting_statuses[source_id] = lighting[source_id].enhance(frame)
+            else:
+                processed_frame = frame
+            processed_frames[source_id] = processed_frame
+        
+        # Recognition runs on its own cadence in the worker; only the newest frames are kept
+        worker.submit({sid: (processed_frames[sid], frames[sid].timestamp) for sid in processed_frames})
+        
+        # Process face recognition events once per new recognition result
+        sequence, latest = worker.latest()
+        if sequence != last_sequence:
+            last_sequence = sequence
+            for source_id, recognition in latest.items():
+                if recognition.finished_at <= last_result_time:
+                    continue
+                interpolators[source_id].update(recognition.results, recognition.frame_timestamp)
+                for res in recognition.results:
+                    is_real = res.get("is_real", True)
+                    name = res["name"]
+                    # Chỉ ghi nhận khi liveness của track đã được kết luận là thật
+                    if name != "Unknown" and is_real and res.get("liveness") != LivenessAccumulator.PENDING:
+                        ui.add_event(name, is_real)
+                        # When a face is recognized, reset the motion timeout
+                        # No need to explicitly reset with event-based approach
+            last_result_time = max(recognition.finished_at for recognition in latest.values())
+        
+        # Display the newest frame at display rate, boxes moved to the frame's capture time
+        # (headless backends, or mjpeg with no viewer, skip this entirely)
+        if display_id in processed_frames and ui.renders_frames:
+            display_time = frames[display_id].timestamp
+            # Bản sao vì worker có thể vẫn đang đọc processed frame
+            display_frame = processed_frames[display_id].copy()
             
             # Hiển thị trạng thái ánh sáng
-            if lighting_status == "Good":
-                status_color = (0, 255, 0)  # Xanh lá
-            elif lighting_status in ["Low Contrast"]:
-                status_color = (0, 165, 255)  # Cam
+            if use_enhancement:
+                lighting_status = lighting_statuses.get(display_id, "Good")
+                if lighting_status == "Good":
+                    status_color = (0, 255, 0)  # Xanh lá
+                elif lighting_status in ["Low Contrast"]:
+                    status_color = (0, 165, 255)  # Cam
+                else:
+                    status_color = (0, 0, 255)  # Đỏ
+                cv2.putText(display_frame, f"Lighting: {lighting_status}",
+                        (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, status_color, 2)
             else:
-                status_color = (0, 0, 255)  # Đỏ
-                
-            cv2.putText(processed_frame, f"Lighting: {lighting_status}", 
-                    (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, status_color, 2)
-        else:
-            processed_frame = frame
-            cv2.putText(processed_frame, "Enhancement OFF", 
-                    (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-        
-        # Process frame with face recognition system
-        results = face_system.process_image(processed_frame)
-        
-        # Update UI with recognition results
-        ui.update_recognition_results(results)
-        
-        # Process face recognition events
-        for res in results:
-            is_real = res.get("is_real", True)
-            name = res["name"]
-            if name != "Unknown" and is_real:
-                ui.add_event(name, is_real)
-                # When a face is recognized, reset the motion timeout
-                # No need to explicitly reset with event-based approach
+                cv2.putText(display_frame, "Enhancement OFF",
+                        (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+            
+            # Hiển thị tiến trình nạp model cho tới khi hệ thống sẵn sàng
+            if not face_system.is_ready():
+                cv2.putText(display_frame, face_system.loading_status(),
+                        (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+            elif display_id in latest:
+                # Frame age: how much older the frame behind the boxes is than the shown frame
+                lag_ms = max(0.0, display_time - latest[display_id].frame_timestamp) * 1000
+                lag_color = (0, 255, 0) if lag_ms < 150 else (0, 165, 255) if lag_ms < 500 else (0, 0, 255)
+                cv2.putText(display_frame, f"Inference lag: {lag_ms:.0f} ms",
+                        (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.5, lag_color, 1)
+            
+            if show_profile:
+                # Percentile được tính lại hai lần mỗi giây, không phải mỗi frame
+                if time.time() - profile_refreshed > 0.5:
+                    profile_lines = profiler.summary_lines()
+                    profile_refreshed = time.time()
+                for row, line in enumerate(profile_lines):
+                    cv2.putText(display_frame, line, (10, 85 + 18 * row),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 0), 1)
+            
+            ui.update_recognition_results(interpolators[display_id].predict(display_time))
+            ui.update_frame(display_frame)
         
-        # Update frame and draw UI 
-        ui.update_frame(processed_frame)
+        # Draw UI 
         ui.draw_ui()
         
         # Small delay to prevent CPU hogging
-        pygame.time.delay(10)
+        time.sleep(0.001)
     
     # Clean up
+    worker.stop()
+    worker_stats = worker.stats()
+    print(f"Recognition worker: {worker_stats['processed']} batches, {worker_stats['avg_time_ms']:.1f} ms avg, "
+          f"{worker_stats['replaced']} stale submissions replaced")
+    if face_system.is_ready():
+        print_runtime_stats(face_system)
+    profiler.report()
+    cap.report()
     motion_controller.cleanup()
     cap.stop()
+    if streamer is not None:
+        streamer.report()
+        streamer.stop()
+    if metrics_server is not None:
+        metrics_server.stop()
     ui.close()
     cv2.destroyAllWindows()
 
@@ -736,14 +578,34 @@ def image_demo(image_path):
     cv2.destroyAllWindows()
 
 if __name__ == "__main__":
-    import sys
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Face recognition attendance system")
+    parser.add_argument("image", nargs="?", help="process a single image instead of running the camera demo")
+    parser.add_argument("--source", action="append", dest="sources",
+                        help="video source: USB index, RTSP/MJPEG URL or video file (repeat for several cameras)")
+    parser.add_argument("--display", choices=DISPLAY_BACKENDS, default="pygame",
+                        help="pygame window, headless (no rendering) or mjpeg (annotated HTTP preview)")
+    parser.add_argument("--mjpeg-port", type=int, default=8080, help="port of the mjpeg preview (/video)")
+    parser.add_argument("--stream-port", type=int, default=None,
+                        help="also serve the raw frames of the first source as MJPEG on this port (/video)")
+    parser.add_argument("--stream-quality", type=int, default=80, help="JPEG quality of --stream-port")
+    parser.add_argument("--stream-width", type=int, default=None, help="resize the --stream-port stream to this width")
+    parser.add_argument("--profile", action="store_true", help="time every pipeline stage and show the overlay")
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve Prometheus metrics on this port (/metrics)")
+    args = parser.parse_args()
     
     try:
-        if len(sys.argv) > 1:
+        if args.image:
             # Process image file provided as argument
-            image_demo(sys.argv[1])
+            image_demo(args.image)
         else:
             # Run webcam demo
-            webcam_demo()
+            display_options = {"port": args.mjpeg_port} if args.display == "mjpeg" else None
+            stream_options = None
+            if args.stream_port is not None:
+                stream_options = {"port": args.stream_port, "quality": args.stream_quality, "width": args.stream_width}
+            webcam_demo(args.sources, args.display, display_options, stream_options,
+                        profile=args.profile, metrics_port=args.metrics_port)
     except Exception as e:
         print(f"Error: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,162 @@
+import threading
+import time
+
+import numpy as np
+
+
+class RollingHistogram:
+    """
+    Thời gian của một stage trong cửa sổ trượt (window lần đo gần nhất) để tính p50/p95/p99,
+    kèm tổng số lần đo và tổng thời gian từ lúc bắt đầu (cho counter kiểu Prometheus).
+    """
+
+    def __init__(self, window=1024):
+        self._values = np.zeros(window, dtype=np.float64)
+        self._index = 0
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds):
+        with self._lock:
+            self._values[self._index] = seconds
+            self._index = (self._index + 1) % len(self._values)
+            self.count += 1
+            self.total += seconds
+
+    def snapshot(self, quantiles=(50, 95, 99)):
+        """
+        Returns:
+            Dict {"count", "total", "mean", "p50", "p95", "p99"} (giây), percentile tính trên cửa sổ
+        """
+        with self._lock:
+            window = self._values[:min(self.count, len(self._values))].copy()
+            count, total = self.count, self.total
+        stats = {"count": count, "total": total, "mean": total / count if count else 0.0}
+        values = np.percentile(window, quantiles) if len(window) else np.zeros(len(quantiles))
+        for q, value in zip(quantiles, values):
+            stats[f"p{q}"] = float(value)
+        return stats
+
+
+class _StageTimer:
+    """Context manager đo một lần chạy của stage"""
+
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._histogram.record(time.perf_counter() - self._start)
+        return False
+
+
+class _NullTimer:
+    """Timer không làm gì, dùng chung khi profiler tắt"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class StageProfiler:
+    """
+    Đo thời gian từng stage của pipeline (detect, landmarks, align, normalize, embed, match,
+    antispoof...) và đếm sự kiện (frames, faces, cache hit...).
+
+        with profiler.stage("detect"):
+            boxes, scores = detector.detect_faces(image)
+        profiler.count("faces", len(boxes))
+
+    Khi tắt (enabled=False), stage() trả về một timer rỗng dùng chung và count() trả về ngay,
+    nên instrumentation gần như không tốn gì. Có thể bật/tắt khi đang chạy.
+    """
+
+    def __init__(self, enabled=True, window=1024):
+        """
+        Args:
+            enabled: Bật đo ngay từ đầu
+            window: Số lần đo gần nhất của mỗi stage dùng để tính percentile
+        """
+        self.enabled = enabled
+        self.window = window
+        self._histograms = {}  # stage -> RollingHistogram
+        self._counters = {}  # name -> int
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        """Context manager đo một lần chạy của stage name"""
+        if not self.enabled:
+            return _NULL_TIMER
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histogram(name)
+        return _StageTimer(histogram)
+
+    def record(self, name, seconds):
+        """Ghi thời gian đã đo sẵn cho stage name"""
+        if not self.enabled:
+            return
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histogram(name)
+        histogram.record(seconds)
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def _histogram(self, name):
+        with self._lock:
+            return self._histograms.setdefault(name, RollingHistogram(self.window))
+
+    def snapshot(self):
+        """
+        Returns:
+            Dict {"stages": {stage: {"count", "total", "mean", "p50", "p95", "p99"}}, "counters": {...}}
+        """
+        with self._lock:
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+        return {
+            "stages": {name: histogram.snapshot() for name, histogram in histograms.items()},
+            "counters": counters,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+            self._counters = {}
+
+    def summary_lines(self):
+        """Một dòng cho mỗi stage: "detect  p50 4.1 / p95 6.3 / p99 9.0 ms (n=1234)" """
+        lines = []
+        for name, stats in self.snapshot()["stages"].items():
+            lines.append(f"{name:<10} p50 {1000 * stats['p50']:.1f} / p95 {1000 * stats['p95']:.1f} / "
+                         f"p99 {1000 * stats['p99']:.1f} ms (n={stats['count']})")
+        return lines
+
+    def report(self):
+        """In thời gian từng stage và các counter"""
+        snapshot = self.snapshot()
+        if not snapshot["stages"] and not snapshot["counters"]:
+            return
+        print("⏱️ Pipeline stages:")
+        for line in self.summary_lines():
+            print(f"   {line}")
+        if snapshot["counters"]:
+            print("   " + ", ".join(f"{name}={value}" for name, value in snapshot["counters"].items()))
@@ -0,0 +1,99 @@
+# Endpoint metrics kiểu Prometheus cho StageProfiler: GET /metrics trả về text exposition format.
+#
+#   face_stage_seconds{stage="detect",quantile="0.95"} 0.0061
+#   face_stage_seconds_sum{stage="detect"} 12.3
+#   face_stage_seconds_count{stage="detect"} 2048
+#   face_frames_total 2048
+#
+# Quantile tính trên cửa sổ trượt của profiler, _sum/_count tính từ lúc bắt đầu.
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "face"
+
+
+def _metric_name(name):
+    return "".join(c if c.isalnum() else "_" for c in name)
+
+
+def render_prometheus(profiler, gauges=None):
+    """
+    Args:
+        profiler: StageProfiler
+        gauges: Dict tùy chọn {tên: giá trị} được xuất thêm dạng gauge (ví dụ fps của camera)
+
+    Returns:
+        Chuỗi text exposition format
+    """
+    snapshot = profiler.snapshot()
+    lines = []
+    if snapshot["stages"]:
+        lines.append(f"# HELP {PREFIX}_stage_seconds Duration of each recognition pipeline stage")
+        lines.append(f"# TYPE {PREFIX}_stage_seconds summary")
+        for stage, stats in snapshot["stages"].items():
+            for q in (50, 95, 99):
+                lines.append(f'{PREFIX}_stage_seconds{{stage="{stage}",quantile="{q / 100:g}"}} {stats[f"p{q}"]:.6f}')
+            lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{stage}"}} {stats["total"]:.6f}')
+            lines.append(f'{PREFIX}_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+    for name, value in snapshot["counters"].items():
+        metric = f"{PREFIX}_{_metric_name(name)}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    for name, value in (gauges or {}).items():
+        metric = f"{PREFIX}_{_metric_name(name)}"
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Server HTTP cục bộ phục vụ /metrics cho Prometheus (hoặc curl)"""
+
+    def __init__(self, profiler, host="127.0.0.1", port=9100, gauges=None):
+        """
+        Args:
+            profiler: StageProfiler cần xuất
+            host, port: Địa chỉ lắng nghe
+            gauges: Hàm tùy chọn trả về dict {tên: giá trị} gauge tại thời điểm scrape
+        """
+        self.profiler = profiler
+        self.gauges = gauges
+        self.host = host
+        self.port = port
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        self.server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+        self.thread.start()
+        print(f"📈 Metrics on http://{self.host}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass  # không in log cho mỗi lần scrape
+
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404, "Use /metrics")
+                    return
+                gauges = server.gauges() if server.gauges is not None else None
+                body = render_prometheus(server.profiler, gauges).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
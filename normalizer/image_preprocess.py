@@ -1,3 +1,5 @@
+import threading
+
 import cv2
 import numpy as np
 
@@ -6,41 +8,115 @@ import numpy as np
 #     img_normalized = img_resized.astype(np.float32) / 255.0
 #     return img_normalized
 
-def normalize_face(img, target_size=(112, 112)):
+
+class FacePreprocessor:
+    """
+    Bộ chuẩn hóa khuôn mặt dùng lại CLAHE và các buffer trung gian giữa các lần gọi.
+
+    Bước chia 255 và chuẩn hóa theo mean/std được gộp thành một bảng LUT float32 256 phần tử,
+    áp dụng bằng một lần cv2.LUT ghi thẳng vào buffer đầu ra (không upcast sang float64).
+    Mỗi instance giữ buffer riêng nên không dùng chung giữa các thread.
+    """
+
+    def __init__(self, target_size=(112, 112), clip_limit=2.0, tile_grid_size=(8, 8),
+                 mean=(0.5, 0.5, 0.5), std=(0.5, 0.5, 0.5)):
+        """
+        Args:
+            target_size: Kích thước đầu ra (mặc định: 112x112 cho MobileFaceNet)
+            clip_limit, tile_grid_size: Tham số CLAHE cho kênh độ sáng
+            mean, std: Giá trị chuẩn hóa theo kênh (BGR) trên thang [0, 1]
+        """
+        self.target_size = target_size
+        self.clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=tile_grid_size)
+
+        # LUT 3 kênh: lut[v, c] = (v / 255 - mean[c]) / std[c]
+        values = np.arange(256, dtype=np.float32)[:, None] / 255.0
+        lut = (values - np.asarray(mean, dtype=np.float32)) / np.asarray(std, dtype=np.float32)
+        self.lut = np.ascontiguousarray(lut.astype(np.float32).reshape(1, 256, 3))
+
+        width, height = target_size
+        self._resized = np.empty((height, width, 3), dtype=np.uint8)
+        self._lab = np.empty((height, width, 3), dtype=np.uint8)
+        self._luminance = np.empty((height, width), dtype=np.uint8)
+        self._enhanced = np.empty((height, width, 3), dtype=np.uint8)
+
+    def output_shape(self):
+        width, height = self.target_size
+        return (height, width, 3)
+
+    def normalize(self, img, out=None):
+        """
+        Chuẩn hóa một khuôn mặt BGR uint8
+
+        Args:
+            img: Ảnh khuôn mặt đầu vào (BGR)
+            out: Buffer float32 (H, W, 3) liên tục để ghi kết quả; cấp phát mới nếu None
+
+        Returns:
+            Ảnh khuôn mặt đã được chuẩn hóa (float32, chính là `out` nếu được truyền vào)
+        """
+        if out is None:
+            out = np.empty(self.output_shape(), dtype=np.float32)
+
+        # Resize về kích thước chuẩn (bỏ qua nếu ảnh đã đúng kích thước, ví dụ ảnh đã căn chỉnh)
+        if img.shape[1::-1] == tuple(self.target_size):
+            resized = img
+        else:
+            resized = cv2.resize(img, self.target_size, dst=self._resized)
+
+        # CLAHE trên kênh L của không gian LAB, không tách/ghép lại toàn bộ ảnh
+        cv2.cvtColor(resized, cv2.COLOR_BGR2LAB, dst=self._lab)
+        cv2.extractChannel(self._lab, 0, dst=self._luminance)
+        self.clahe.apply(self._luminance, dst=self._luminance)
+        cv2.insertChannel(self._luminance, self._lab, 0)
+        cv2.cvtColor(self._lab, cv2.COLOR_LAB2BGR, dst=self._enhanced)
+
+        # Scale + mean/std trong một lần tra bảng float32
+        cv2.LUT(self._enhanced, self.lut, dst=out)
+        return out
+
+    def normalize_batch(self, faces, out=None):
+        """
+        Chuẩn hóa tất cả khuôn mặt trong một frame vào một mảng (N, H, W, 3)
+
+        Args:
+            faces: List ảnh khuôn mặt BGR
+            out: Buffer float32 có ít nhất len(faces) phần tử theo trục 0
+
+        Returns:
+            View (N, H, W, 3) của buffer đầu ra
+        """
+        count = len(faces)
+        if out is None:
+            out = np.empty((count,) + self.output_shape(), dtype=np.float32)
+        batch = out[:count]
+        for i, face in enumerate(faces):
+            self.normalize(face, out=batch[i])
+        return batch
+
+
+# Mỗi thread dùng một FacePreprocessor riêng vì buffer trung gian được dùng lại
+_thread_local = threading.local()
+
+
+def _default_preprocessor(target_size):
+    preprocessor = getattr(_thread_local, "preprocessor", None)
+    if preprocessor is None or tuple(preprocessor.target_size) != tuple(target_size):
+        preprocessor = FacePreprocessor(target_size=target_size)
+        _thread_local.preprocessor = preprocessor
+    return preprocessor
+
+
+def normalize_face(img, target_size=(112, 112), out=None):
     """
     Chuẩn hóa khuôn mặt với độ ổn định cao trong các điều kiện ánh sáng khác nhau
-    
+
     Args:
         img: Ảnh khuôn mặt đầu vào (BGR)
         target_size: Kích thước đầu ra (mặc định: 112x112 cho MobileFaceNet)
-        
+        out: Buffer float32 tùy chọn để ghi kết quả
+
     Returns:
-        Ảnh khuôn mặt đã được chuẩn hóa
+        Ảnh khuôn mặt đã được chuẩn hóa (float32, giá trị trong [-1, 1])
     """
-    # Resize về kích thước chuẩn
-    img_resized = cv2.resize(img, target_size)
-    
-    # Chuyển đổi sang không gian màu LAB để tách riêng kênh độ sáng
-    lab = cv2.cvtColor(img_resized, cv2.COLOR_BGR2LAB)
-    l, a, b = cv2.split(lab)
-    
-    # Áp dụng CLAHE cho kênh độ sáng (L)
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    cl = clahe.apply(l)
-    
-    # Kết hợp lại các kênh
-    enhanced_lab = cv2.merge((cl, a, b))
-    
-    # Chuyển trở lại BGR
-    enhanced_bgr = cv2.cvtColor(enhanced_lab, cv2.COLOR_LAB2BGR)
-    
-    # Chuẩn hóa giá trị pixel về phạm vi [0, 1]
-    img_normalized = enhanced_bgr.astype(np.float32) / 255.0
-    
-    # Chuẩn hóa theo giá trị trung bình và độ lệch chuẩn (tùy chọn)
-    # Sử dụng giá trị tiêu chuẩn cho nhận dạng khuôn mặt
-    mean = np.array([0.5, 0.5, 0.5])
-    std = np.array([0.5, 0.5, 0.5])
-    img_normalized = (img_normalized - mean) / std
-    
-    return img_normalized
\ No newline at end of file
+    return _default_preprocessor(target_size).normalize(img, out=out)
@@ -0,0 +1,179 @@
+import cv2
+import numpy as np
+
+
+class LightingEnhancer:
+    """
+    Cải thiện ánh sáng cho frame trước khi phát hiện khuôn mặt với chi phí thấp.
+
+    Điều kiện ánh sáng chỉ được đánh giá lại mỗi `refresh_interval` frame từ histogram
+    của ảnh xám đã lấy mẫu thưa, rồi dựng các bảng LUT 256 phần tử thay cho xử lý từng pixel:
+    - tăng/giảm sáng (Too Dark, Very Dark, Too Bright): một cv2.LUT trên BGR, được lưu theo trạng thái
+      và mức độ sáng đã lượng tử hóa
+    - cân bằng histogram có giới hạn (Very Dark, Low Contrast): LUT trên kênh L của LAB để giữ màu như
+      CLAHE trước đây; phụ thuộc hình dạng histogram nên được tính lại ở mỗi lần đánh giá
+    """
+
+    GOOD = "Good"
+    VERY_DARK = "Very Dark"
+    TOO_DARK = "Too Dark"
+    TOO_BRIGHT = "Too Bright"
+    LOW_CONTRAST = "Low Contrast"
+
+    def __init__(self, refresh_interval=10, sample_step=4, brightness_bucket=8,
+                 clip_limit=2.0, low_contrast_clip_limit=2.5, max_cached_luts=64):
+        """
+        Args:
+            refresh_interval: Số frame giữa hai lần đánh giá lại ánh sáng
+            sample_step: Bước lấy mẫu pixel theo mỗi chiều khi tính histogram
+            brightness_bucket: Độ rộng (mức xám) của mỗi nhóm độ sáng dùng làm khóa cache LUT tham số
+            clip_limit: Giới hạn cân bằng histogram cho trường hợp rất tối
+            low_contrast_clip_limit: Giới hạn cân bằng histogram cho trường hợp tương phản thấp
+            max_cached_luts: Số LUT tối đa được lưu
+        """
+        self.refresh_interval = max(1, refresh_interval)
+        self.sample_step = max(1, sample_step)
+        self.brightness_bucket = brightness_bucket
+        self.clip_limit = clip_limit
+        self.low_contrast_clip_limit = low_contrast_clip_limit
+        self.max_cached_luts = max_cached_luts
+
+        self.status = self.GOOD
+        self.avg_brightness = 0.0
+        self.std_dev = 0.0
+        self._lut = None  # LUT trên cả 3 kênh BGR (tăng/giảm sáng)
+        self._l_lut = None  # LUT trên kênh L của LAB (cân bằng histogram)
+        self._lut_cache = {}
+        self._frame_count = 0
+
+    def _sample(self, frame):
+        return np.ascontiguousarray(frame[::self.sample_step, ::self.sample_step])
+
+    def estimate(self, frame):
+        """
+        Đánh giá điều kiện ánh sáng từ histogram của ảnh xám đã lấy mẫu thưa
+
+        Returns:
+            Tuple (lighting_status, histogram, avg_brightness, std_dev)
+        """
+        sampled = self._sample(frame)
+        gray = cv2.cvtColor(sampled, cv2.COLOR_BGR2GRAY) if sampled.ndim == 3 else sampled
+        hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+
+        total = hist.sum()
+        levels = np.arange(256, dtype=np.float32)
+        avg_brightness = float(np.dot(hist, levels) / total)
+        std_dev = float(np.sqrt(max(np.dot(hist, (levels - avg_brightness) ** 2) / total, 0.0)))
+
+        # Phân loại điều kiện ánh sáng
+        if avg_brightness < 40:  # Quá tối
+            status = self.VERY_DARK
+        elif avg_brightness < 80:
+            status = self.TOO_DARK
+        elif avg_brightness > 220:
+            status = self.TOO_BRIGHT
+        elif std_dev < 30:
+            status = self.LOW_CONTRAST
+        else:
+            status = self.GOOD
+        return status, hist, avg_brightness, std_dev
+
+    def enhance(self, frame):
+        """
+        Cải thiện ánh sáng trên frame để tối ưu khả năng phát hiện khuôn mặt
+
+        Args:
+            frame: Khung hình đầu vào (BGR)
+
+        Returns:
+            Tuple (enhanced_frame, lighting_status); trả về chính `frame` nếu ánh sáng tốt
+        """
+        if self._frame_count % self.refresh_interval == 0:
+            self._refresh(frame)
+        self._frame_count += 1
+
+        if self._lut is None and self._l_lut is None:
+            return frame, self.status
+
+        enhanced = cv2.LUT(frame, self._lut) if self._lut is not None else frame
+        if self._l_lut is not None:
+            enhanced = self._apply_l_lut(enhanced, self._l_lut)
+        return enhanced, self.status
+
+    @staticmethod
+    def _apply_l_lut(image, l_lut):
+        """Áp dụng LUT lên kênh L của LAB để giữ nguyên màu (a, b), như CLAHE trên kênh L trước đây"""
+        if image.ndim == 2:
+            return cv2.LUT(image, l_lut)
+        l, a, b = cv2.split(cv2.cvtColor(image, cv2.COLOR_BGR2LAB))
+        return cv2.cvtColor(cv2.merge((cv2.LUT(l, l_lut), a, b)), cv2.COLOR_LAB2BGR)
+
+    def _refresh(self, frame):
+        status, hist, avg_brightness, std_dev = self.estimate(frame)
+        self.status = status
+        self.avg_brightness = avg_brightness
+        self.std_dev = std_dev
+        self._lut = None
+        self._l_lut = None
+
+        if status == self.GOOD:
+            # Nếu ánh sáng tốt, không cần xử lý
+            return
+
+        if status in (self.TOO_DARK, self.VERY_DARK, self.TOO_BRIGHT):
+            key = (status, int(avg_brightness) // self.brightness_bucket)
+            lut = self._lut_cache.get(key)
+            if lut is None:
+                lut = self._scale_lut_for(status, avg_brightness)
+                if len(self._lut_cache) >= self.max_cached_luts:
+                    self._lut_cache.pop(next(iter(self._lut_cache)))
+                self._lut_cache[key] = lut
+            self._lut = lut
+
+        if status in (self.VERY_DARK, self.LOW_CONTRAST):
+            # Cân bằng histogram có giới hạn trên kênh L (sau khi đã tăng sáng với Very Dark).
+            # Không cache: hai cảnh cùng độ sáng trung bình có thể có histogram rất khác nhau (ví dụ ngược sáng)
+            sampled = self._sample(frame)
+            if self._lut is not None:
+                sampled = cv2.LUT(sampled, self._lut)
+            l_channel = cv2.cvtColor(sampled, cv2.COLOR_BGR2LAB)[:, :, 0] if sampled.ndim == 3 else sampled
+            l_hist = cv2.calcHist([np.ascontiguousarray(l_channel)], [0], None, [256], [0, 256]).ravel()
+            clip_limit = self.clip_limit if status == self.VERY_DARK else self.low_contrast_clip_limit
+            self._l_lut = self._equalize_lut(l_hist, clip_limit)
+
+    def _scale_lut_for(self, status, avg_brightness):
+        levels = np.arange(256, dtype=np.float32)
+
+        if status in (self.VERY_DARK, self.TOO_DARK):
+            # Trường hợp quá tối: tăng độ sáng và độ tương phản theo mức độ tối
+            darkness_ratio = min(max(1.0 - (avg_brightness / 120.0), 0.0), 1.0)
+            alpha = 1.0 + darkness_ratio  # Từ 1.0 đến 2.0
+            beta = int(30 * darkness_ratio)  # Từ 0 đến 30
+            return self._scale_lut(levels, alpha, beta)
+
+        # Trường hợp quá sáng: giảm độ sáng và độ tương phản
+        brightness_ratio = min(max((avg_brightness - 180) / 75.0, 0.0), 1.0)
+        alpha = 1.0 - (0.3 * brightness_ratio)  # Từ 1.0 đến 0.7
+        beta = int(-20 * brightness_ratio)  # Từ 0 đến -20
+        return self._scale_lut(levels, alpha, beta)
+
+    @staticmethod
+    def _scale_lut(levels, alpha, beta):
+        return np.clip(levels * alpha + beta, 0, 255).round().astype(np.uint8)
+
+    @staticmethod
+    def _equalize_lut(hist, clip_limit):
+        """Bảng cân bằng histogram có giới hạn (phiên bản toàn cục của CLAHE)"""
+        hist = np.asarray(hist, dtype=np.float64)
+        total = hist.sum()
+        if total <= 0:
+            return np.arange(256, dtype=np.uint8)
+
+        limit = clip_limit * total / 256.0
+        excess = np.maximum(hist - limit, 0).sum()
+        clipped = np.minimum(hist, limit) + excess / 256.0
+
+        cdf = np.cumsum(clipped)
+        cdf_min = cdf[np.nonzero(clipped)[0][0]]
+        denom = max(cdf[-1] - cdf_min, 1e-6)
+        return np.clip((cdf - cdf_min) / denom * 255.0, 0, 255).round().astype(np.uint8)
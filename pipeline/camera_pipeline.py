@@ -0,0 +1,232 @@
+import cv2
+
+from embedder.embedding_cache import EmbeddingCache
+from normalizer.image_preprocess import FacePreprocessor
+from antispoof.liveness import LivenessAccumulator
+from tracker.iou_tracker import IoUTracker
+
+
+class CameraPipeline:
+    """
+    Trạng thái nhận diện của một camera (nguồn): tracker, cache embedding và bộ tích lũy liveness.
+
+    Detector/aligner chạy trên thread gọi process(). Embedding và anti-spoofing dùng model chung
+    của FaceRecognitionSystem, hoặc được gửi qua InferenceScheduler khi nhiều camera chạy song song
+    (xem FaceRecognitionSystem.camera_pipeline).
+    """
+
+    def __init__(self, face_system, source_id=None, detector=None, aligner=None, scheduler=None,
+                 embedding_cache=None, liveness=None):
+        """
+        Args:
+            face_system: FaceRecognitionSystem đã sẵn sàng (cung cấp verifier, embedder, fasnet)
+            source_id: ID của camera/nguồn
+            detector, aligner: Detector/aligner riêng của camera; mặc định dùng của face_system
+            scheduler: InferenceScheduler dùng chung; None để gọi thẳng embedder/fasnet
+            embedding_cache, liveness: Dùng lại cache/liveness có sẵn thay vì tạo mới
+        """
+        self.face_system = face_system
+        self.source_id = source_id
+        self.detector = detector if detector is not None else face_system.detector
+        self.aligner = aligner if aligner is not None else face_system.aligner
+        self.scheduler = scheduler
+        self.profiler = face_system.profiler
+
+        # Track ID được cấp từ bộ đếm chung của face_system nên không trùng giữa các camera
+        self.tracker = IoUTracker(iou_threshold=0.3, max_missed=5, id_counter=face_system.track_ids)
+        self.embedding_cache = embedding_cache or EmbeddingCache(max_size=256, ttl=2.0, max_distance=4)
+        # Kết luận liveness theo từng track thay vì từng frame
+        self.liveness = liveness or LivenessAccumulator(false_accept_rate=0.01, false_reject_rate=0.01, recheck_interval=3.0)
+        # Reusable CLAHE + LUT preprocessing, one per camera thread
+        self.preprocessor = FacePreprocessor()
+
+    def process(self, image):
+        """
+        Nhận diện tất cả khuôn mặt trong một frame của camera này
+
+        Returns:
+            List kết quả, mỗi khuôn mặt một dict (xem FaceRecognitionSystem.process_image)
+        """
+        with self.profiler.stage("total"):
+            self.profiler.count("frames")
+            faces, pending = self.collect_faces(image)
+            if pending:
+                self.apply_embeddings(faces, pending, self._embed([face for _, _, face in pending]))
+                self.profiler.count("embeddings", len(pending))
+            return self.finish_frame(image, faces)
+
+    def collect_faces(self, image):
+        """
+        Detect, track and align faces of one frame, reusing cached embeddings
+
+        Returns:
+            Tuple (faces, pending): faces là list (box, track_id, embedding or None),
+            pending là list (face index, fingerprint, aligned face) cần tính embedding
+        """
+        # 1. Detect faces
+        with self.profiler.stage("detect"):
+            boxes, scores = self.detector.detect_faces(image)
+        
+        # Apply non-maximum suppression
+        if len(boxes) > 0:
+            indices = cv2.dnn.NMSBoxes( 
+                boxes.tolist(), 
+                scores.tolist(), 
+                score_threshold=0.5, 
+                nms_threshold=0.3
+            )
+            
+            if len(indices) > 0:
+                # Handle the different return types based on OpenCV version
+                if isinstance(indices, tuple):  # OpenCV > 4.5.4
+                    indices = indices[0]
+                    
+                boxes = boxes[indices]
+                scores = scores[indices]
+        
+        # Clip boxes to the image and assign track IDs
+        valid_boxes = []
+        for box in boxes:
+            # Format box to x1, y1, x2, y2
+            x1, y1, x2, y2 = map(int, box)
+            
+            # Make sure box coordinates are valid
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(image.shape[1], x2), min(image.shape[0], y2)
+            
+            if x2 <= x1 or y2 <= y1:
+                continue  # Skip invalid boxes
+            valid_boxes.append((x1, y1, x2, y2))
+        track_ids = self.tracker.update(valid_boxes)
+        self.profiler.count("faces", len(valid_boxes))
+
+        # Pass 1: detect landmarks, align and normalize every face in the frame
+        faces = []  # (box, track_id, embedding or None)
+        pending = []  # (face index, fingerprint, aligned face) waiting for embedding
+        for (x1, y1, x2, y2), track_id in zip(valid_boxes, track_ids):
+            # 2. Get landmarks for alignment
+            with self.profiler.stage("landmarks"):
+                landmarks = self.aligner.get_five_landmarks(image, (x1, y1, x2, y2))
+            if landmarks is None:
+                continue
+                
+            # Align face
+            with self.profiler.stage("align"):
+                aligned_face = self.aligner.align_face(image, landmarks)
+            if aligned_face is None:
+                continue
+
+            # Reuse the embedding if this track showed a near-identical face recently
+            fingerprint = self.embedding_cache.fingerprint(aligned_face)
+            cached_embedding = self.embedding_cache.get(track_id, fingerprint)
+            faces.append(((x1, y1, x2, y2), track_id, cached_embedding))
+            if cached_embedding is not None:
+                self.profiler.count("embedding_cache_hits")
+                continue
+            
+            pending.append((len(faces) - 1, fingerprint, aligned_face))
+
+        return faces, pending
+
+    def apply_embeddings(self, faces, pending, embeddings):
+        """Gán embedding mới tính cho các khuôn mặt trong pending và lưu vào cache"""
+        for (face_idx, fingerprint, _), embedding in zip(pending, embeddings):
+            box, track_id, _ = faces[face_idx]
+            faces[face_idx] = (box, track_id, embedding)
+            self.embedding_cache.put(track_id, fingerprint, embedding)
+
+    def finish_frame(self, image, faces):
+        """Match embeddings, run anti-spoofing and build the result dicts of one frame"""
+        # Bỏ trạng thái liveness của các track đã biến mất
+        self.liveness.prune(self.tracker.active_ids())
+        if not faces:
+            return []
+
+        # 5. Verify faces against database
+        # model_lock (RLock) cũng bảo vệ face_db: đăng ký khuôn mặt trên thread khác không đổi kích thước
+        # dict trong lúc verifier duyệt nó
+        with self.profiler.stage("match"), self.face_system.model_lock:
+            matches = [self.face_system.verifier.find_best_match(embedding, threshold=0.67) for _, _, embedding in faces]
+
+        # --- Tối ưu hóa Anti-spoofing ---
+        # 6. Anti spoofing for KNOWN faces only, all of them in one batch per model
+        # Không có Fasnet (enable_antispoof=False): bỏ qua bước này, mọi khuôn mặt coi như thật
+        known_indices = []
+        if self.face_system.fasnet is not None:
+            known_indices = [i for i, (name, _) in enumerate(matches) if name != "Unknown"]
+        # Chỉ chạy model cho các track chưa có kết luận liveness (hoặc đến hạn kiểm tra lại)
+        check_indices = [i for i in known_indices if self.liveness.needs_check(faces[i][1], matches[i][0])]
+        facial_areas = []
+        for i in check_indices:
+            x1, y1, x2, y2 = faces[i][0]
+            w, h = x2 - x1, y2 - y1
+            margin_x, margin_y = int(w * 0.1), int(h * 0.1)
+            face_x = max(0, x1 - margin_x)
+            face_y = max(0, y1 - margin_y)
+            face_w = min(image.shape[1] - face_x, w + 2 * margin_x)
+            face_h = min(image.shape[0] - face_y, h + 2 * margin_y)
+            facial_areas.append((face_x, face_y, face_w, face_h))
+
+        spoof_results = {}
+        if facial_areas:
+            try:
+                with self.profiler.stage("antispoof"):
+                    real_probs = self._real_probabilities(image, facial_areas)
+                self.profiler.count("antispoof_checks", len(facial_areas))
+                for i, real_prob in zip(check_indices, real_probs):
+                    self.liveness.update(faces[i][1], real_prob)
+                for i in known_indices:
+                    spoof_results[i] = self.liveness.result(faces[i][1])
+            except Exception as e:
+                print(f"Anti-spoofing error: {str(e)}")
+                # Mặc định là FAKE nếu có lỗi khi kiểm tra người đã biết, -1.0 là giá trị đặc biệt cho lỗi
+                spoof_results = {i: (LivenessAccumulator.PENDING, False, -1.0) for i in known_indices}
+        else:
+            spoof_results = {i: self.liveness.result(faces[i][1]) for i in known_indices}
+
+        results = []
+        for i, ((x1, y1, x2, y2), track_id, embedding) in enumerate(faces):
+            name, confidence = matches[i]
+            original_name = name # Lưu tên gốc trước khi kiểm tra fake
+
+            # Khuôn mặt "Unknown" không chạy anti-spoofing: is_real = True, spoof_score = 0.0
+            liveness, is_real, spoof_score = spoof_results.get(i, (None, True, 0.0))
+
+            # Mark fake faces only if they were initially recognized
+            if not is_real:
+                name = f"FAKE: {original_name}"
+
+            results.append({
+                "box": (x1, y1, x2, y2),
+                "track_id": track_id,
+                "name": name, # Tên đã có thể bị sửa thành "FAKE: ..."
+                "original_name": original_name,
+                "confidence": confidence,
+                "embedding": embedding,
+                "is_real": is_real, # Chỉ có ý nghĩa nếu name != "Unknown" trong logic mới này
+                "spoof_score": spoof_score, # Chỉ có ý nghĩa nếu name != "Unknown"
+                "liveness": liveness # "real"/"fake" khi đã kết luận, "pending" khi còn tích lũy
+            })
+            
+        return results
+
+    def _embed(self, aligned_faces):
+        if self.scheduler is None:
+            # Normalize straight into the embedder's input buffer, one interpreter call for all faces
+            embedder = self.face_system.embedder
+            with self.profiler.stage("normalize"):
+                normalized = self.preprocessor.normalize_batch(aligned_faces, out=embedder.batch_buffer(len(aligned_faces)))
+            with self.profiler.stage("embed"):
+                return embedder.get_embeddings(normalized)
+        # Buffer riêng vì scheduler gom khuôn mặt từ nhiều camera vào một batch
+        with self.profiler.stage("normalize"):
+            normalized = self.preprocessor.normalize_batch(aligned_faces)
+        # Với scheduler, "embed" gồm cả thời gian chờ gom batch
+        with self.profiler.stage("embed"):
+            return self.scheduler.embed(normalized).result()
+
+    def _real_probabilities(self, image, facial_areas):
+        fasnet = self.face_system.fasnet
+        if self.scheduler is None:
+            return fasnet.real_probabilities(image, facial_areas)
+        return self.scheduler.real_probabilities(*fasnet.crop_faces(image, facial_areas)).result()
@@ -0,0 +1,109 @@
+import threading
+
+
+class EnrollmentSession:
+    """
+    Máy trạng thái cho một lần đăng ký khuôn mặt từ một frame đã chụp.
+
+    processing -> ready | no_face | failed      (prepare_enrollment chạy một lần trong thread nền)
+    ready      -> saving -> saved | failed      (commit: lưu vào database bằng kết quả đã cache)
+    mọi trạng thái chưa kết thúc -> cancelled   (cancel)
+
+    Kết quả (box, aligned face, embedding, quality) được dùng chung cho bản xem trước trên UI
+    và cho add_face_to_database, nên frame chỉ đi qua model đúng một lần.
+    """
+
+    PROCESSING = "processing"
+    READY = "ready"
+    NO_FACE = "no_face"
+    SAVING = "saving"
+    SAVED = "saved"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, face_system, frame):
+        """
+        Args:
+            face_system: FaceRecognitionSystem đã sẵn sàng
+            frame: Frame BGR chụp khi bắt đầu đăng ký (được sao chép)
+        """
+        self.face_system = face_system
+        self.frame = frame.copy()
+        self.state = self.PROCESSING
+        self.result = None
+        self.error = None
+        self._prepared = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        threading.Thread(target=self._prepare, name="enrollment-prepare", daemon=True).start()
+        return self
+
+    def _prepare(self):
+        try:
+            result = self.face_system.prepare_enrollment(self.frame)
+            with self._lock:
+                self.result = result
+                if self.state == self.PROCESSING:
+                    self.state = self.READY if result is not None else self.NO_FACE
+        except Exception as e:
+            print(f"❌ Enrollment preview failed: {e}")
+            with self._lock:
+                self.error = e
+                if self.state == self.PROCESSING:
+                    self.state = self.FAILED
+        finally:
+            self._prepared.set()
+
+    def wait(self, timeout=None):
+        """Chờ bước xử lý frame xong, trả về state"""
+        self._prepared.wait(timeout)
+        return self.state
+
+    def commit(self, name, callback=None):
+        """
+        Lưu khuôn mặt vào database trong thread nền (chờ bước xử lý nếu chưa xong)
+
+        Args:
+            name: Tên theo định dạng "ID_NAME"
+            callback: Hàm tùy chọn callback(name, success) gọi khi lưu xong
+        """
+        def save():
+            self._prepared.wait()
+            with self._lock:
+                if self.state != self.READY:
+                    success = False
+                else:
+                    self.state = self.SAVING
+            if self.state == self.SAVING:
+                try:
+                    success = self.face_system.add_face_to_database(self.frame, name, prepared=self.result)
+                except Exception as e:
+                    print(f"❌ Failed to save face '{name}': {e}")
+                    self.error = e
+                    success = False
+                self.state = self.SAVED if success else self.FAILED
+            if callback is not None:
+                callback(name, success)
+
+        threading.Thread(target=save, name="enrollment-save", daemon=True).start()
+
+    def cancel(self):
+        with self._lock:
+            if self.state in (self.PROCESSING, self.READY, self.NO_FACE):
+                self.state = self.CANCELLED
+
+    def status_text(self):
+        """Dòng trạng thái ngắn cho bản xem trước"""
+        if self.state == self.PROCESSING:
+            return "Processing face..."
+        if self.state == self.NO_FACE:
+            return "No face detected, press ESC and try again"
+        if self.state == self.FAILED:
+            return "Processing failed"
+        if self.state == self.READY:
+            warnings = self.result["quality"]["warnings"]
+            return "Quality: " + (", ".join(warnings) if warnings else "OK")
+        if self.state == self.SAVING:
+            return "Saving..."
+        return self.state.capitalize()
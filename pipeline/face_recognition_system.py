@@ -0,0 +1,397 @@
+import itertools
+import os
+import threading
+
+import cv2
+
+from detector.ultralight import FaceDetector
+from aligner.mediapipe_aligner import FaceAligner
+from normalizer.image_preprocess import normalize_face, FacePreprocessor
+from embedder.mobilefacenet_embedder import FaceEmbedder
+from embedder.embedding_cache import EmbeddingCache
+from verifier.face_verifier import FaceVerifier
+from database.face_database_manager import FaceDatabaseManager
+from antispoof.Fasnet import Fasnet
+from antispoof.liveness import LivenessAccumulator
+from thread.startup import StartupOrchestrator
+from pipeline.camera_pipeline import CameraPipeline
+from metrics.profiler import StageProfiler
+
+
+class FaceRecognitionSystem:
+    def __init__(self, models_dir="model", background=False, enable_antispoof=True, profiler=None):
+        """
+        Args:
+            models_dir: Thư mục chứa các model
+            background: True để trả về ngay và nạp model trong nền (xem is_ready / wait_until_ready),
+                False để chờ nạp xong như trước
+            enable_antispoof: False để bỏ qua Fasnet (không import torch), ví dụ cho bộ nhận diện headless
+            profiler: StageProfiler đo thời gian từng stage; mặc định một profiler đang tắt
+                (bật bằng self.profiler.enabled = True)
+        """
+        # Initialize components with correct model paths
+        self.detector_model = detector_model = os.path.join(models_dir, "version-RFB-320_without_postprocessing.tflite")
+        embedder_model = os.path.join(models_dir, "mobilefacenet.tflite")
+        self.db_path = "./face_db.pkl"
+
+        # Initialize Fastnet
+        first_model = os.path.join(models_dir, "2.7_80x80_MiniFASNetV2.pth")
+        second_model = os.path.join(models_dir, "4_0_0_80x80_MiniFASNetV1SE.pth")
+
+        # Detector/aligner/embedder dùng chung giữa vòng lặp camera và luồng đăng ký khuôn mặt;
+        # cũng bảo vệ face_db (db_manager thêm/xóa khuôn mặt dưới lock này)
+        self.model_lock = threading.RLock()
+
+        # Nạp song song các model (mỗi model một thread) và warm-up từng model sau khi nạp
+        self.startup = StartupOrchestrator()
+        # Use exported TFLite/ONNX/TorchScript artefacts when present, eager PyTorch otherwise
+        # Cascade: MiniFASNetV1SE chỉ chạy khi MiniFASNetV2 chưa chắc chắn
+        self.enable_antispoof = enable_antispoof
+        if enable_antispoof:
+            # Fasnet lỗi thì chỉ tắt anti-spoofing, nhận diện vẫn chạy
+            self.startup.add("fasnet", lambda: Fasnet(first_model, second_model, backend="auto", cascade=True),
+                             warmup=lambda fasnet: fasnet.warmup(), optional=True)
+        # Increase confidence threshold to reduce false positives
+        self.startup.add("detector", lambda: FaceDetector(detector_model, conf_threshold=0.7),
+                         warmup=lambda detector: detector.warmup())
+        self.startup.add("aligner", FaceAligner, warmup=lambda aligner: aligner.warmup())
+        self.startup.add("embedder", lambda: FaceEmbedder(embedder_model),
+                         warmup=lambda embedder: embedder.warmup())
+        # Database cần detector/aligner/embedder để tạo embedding cho ảnh mới trong face_database
+        self.startup.add(
+            "db_manager",
+            lambda detector, aligner, embedder: FaceDatabaseManager(
+                image_dir="./face_database",
+                backup_path=self.db_path,
+                detector=detector,
+                aligner=aligner,
+                embedder=embedder,
+                lock=self.model_lock
+            ),
+            depends_on=("detector", "aligner", "embedder"),
+        )
+
+        # Track faces between frames so near-identical crops can reuse embeddings;
+        # every source has its own CameraPipeline (tracker, cache, liveness), track IDs come from one counter
+        self.track_ids = itertools.count(1)
+        self.pipelines = {}  # source_id -> CameraPipeline
+        self.embedding_cache = EmbeddingCache(max_size=256, ttl=2.0, max_distance=4)
+        # Kết luận liveness theo từng track thay vì từng frame
+        self.liveness = LivenessAccumulator(false_accept_rate=0.01, false_reject_rate=0.01, recheck_interval=3.0)
+        # Reusable CLAHE + LUT preprocessing for the live pipeline
+        self.preprocessor = FacePreprocessor()
+
+        # Per-stage timings and counters (near-zero overhead while disabled)
+        self.profiler = profiler if profiler is not None else StageProfiler(enabled=False)
+
+        self._ready = False
+        self._ready_lock = threading.Lock()
+        # Lỗi nạp model (nếu có), để UI hiển thị thay vì dừng chương trình
+        self.startup_error = None
+        self.startup.start()
+        if not background:
+            self.wait_until_ready()
+
+    def is_ready(self):
+        """True khi tất cả model đã nạp xong; không chặn luồng gọi và không ném lỗi nạp model"""
+        if not self._ready and self.startup_error is None and self.startup.is_done():
+            try:
+                self.wait_until_ready()
+            except Exception as e:
+                self.startup_error = e
+                print(f"❌ Face recognition system failed to start: {e}")
+        return self._ready
+
+    def wait_until_ready(self, timeout=None):
+        """Chờ các model nạp xong rồi gắn chúng vào hệ thống (chỉ chạy một lần)"""
+        components = self.startup.wait(timeout)
+        with self._ready_lock:
+            if self._ready:
+                return
+            self.fasnet = components.get("fasnet")
+            if self.enable_antispoof and self.fasnet is None:
+                print("⚠️ Fasnet failed to load, anti-spoofing is disabled")
+            self.detector = components["detector"]
+            self.aligner = components["aligner"]
+            self.embedder = components["embedder"]
+            self.db_manager = components["db_manager"]
+
+            # Load face database if exists
+            self.face_db = self.db_manager.face_db
+            print(f"Face database loaded with {len(self.face_db)} entries.")
+            self.verifier = FaceVerifier(self.face_db)
+
+            self.startup.report()
+            self._ready = True
+
+    def loading_status(self):
+        """Chuỗi trạng thái nạp model để hiển thị trên UI khi chưa sẵn sàng"""
+        if self.startup_error is not None:
+            return str(self.startup_error)
+        status = self.startup.status()
+        ready = sum(1 for value in status.values() if value == StartupOrchestrator.READY)
+        pending = [name for name, value in status.items() if value != StartupOrchestrator.READY]
+        return f"Loading models {ready}/{len(status)}: {', '.join(pending)}"
+    
+    def process_image(self, image, source_id=None):
+        """
+        Nhận diện tất cả khuôn mặt trong một frame
+
+        Args:
+            image: Frame BGR
+            source_id: ID camera/nguồn của frame; mỗi nguồn có tracker riêng
+
+        Returns:
+            List kết quả, mỗi khuôn mặt một dict
+        """
+        return self.process_images([image], [source_id])[0]
+
+    def process_images(self, images, source_ids=None):
+        """
+        Nhận diện nhiều frame (có thể từ nhiều nguồn) trong một lần: embedding của các khuôn mặt
+        chưa có trong cache được tính chung một batch cho mọi frame
+
+        Args:
+            images: List frame BGR
+            source_ids: List ID nguồn tương ứng (None = nguồn mặc định)
+
+        Returns:
+            List kết quả cho từng frame, cùng thứ tự với images
+        """
+        # Model chưa nạp xong (khởi động nền): chưa có kết quả nhận diện
+        if not self.is_ready():
+            return [[] for _ in images]
+        if source_ids is None:
+            source_ids = [None] * len(images)
+
+        with self.model_lock, self.profiler.stage("total"):
+            self.profiler.count("frames", len(images))
+            return self._process_images(images, source_ids)
+
+    def _process_images(self, images, source_ids):
+        pipelines = [self._pipeline_for(source_id) for source_id in source_ids]
+        frames = [pipeline.collect_faces(image) for pipeline, image in zip(pipelines, images)]
+
+        aligned_faces = [face for _, pending in frames for _, _, face in pending]
+        if aligned_faces:
+            # 3. Normalize all uncached faces straight into the embedder's input buffer
+            with self.profiler.stage("normalize"):
+                normalized_faces = self.preprocessor.normalize_batch(
+                    aligned_faces,
+                    out=self.embedder.batch_buffer(len(aligned_faces))
+                )
+
+            # 4. Generate embeddings for all uncached faces in one interpreter call
+            with self.profiler.stage("embed"):
+                new_embeddings = self.embedder.get_embeddings(normalized_faces)
+            self.profiler.count("embeddings", len(aligned_faces))
+            offset = 0
+            for pipeline, (faces, pending) in zip(pipelines, frames):
+                pipeline.apply_embeddings(faces, pending, new_embeddings[offset:offset + len(pending)])
+                offset += len(pending)
+
+        return [pipeline.finish_frame(image, faces) for pipeline, image, (faces, _) in zip(pipelines, images, frames)]
+
+    def _pipeline_for(self, source_id):
+        """CameraPipeline của từng nguồn, dùng chung detector/aligner vì process_images chạy trên một thread"""
+        pipeline = self.pipelines.get(source_id)
+        if pipeline is None:
+            if source_id is None:
+                # Nguồn mặc định dùng cache/liveness của hệ thống (print_runtime_stats đọc các đối tượng này)
+                pipeline = CameraPipeline(self, None, embedding_cache=self.embedding_cache, liveness=self.liveness)
+            else:
+                pipeline = CameraPipeline(self, source_id)
+            self.pipelines[source_id] = pipeline
+        return pipeline
+
+    def camera_pipeline(self, source_id, scheduler):
+        """
+        Tạo CameraPipeline cho một camera chạy trên thread riêng: detector và aligner riêng
+        (interpreter TFLite/MediaPipe không dùng chung giữa các thread được), còn embedding và
+        anti-spoofing đi qua scheduler dùng chung
+
+        Args:
+            source_id: ID camera
+            scheduler: InferenceScheduler đã start(), tạo từ self.embedder, self.fasnet và
+                model_lock=self.model_lock
+
+        Returns:
+            CameraPipeline; gọi pipeline.process(frame) trên thread của camera
+        """
+        self.wait_until_ready()
+        detector = FaceDetector(self.detector_model, conf_threshold=0.7)
+        detector.warmup()
+        aligner = FaceAligner()
+        return CameraPipeline(self, source_id, detector=detector, aligner=aligner, scheduler=scheduler)
+
+    def add_face_with_augmentation(self, image, name):
+        """Thêm khuôn mặt vào cơ sở dữ liệu với các phiên bản tăng cường"""
+        results = self.process_image(image)
+        if not results:
+            print("❌ Không phát hiện được khuôn mặt")
+            return False
+        
+        # Lấy embedding ban đầu
+        embedding = results[0]["embedding"]
+        self.face_db[name] = embedding
+        
+        # Trích xuất khuôn mặt
+        x1, y1, x2, y2 = results[0]["box"]
+        face = image[y1:y2, x1:x2]
+        
+        # Tạo các phiên bản tăng cường mô phỏng các góc nghiêng khác nhau
+        augmented_images = []
+        
+        # Mô phỏng nhìn xuống bằng cách dịch hộp vùng cắt lên trên
+        shift_down = int((y2 - y1) * 0.15)  # Dịch 15%
+        if y1 - shift_down >= 0:
+            down_face = image[y1-shift_down:y2-shift_down, x1:x2]
+            augmented_images.append(("down", down_face))
+        
+        # Mô phỏng nhìn lên bằng cách dịch hộp vùng cắt xuống dưới
+        shift_up = int((y2 - y1) * 0.15)
+        if y2 + shift_up < image.shape[0]:
+            up_face = image[y1+shift_up:y2+shift_up, x1:x2]
+            augmented_images.append(("up", up_face))
+        
+        # Xử lý các hình ảnh đã tăng cường
+        norm_faces = []
+        for pose_type, aug_face in augmented_images:
+            # Thay đổi kích thước nếu cần
+            if aug_face.shape[:2] != (y2-y1, x2-x1):
+                aug_face = cv2.resize(aug_face, (x2-x1, y2-y1))
+                
+            # Xử lý khuôn mặt tăng cường này
+            try:
+                # Phát hiện landmarks
+                landmarks = self.aligner.get_five_landmarks(aug_face, (0, 0, aug_face.shape[1], aug_face.shape[0]))
+                if landmarks is None:
+                    continue
+                    
+                # Căn chỉnh và xử lý
+                aligned_face = self.aligner.align_face(aug_face, landmarks)
+                if aligned_face is None:
+                    continue
+                    
+                # Chuẩn hóa, embedding được tính theo batch bên dưới
+                norm_faces.append((pose_type, normalize_face(aligned_face)))
+            except Exception as e:
+                print(f"⚠️ Lỗi khi xử lý biến thể {pose_type}: {str(e)}")
+        
+        # Tạo embedding cho tất cả biến thể trong một lần gọi model
+        if norm_faces:
+            aug_embeddings = self.embedder.get_embeddings([face for _, face in norm_faces])
+            for (pose_type, _), aug_embedding in zip(norm_faces, aug_embeddings):
+                # Thêm vào cơ sở dữ liệu
+                aug_name = f"{name}_{pose_type}"
+                self.face_db[aug_name] = aug_embedding
+                print(f"✅ Đã thêm phiên bản {pose_type} cho '{name}'")
+        
+        # Lưu cơ sở dữ liệu đã cập nhật
+        self.db_manager.face_db = self.face_db
+        self.db_manager._save_backup()
+        print(f"✅ Đã thêm khuôn mặt '{name}' vào cơ sở dữ liệu với các biến thể góc nhìn")
+        return True
+
+    def prepare_enrollment(self, image):
+        """
+        Chạy detect/align/embedding một lần cho khuôn mặt lớn nhất trong ảnh đăng ký,
+        không đụng tới tracker, cache hay liveness của luồng camera
+
+        Args:
+            image: Frame BGR đã chụp
+
+        Returns:
+            Dict {"box", "score", "aligned_face", "embedding", "quality"} hoặc None nếu không có khuôn mặt
+        """
+        with self.model_lock:
+            boxes, scores = self.detector.detect_faces(image)
+            candidates = []
+            for box, score in zip(boxes, scores):
+                x1, y1, x2, y2 = map(int, box)
+                x1, y1 = max(0, x1), max(0, y1)
+                x2, y2 = min(image.shape[1], x2), min(image.shape[0], y2)
+                if x2 > x1 and y2 > y1:
+                    candidates.append(((x2 - x1) * (y2 - y1), (x1, y1, x2, y2), float(score)))
+            if not candidates:
+                return None
+            # Người đăng ký thường đứng gần camera nhất: lấy khuôn mặt lớn nhất
+            _, box, score = max(candidates)
+
+            landmarks = self.aligner.get_five_landmarks(image, box)
+            if landmarks is None:
+                return None
+            aligned_face = self.aligner.align_face(image, landmarks)
+            if aligned_face is None:
+                return None
+            embedding = self.embedder.get_embeddings(self.preprocessor.normalize_batch([aligned_face]))[0].copy()
+
+        return {
+            "box": box,
+            "score": score,
+            "aligned_face": aligned_face,
+            "embedding": embedding,
+            "quality": face_quality(aligned_face, box),
+        }
+
+    def add_face_to_database(self, image, name, prepared=None):
+        """
+        Args:
+            image: Frame BGR chứa khuôn mặt cần đăng ký
+            name: Tên theo định dạng "ID_NAME"
+            prepared: Kết quả prepare_enrollment(image) đã có (ví dụ từ bản xem trước), tránh chạy lại model
+        """
+        if prepared is None:
+            prepared = self.prepare_enrollment(image)
+        if prepared is not None:
+            # Parse ID and name
+            parts = name.split('_', 1)
+            if len(parts) > 1 and parts[0].isalnum():
+                id_real = parts[0]
+                full_name = parts[1]
+            else:
+                # If no ID format provided, use name as both ID and name
+                id_real = name
+                full_name = name
+                
+                # Inform user about expected format
+                print(f"ℹ️ Tip: Use format 'ID_NAME' (e.g. '123_John Smith') for better organization")
+                
+            # Get the embedding
+            embedding = prepared["embedding"]
+            
+            # Use db_manager.add_face instead of directly updating self.face_db
+            success = self.db_manager.add_face(name, id_real, full_name, embedding)
+            
+            if success:
+                print(f"✅ Added face for '{name}' (ID: {id_real}) to database via API")
+            else:
+                print(f"⚠️ Face was added to local database but API save failed")
+                
+            return success
+        return False
+
+
+def face_quality(aligned_face, box, min_face_size=80, min_sharpness=60.0, brightness_range=(60, 200)):
+    """
+    Đánh giá nhanh chất lượng ảnh đăng ký
+
+    Returns:
+        Dict {"face_size", "sharpness", "brightness", "warnings"}; warnings rỗng nghĩa là ảnh đạt
+    """
+    x1, y1, x2, y2 = box
+    face_size = min(x2 - x1, y2 - y1)
+    gray = cv2.cvtColor(aligned_face, cv2.COLOR_BGR2GRAY)
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+    brightness = float(gray.mean())
+
+    warnings = []
+    if face_size < min_face_size:
+        warnings.append("Face too small")
+    if sharpness < min_sharpness:
+        warnings.append("Image blurry")
+    if brightness < brightness_range[0]:
+        warnings.append("Too dark")
+    elif brightness > brightness_range[1]:
+        warnings.append("Too bright")
+    return {"face_size": face_size, "sharpness": sharpness, "brightness": brightness, "warnings": warnings}
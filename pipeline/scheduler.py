@@ -0,0 +1,212 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class _BatchWorker:
+    """
+    Một thread chạy một model dùng chung: gom các request (mỗi request là một mảng N ảnh)
+    thành batch cho tới khi đủ max_batch ảnh hoặc request cũ nhất đã chờ hết latency budget,
+    chạy model một lần rồi trả từng phần kết quả về Future của request tương ứng.
+    """
+
+    def __init__(self, name, run_batch, latency_budget, max_batch):
+        """
+        Args:
+            name: Tên worker (dùng cho thread và thống kê)
+            run_batch: Hàm nhận các mảng đầu vào đã nối (một mảng cho mỗi phần của request),
+                trả về mảng kết quả theo cùng thứ tự
+            latency_budget: Thời gian tối đa (giây) một request chờ trong hàng đợi trước khi chạy
+            max_batch: Số ảnh tối đa trong một batch
+        """
+        self.name = name
+        self.run_batch = run_batch
+        self.latency_budget = latency_budget
+        self.max_batch = max_batch
+        self.jobs = queue.Queue()
+        self.running = False
+        self.thread = None
+
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.items = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run_time = 0.0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f"scheduler-{self.name}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2.0)
+
+    def submit(self, inputs):
+        future = Future()
+        self.jobs.put((inputs, future, time.perf_counter()))
+        return future
+
+    def _collect_batch(self):
+        try:
+            batch = [self.jobs.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        count = len(batch[0][0][0])
+        # Hạn chót tính từ lúc request cũ nhất được gửi, không phải lúc worker nhận nó
+        deadline = batch[0][2] + self.latency_budget
+        while count < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                job = self.jobs.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(job)
+            count += len(job[0][0])
+        return batch
+
+    def _run(self):
+        while self.running:
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            waits = [start - submitted for _, _, submitted in batch]
+            try:
+                # Mỗi request có thể gồm nhiều mảng song song (ví dụ crop 2.7 và 4.0 của Fasnet)
+                parts = len(batch[0][0])
+                merged = [np.concatenate([inputs[i] for inputs, _, _ in batch]) for i in range(parts)]
+                results = self.run_batch(*merged)
+                offset = 0
+                for inputs, future, _ in batch:
+                    count = len(inputs[0])
+                    future.set_result(results[offset:offset + count])
+                    offset += count
+            except Exception as e:
+                print(f"❌ Scheduler {self.name} batch failed: {e}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+            run_time = time.perf_counter() - start
+
+            with self._stats_lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.items += sum(len(inputs[0]) for inputs, _, _ in batch)
+                self.total_wait += sum(waits)
+                self.max_wait = max(self.max_wait, max(waits))
+                self.total_run_time += run_time
+
+    def stats(self):
+        with self._stats_lock:
+            requests = self.requests
+            return {
+                "batches": self.batches,
+                "requests": requests,
+                "items": self.items,
+                "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+                "avg_wait_ms": 1000 * self.total_wait / requests if requests else 0.0,
+                "max_wait_ms": 1000 * self.max_wait,
+                "avg_run_ms": 1000 * self.total_run_time / self.batches if self.batches else 0.0,
+                "queued": self.jobs.qsize(),
+            }
+
+
+class InferenceScheduler:
+    """
+    Bộ lập lịch suy luận dùng chung cho nhiều camera.
+
+    Mỗi CameraPipeline tự detect/align trên thread của nó, còn embedding và anti-spoofing được
+    gửi tới đây: các khuôn mặt từ mọi camera được gom thành batch động trong latency budget
+    (mặc định 15 ms) và chạy trên một FaceEmbedder và một Fasnet duy nhất. Kết quả trả về qua
+    Future của từng request nên mỗi camera nhận đúng phần của mình.
+    """
+
+    def __init__(self, embedder, fasnet=None, latency_budget_ms=15, max_batch=32, model_lock=None):
+        """
+        Args:
+            embedder: FaceEmbedder dùng chung
+            fasnet: Fasnet dùng chung, None nếu không chạy anti-spoofing
+            latency_budget_ms: Thời gian tối đa một request chờ để được gom batch
+            max_batch: Số khuôn mặt tối đa trong một batch
+            model_lock: Lock giữ trong mỗi lần chạy batch; truyền FaceRecognitionSystem.model_lock khi
+                embedder/fasnet cũng được dùng bởi process_images hoặc luồng đăng ký (interpreter và
+                buffer đầu vào của chúng không an toàn khi chạy song song)
+        """
+        self.embedder = embedder
+        self.fasnet = fasnet
+        self.model_lock = model_lock
+        budget = latency_budget_ms / 1000.0
+        self._embed_worker = _BatchWorker("embedder", self._run_embedder, budget, max_batch)
+        self._spoof_worker = None
+        if fasnet is not None:
+            self._spoof_worker = _BatchWorker("antispoof", self._run_antispoof, budget, max_batch)
+
+    def start(self):
+        self._embed_worker.start()
+        if self._spoof_worker is not None:
+            self._spoof_worker.start()
+        return self
+
+    def stop(self):
+        self._embed_worker.stop()
+        if self._spoof_worker is not None:
+            self._spoof_worker.stop()
+
+    def embed(self, normalized_faces):
+        """
+        Args:
+            normalized_faces: Mảng (N, H, W, C) float32 các khuôn mặt đã chuẩn hóa
+
+        Returns:
+            Future chứa mảng embedding (N, embedding_size)
+        """
+        return self._embed_worker.submit((normalized_faces,))
+
+    def real_probabilities(self, first_crops, second_crops):
+        """
+        Args:
+            first_crops, second_crops: Crop của Fasnet.crop_faces
+
+        Returns:
+            Future chứa xác suất thật của từng khuôn mặt
+        """
+        if self._spoof_worker is None:
+            raise RuntimeError("InferenceScheduler was created without a Fasnet")
+        return self._spoof_worker.submit((first_crops, second_crops))
+
+    def _run_embedder(self, faces):
+        # get_embeddings trả về mảng mới nên có thể chia cho nhiều camera mà không bị ghi đè
+        if self.model_lock is None:
+            return self.embedder.get_embeddings(faces)
+        with self.model_lock:
+            return self.embedder.get_embeddings(faces)
+
+    def _run_antispoof(self, first_crops, second_crops):
+        if self.model_lock is None:
+            return self.fasnet.real_probabilities_from_crops(first_crops, second_crops)
+        with self.model_lock:
+            return self.fasnet.real_probabilities_from_crops(first_crops, second_crops)
+
+    def stats(self):
+        """Thống kê batch của từng worker: {"embedder": {...}, "antispoof": {...}}"""
+        stats = {"embedder": self._embed_worker.stats()}
+        if self._spoof_worker is not None:
+            stats["antispoof"] = self._spoof_worker.stats()
+        return stats
+
+    def report(self):
+        """In thống kê gom batch"""
+        for name, stats in self.stats().items():
+            print(f"📦 {name}: {stats['items']} faces in {stats['batches']} batches "
+                  f"(avg {stats['avg_batch_size']:.1f}/batch from {stats['requests']} requests), "
+                  f"wait avg {stats['avg_wait_ms']:.1f} ms / max {stats['max_wait_ms']:.1f} ms, "
+                  f"run avg {stats['avg_run_ms']:.1f} ms")
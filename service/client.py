@@ -0,0 +1,73 @@
+import cv2
+from utils.lazy_import import lazy_import
+
+requests = lazy_import("requests")
+
+
+class RecognitionClient:
+    """Client mỏng cho service/recognition_service.py, dùng trên các kiosk không tự nạp model"""
+
+    def __init__(self, base_url="http://127.0.0.1:8500", timeout=10.0, jpeg_quality=90):
+        """
+        Args:
+            base_url: Địa chỉ của recognition service
+            timeout: Thời gian chờ tối đa cho mỗi request (giây)
+            jpeg_quality: Chất lượng JPEG khi gửi frame
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.jpeg_quality = jpeg_quality
+        self.session = None
+
+    def _session(self):
+        # Giữ kết nối keep-alive giữa các frame
+        if self.session is None:
+            self.session = requests.Session()
+        return self.session
+
+    def _encode(self, image):
+        ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            raise ValueError("Could not encode image as JPEG")
+        return buffer.tobytes()
+
+    def _post(self, path, params=None, data=None, json=None):
+        response = self._session().post(
+            f"{self.base_url}{path}",
+            params=params,
+            data=data,
+            json=json,
+            headers={"Content-Type": "image/jpeg"} if data is not None else None,
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def health(self):
+        """Trạng thái của service, ví dụ {"status": "ready", ...}"""
+        response = self._session().get(f"{self.base_url}/health", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def process(self, image, source_id=None, embeddings=False):
+        """
+        Nhận diện các khuôn mặt trong một frame BGR
+
+        Returns:
+            List dict kết quả giống FaceRecognitionSystem.process_image (box, name, confidence, ...)
+        """
+        params = {}
+        if source_id is not None:
+            params["source_id"] = source_id
+        if embeddings:
+            params["embeddings"] = 1
+        return self._post("/process", params=params, data=self._encode(image))["faces"]
+
+    def enroll(self, image, name):
+        """Thêm khuôn mặt trong ảnh vào database của service, trả về True nếu thành công"""
+        return self._post("/enroll", params={"name": name}, data=self._encode(image))["success"]
+
+    def match(self, embedding, threshold=0.67):
+        """Tìm người khớp nhất với một embedding, trả về (name, confidence)"""
+        result = self._post("/match", json={"embedding": [float(v) for v in embedding], "threshold": threshold})
+        return result["name"], result["confidence"]
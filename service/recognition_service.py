@@ -0,0 +1,288 @@
+# Dịch vụ nhận diện headless: giữ một tiến trình với model đã nạp sẵn và phục vụ nhiều kiosk/streamer
+# qua HTTP cục bộ, thay vì mỗi client tự nạp model riêng.
+#
+# Endpoints:
+#   GET  /health                          - trạng thái nạp model và số request đã xử lý
+#   POST /process?source_id=cam1          - body là ảnh JPEG/PNG, trả về kết quả nhận diện (JSON)
+#                                           thêm &embeddings=1 để trả kèm vector embedding
+#                                           (không có source_id thì dùng địa chỉ IP của client)
+#   POST /enroll?name=123_John            - body là ảnh JPEG/PNG, thêm khuôn mặt vào database
+#   POST /match                           - body JSON {"embedding": [...], "threshold": 0.67}
+#
+# Các request /process từ nhiều client được gom thành batch (tối đa --max-batch ảnh hoặc
+# chờ --max-wait-ms) để embedding của mọi khuôn mặt được tính trong một lần gọi model.
+#
+# Usage (chạy từ thư mục gốc của repo):
+#   python -m service.recognition_service --host 127.0.0.1 --port 8500
+#   python -m service.recognition_service --no-antispoof
+
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+import numpy as np
+
+from pipeline.face_recognition_system import FaceRecognitionSystem
+
+
+class BatchingWorker:
+    """
+    Gom các request nhận diện từ nhiều client thành batch và chạy trên một thread duy nhất,
+    nên FaceRecognitionSystem (tracker, cache, interpreter TFLite) không bị gọi đồng thời.
+    """
+
+    def __init__(self, face_system, model_lock, max_batch=8, max_wait_ms=10):
+        """
+        Args:
+            face_system: FaceRecognitionSystem dùng chung
+            model_lock: Lock bảo vệ face_system, dùng chung với enroll/match
+            max_batch: Số ảnh tối đa trong một batch
+            max_wait_ms: Thời gian tối đa chờ thêm request sau request đầu tiên của batch
+        """
+        self.face_system = face_system
+        self.model_lock = model_lock
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.jobs = queue.Queue()
+        self.processed_images = 0
+        self.processed_batches = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="recognition-batcher", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2.0)
+
+    def submit(self, image, source_id=None):
+        """Đưa một ảnh vào hàng đợi, trả về Future chứa list kết quả của ảnh đó"""
+        future = Future()
+        self.jobs.put((image, source_id, future))
+        return future
+
+    def _collect_batch(self):
+        try:
+            batch = [self.jobs.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.jobs.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while self.running:
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            try:
+                with self.model_lock:
+                    results = self.face_system.process_images(
+                        [image for image, _, _ in batch],
+                        [source_id for _, source_id, _ in batch]
+                    )
+                for (_, _, future), frame_results in zip(batch, results):
+                    future.set_result(frame_results)
+            except Exception as e:
+                print(f"❌ Recognition batch failed: {e}")
+                for _, _, future in batch:
+                    future.set_exception(e)
+            self.processed_images += len(batch)
+            self.processed_batches += 1
+
+
+def serialize_results(results, include_embeddings=False):
+    """Chuyển list kết quả của process_image sang dạng JSON được"""
+    serialized = []
+    for result in results:
+        item = {
+            "box": [int(v) for v in result["box"]],
+            "track_id": result["track_id"],
+            "name": result["name"],
+            "original_name": result["original_name"],
+            "confidence": float(result["confidence"]),
+            "is_real": bool(result["is_real"]),
+            "spoof_score": float(result["spoof_score"]),
+            "liveness": result["liveness"],
+        }
+        if include_embeddings:
+            item["embedding"] = np.asarray(result["embedding"], dtype=np.float32).tolist()
+        serialized.append(item)
+    return serialized
+
+
+class RecognitionService:
+    """Ghép FaceRecognitionSystem, BatchingWorker và HTTP server"""
+
+    def __init__(self, host="127.0.0.1", port=8500, models_dir="model", enable_antispoof=True,
+                 max_batch=8, max_wait_ms=10, request_timeout=10.0):
+        # Nạp model trong nền để /health trả lời ngay trong lúc khởi động
+        self.face_system = FaceRecognitionSystem(models_dir, background=True, enable_antispoof=enable_antispoof)
+        self.model_lock = threading.Lock()
+        self.worker = BatchingWorker(self.face_system, self.model_lock, max_batch=max_batch, max_wait_ms=max_wait_ms)
+        self.request_timeout = request_timeout
+        self.start_time = time.time()
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+
+    def serve_forever(self):
+        self.worker.start()
+        host, port = self.server.server_address[:2]
+        print(f"🚀 Recognition service listening on http://{host}:{port}")
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            print("\nStopping recognition service...")
+        finally:
+            self.server.server_close()
+            self.worker.stop()
+
+    def health(self):
+        ready = self.face_system.is_ready()
+        return {
+            "status": "ready" if ready else "failed" if self.face_system.startup_error is not None else "loading",
+            "loading": None if ready else self.face_system.loading_status(),
+            "components": self.face_system.startup.status(),
+            "faces": len(self.face_system.face_db) if ready else 0,
+            "processed_images": self.worker.processed_images,
+            "processed_batches": self.worker.processed_batches,
+            "uptime": time.time() - self.start_time,
+        }
+
+    def process(self, image, source_id=None, include_embeddings=False):
+        results = self.worker.submit(image, source_id).result(timeout=self.request_timeout)
+        return {"faces": serialize_results(results, include_embeddings)}
+
+    def enroll(self, image, name):
+        with self.model_lock:
+            success = self.face_system.add_face_to_database(image, name)
+        return {"success": bool(success), "name": name}
+
+    def match(self, embedding, threshold=0.67):
+        with self.model_lock:
+            name, confidence = self.face_system.verifier.find_best_match(
+                np.asarray(embedding, dtype=np.float32), threshold=threshold
+            )
+        return {"name": name, "confidence": float(confidence)}
+
+    def _make_handler(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass  # Không in log cho từng request
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_body(self):
+                length = int(self.headers.get("Content-Length", 0))
+                return self.rfile.read(length) if length > 0 else b""
+
+            def _decode_image(self, data):
+                if not data:
+                    return None
+                return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/health":
+                    self._send_json(200, service.health())
+                else:
+                    self._send_json(404, {"error": f"Unknown endpoint {url.path}"})
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                # Đọc hết body trước mọi lần trả lời sớm: với HTTP/1.1 keep-alive, phần body chưa đọc
+                # sẽ bị hiểu là dòng đầu của request tiếp theo trên cùng kết nối
+                body = self._read_body()
+                try:
+                    if url.path == "/match":
+                        if not service.face_system.is_ready():
+                            self._send_json(503, service.health())
+                            return
+                        payload = json.loads(body or b"{}")
+                        if "embedding" not in payload:
+                            self._send_json(400, {"error": "Missing 'embedding'"})
+                            return
+                        self._send_json(200, service.match(payload["embedding"], float(payload.get("threshold", 0.67))))
+                        return
+
+                    if url.path not in ("/process", "/enroll"):
+                        self._send_json(404, {"error": f"Unknown endpoint {url.path}"})
+                        return
+                    image = self._decode_image(body)
+                    if image is None:
+                        self._send_json(400, {"error": "Request body must be a JPEG/PNG image"})
+                        return
+                    if not service.face_system.is_ready():
+                        self._send_json(503, service.health())
+                        return
+
+                    if url.path == "/process":
+                        include_embeddings = params.get("embeddings", "0").lower() in ("1", "true", "yes")
+                        # Không có source_id thì mỗi địa chỉ client là một nguồn riêng, để tracker, cache và
+                        # liveness của các kiosk khác nhau không trộn vào nhau
+                        source_id = params.get("source_id") or f"client-{self.client_address[0]}"
+                        self._send_json(200, service.process(image, source_id, include_embeddings))
+                    else:
+                        if not params.get("name"):
+                            self._send_json(400, {"error": "Missing 'name' query parameter"})
+                            return
+                        self._send_json(200, service.enroll(image, params["name"]))
+                except Exception as e:
+                    print(f"❌ Error handling {url.path}: {e}")
+                    self._send_json(500, {"error": str(e)})
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless face recognition service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8500)
+    parser.add_argument("--models-dir", default="model")
+    parser.add_argument("--no-antispoof", action="store_true", help="disable anti-spoofing (does not load torch)")
+    parser.add_argument("--max-batch", type=int, default=8, help="maximum images per recognition batch")
+    parser.add_argument("--max-wait-ms", type=float, default=10, help="how long to wait for more requests to batch")
+    args = parser.parse_args()
+
+    service = RecognitionService(
+        host=args.host,
+        port=args.port,
+        models_dir=args.models_dir,
+        enable_antispoof=not args.no_antispoof,
+        max_batch=args.max_batch,
+        max_wait_ms=args.max_wait_ms,
+    )
+    service.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
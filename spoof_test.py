@@ -1,14 +1,16 @@
 import os
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.metrics import confusion_matrix, precision_recall_curve, roc_curve, auc
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
-import seaborn as sns
 from tqdm import tqdm
 
 from detector.ultralight import FaceDetector
 from antispoof.Fasnet import Fasnet
+from utils.lazy_import import lazy_import
+
+# Thư viện vẽ biểu đồ/thống kê chỉ được nạp khi tính metric ở cuối bài test
+plt = lazy_import("matplotlib.pyplot")
+sns = lazy_import("seaborn")
+metrics = lazy_import("sklearn.metrics")
 
 def load_test_images(base_dir="spoofing_test"):
     """
@@ -113,21 +115,21 @@ def evaluate_antispoofing():
         return
         
     # Calculate metrics
-    cm = confusion_matrix(y_true, y_pred)
+    cm = metrics.confusion_matrix(y_true, y_pred)
     tn, fp, fn, tp = cm.ravel()
     
     # Standard metrics
-    accuracy = accuracy_score(y_true, y_pred)
-    precision = precision_score(y_true, y_pred)
-    recall = recall_score(y_true, y_pred)
-    f1 = f1_score(y_true, y_pred)
+    accuracy = metrics.accuracy_score(y_true, y_pred)
+    precision = metrics.precision_score(y_true, y_pred)
+    recall = metrics.recall_score(y_true, y_pred)
+    f1 = metrics.f1_score(y_true, y_pred)
     
     # Security metrics
     far = fp / (fp + tn)  # False Acceptance Rate (fake accepted as real)
     frr = fn / (fn + tp)  # False Rejection Rate (real rejected as fake)
     
     # Calculate EER
-    fpr, tpr, thresholds = roc_curve(y_true, scores)
+    fpr, tpr, thresholds = metrics.roc_curve(y_true, scores)
     fnr = 1 - tpr
     eer_threshold = thresholds[np.nanargmin(np.absolute(fnr - fpr))]
     eer = np.mean([fpr[np.nanargmin(np.absolute(fnr - fpr))], 
@@ -164,7 +166,7 @@ def evaluate_antispoofing():
     
     # Plot ROC curve
     plt.subplot(2, 2, 2)
-    plt.plot(fpr, tpr, label=f'AUC = {auc(fpr, tpr):.4f}')
+    plt.plot(fpr, tpr, label=f'AUC = {metrics.auc(fpr, tpr):.4f}')
     plt.plot([0, 1], [0, 1], 'k--')
     plt.title('ROC Curve')
     plt.xlabel('False Positive Rate')
@@ -184,9 +186,9 @@ def evaluate_antispoofing():
     
     # Plot precision-recall curve
     plt.subplot(2, 2, 4)
-    precision_curve, recall_curve, _ = precision_recall_curve(y_true, scores)
+    precision_curve, recall_curve, _ = metrics.precision_recall_curve(y_true, scores)
     plt.plot(recall_curve, precision_curve, 
-             label=f'AP = {auc(recall_curve, precision_curve):.4f}')
+             label=f'AP = {metrics.auc(recall_curve, precision_curve):.4f}')
     plt.title('Precision-Recall Curve')
     plt.xlabel('Recall')
     plt.ylabel('Precision')
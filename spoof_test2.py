@@ -1,16 +1,19 @@
 import os
+import argparse
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.metrics import confusion_matrix, precision_recall_curve, roc_curve, auc
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
-import seaborn as sns
 from tqdm import tqdm
 import time
 import csv
 
 from detector.ultralight import FaceDetector
 from antispoof.Fasnet import Fasnet
+from utils.lazy_import import lazy_import
+
+# Thư viện vẽ biểu đồ/thống kê chỉ được nạp khi tính metric ở cuối bài test
+plt = lazy_import("matplotlib.pyplot")
+sns = lazy_import("seaborn")
+metrics = lazy_import("sklearn.metrics")
 
 def load_test_images(base_dir="spoofing_test"):
     """
@@ -41,9 +44,17 @@ def load_test_images(base_dir="spoofing_test"):
     
     return test_data
 
-def evaluate_antispoofing():
+def evaluate_antispoofing(quantization=None, calibration_dir=None, output_prefix="antispoofing"):
     """
     Evaluate anti-spoofing system performance on test images
+    
+    Args:
+        quantization: None or "dynamic" int8 mode passed to Fasnet
+        calibration_dir: Folder with real/ and fake/ crops for the int8 parity check
+        output_prefix: Prefix of the chart and CSV files written by this run
+        
+    Returns:
+        Dict of summary metrics, or None when nothing could be evaluated
     """
     # Initialize models
     models_dir = "model"
@@ -55,7 +66,7 @@ def evaluate_antispoofing():
     start_load_time = time.time()
     
     # Load models
-    fasnet = Fasnet(first_model, second_model)
+    fasnet = Fasnet(first_model, second_model, quantization=quantization, calibration_dir=calibration_dir)
     detector = FaceDetector(detector_model, conf_threshold=0.65)
     
     model_load_time = time.time() - start_load_time
@@ -65,7 +76,7 @@ def evaluate_antispoofing():
     test_data = load_test_images()
     if not test_data:
         print("❌ No test images found in spoofing_test directory")
-        return
+        return None
     
     print(f"📊 Testing {len(test_data)} images ({sum(1 for _, is_real in test_data if is_real)} real, "
           f"{sum(1 for _, is_real in test_data if not is_real)} fake)")
@@ -141,24 +152,24 @@ def evaluate_antispoofing():
     
     if not y_true:
         print("❌ No valid results to evaluate")
-        return
+        return None
         
     # Calculate metrics
-    cm = confusion_matrix(y_true, y_pred)
+    cm = metrics.confusion_matrix(y_true, y_pred)
     tn, fp, fn, tp = cm.ravel()
     
     # Standard metrics
-    accuracy = accuracy_score(y_true, y_pred)
-    precision = precision_score(y_true, y_pred)
-    recall = recall_score(y_true, y_pred)
-    f1 = f1_score(y_true, y_pred)
+    accuracy = metrics.accuracy_score(y_true, y_pred)
+    precision = metrics.precision_score(y_true, y_pred)
+    recall = metrics.recall_score(y_true, y_pred)
+    f1 = metrics.f1_score(y_true, y_pred)
     
     # Security metrics
     far = fp / (fp + tn)  # False Acceptance Rate (fake accepted as real)
     frr = fn / (fn + tp)  # False Rejection Rate (real rejected as fake)
     
     # Calculate EER
-    fpr, tpr, thresholds = roc_curve(y_true, scores)
+    fpr, tpr, thresholds = metrics.roc_curve(y_true, scores)
     fnr = 1 - tpr
     eer_threshold = thresholds[np.nanargmin(np.absolute(fnr - fpr))]
     eer = np.mean([fpr[np.nanargmin(np.absolute(fnr - fpr))], 
@@ -231,7 +242,7 @@ def evaluate_antispoofing():
     
     # Plot ROC curve
     plt.subplot(2, 2, 2)
-    plt.plot(fpr, tpr, label=f'AUC = {auc(fpr, tpr):.4f}')
+    plt.plot(fpr, tpr, label=f'AUC = {metrics.auc(fpr, tpr):.4f}')
     plt.plot([0, 1], [0, 1], 'k--')
     plt.title('ROC Curve')
     plt.xlabel('False Positive Rate')
@@ -251,17 +262,17 @@ def evaluate_antispoofing():
     
     # Plot precision-recall curve
     plt.subplot(2, 2, 4)
-    precision_curve, recall_curve, _ = precision_recall_curve(y_true, scores)
+    precision_curve, recall_curve, _ = metrics.precision_recall_curve(y_true, scores)
     plt.plot(recall_curve, precision_curve, 
-             label=f'AP = {auc(recall_curve, precision_curve):.4f}')
+             label=f'AP = {metrics.auc(recall_curve, precision_curve):.4f}')
     plt.title('Precision-Recall Curve')
     plt.xlabel('Recall')
     plt.ylabel('Precision')
     plt.legend()
     
     plt.tight_layout()
-    plt.savefig("antispoofing_evaluation.png")
-    print(f"✅ Evaluation charts saved to antispoofing_evaluation.png")
+    plt.savefig(f"{output_prefix}_evaluation.png")
+    print(f"✅ Evaluation charts saved to {output_prefix}_evaluation.png")
     
     # Create timing analysis charts - Second page
     plt.figure(figsize=(10, 8))
@@ -311,8 +322,8 @@ def evaluate_antispoofing():
     plt.ylabel('Time (seconds)')
     
     plt.tight_layout()
-    plt.savefig("antispoofing_speed_analysis.png")
-    print(f"✅ Speed analysis charts saved to antispoofing_speed_analysis.png")
+    plt.savefig(f"{output_prefix}_speed_analysis.png")
+    print(f"✅ Speed analysis charts saved to {output_prefix}_speed_analysis.png")
     
     # Save success and error examples
     correct_reals = [r for r in results if r["ground_truth"] == "real" and r["correct"]]
@@ -342,7 +353,7 @@ def evaluate_antispoofing():
         print(f"{i+1}. {example['path']} ({example['total_time']:.4f}s, {example['ground_truth']})")
         
     # Save results to CSV
-    with open("antispoofing_results.csv", "w", newline="") as f:
+    with open(f"{output_prefix}_results.csv", "w", newline="") as f:
         writer = csv.writer(f)
         writer.writerow([
             "Image Path", "Ground Truth", "Prediction", "Score", "Correct",
@@ -359,10 +370,10 @@ def evaluate_antispoofing():
                 f"{r['analysis_time']:.4f}",
                 f"{r['total_time']:.4f}"
             ])
-    print(f"✅ Detailed results saved to antispoofing_results.csv")
+    print(f"✅ Detailed results saved to {output_prefix}_results.csv")
     
     # Save speed summary to CSV
-    with open("antispoofing_speed_summary.csv", "w", newline="") as f:
+    with open(f"{output_prefix}_speed_summary.csv", "w", newline="") as f:
         writer = csv.writer(f)
         writer.writerow(["Metric", "Value"])
         writer.writerow(["Average Detection Time (s)", f"{avg_detection_time:.6f}"])
@@ -379,7 +390,56 @@ def evaluate_antispoofing():
         writer.writerow(["FP Avg Time (s)", f"{np.mean(times_fp) if times_fp else 0:.6f}"])
         writer.writerow(["FN Avg Time (s)", f"{np.mean(times_fn) if times_fn else 0:.6f}"])
     
-    print(f"✅ Speed summary saved to antispoofing_speed_summary.csv")
+    print(f"✅ Speed summary saved to {output_prefix}_speed_summary.csv")
+    
+    return {
+        "accuracy": accuracy,
+        "far": far,
+        "frr": frr,
+        "eer": eer,
+        "avg_analysis_time": avg_analysis_time,
+        "model_load_time": model_load_time,
+        "predictions": {r["path"]: r["prediction"] for r in results},
+    }
+
+def compare_quantization(quantization, calibration_dir=None):
+    """
+    Run the evaluation with the float32 models and with the quantized models,
+    then report the accuracy and speed deltas
+    """
+    baseline = evaluate_antispoofing(output_prefix="antispoofing_fp32")
+    quantized = evaluate_antispoofing(quantization, calibration_dir, output_prefix=f"antispoofing_{quantization}_int8")
+    if baseline is None or quantized is None:
+        print("❌ Comparison needs both runs to succeed")
+        return
+    
+    common = set(baseline["predictions"]) & set(quantized["predictions"])
+    changed = [path for path in common if baseline["predictions"][path] != quantized["predictions"][path]]
+    
+    print(f"\n======= FP32 vs {quantization.upper()} INT8 =======")
+    print(f"{'Metric':<28}{'FP32':>10}{'INT8':>10}{'Delta':>10}")
+    for key, label in (("accuracy", "Accuracy"), ("far", "FAR"), ("frr", "FRR"), ("eer", "EER"),
+                       ("avg_analysis_time", "Avg analysis time (s)"), ("model_load_time", "Model load time (s)")):
+        delta = quantized[key] - baseline[key]
+        print(f"{label:<28}{baseline[key]:>10.4f}{quantized[key]:>10.4f}{delta:>+10.4f}")
+    
+    speedup = baseline["avg_analysis_time"] / quantized["avg_analysis_time"] if quantized["avg_analysis_time"] > 0 else 0
+    print(f"Analysis speedup: {speedup:.2f}x")
+    print(f"Changed decisions: {len(changed)}/{len(common)} images")
+    for path in sorted(changed)[:10]:
+        print(f"  {path}: {baseline['predictions'][path]} -> {quantized['predictions'][path]}")
 
 if __name__ == "__main__":
-    evaluate_antispoofing()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Evaluate the anti-spoofing models on spoofing_test/")
+    parser.add_argument("--quantization", choices=["dynamic"], default=None,
+                        help="Run the models with int8 post-training quantization")
+    parser.add_argument("--calibration-dir", default=None,
+                        help="Folder with real/ and fake/ face crops for the int8 parity check")
+    parser.add_argument("--compare", action="store_true",
+                        help="Evaluate both float32 and quantized models and report the deltas")
+    args = parser.parse_args()
+    
+    if args.compare:
+        compare_quantization(args.quantization or "dynamic", args.calibration_dir)
+    else:
+        evaluate_antispoofing(args.quantization, args.calibration_dir)
\ No newline at end of file
@@ -0,0 +1,220 @@
+# Preview MJPEG qua HTTP: xem frame (đã vẽ kết quả nhận diện hoặc frame camera gốc) bằng trình
+# duyệt hoặc VLC tại http://<host>:<port>/video, hoặc dùng URL đó làm --source cho một máy khác.
+#
+# Mỗi frame chỉ được mã hóa JPEG một lần trên thread encoder, rồi cùng bytes đó được gửi cho mọi
+# client. Không có client nào thì không mã hóa gì; client chậm bỏ qua frame thay vì làm chậm
+# encoder hay các client khác. GET /stats trả về thống kê dạng JSON.
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+BOUNDARY = "frame"
+
+
+class MjpegStreamer:
+    """
+    Server MJPEG nhỏ dùng http.server của thư viện chuẩn.
+
+    publish() chỉ giữ tham chiếu tới frame mới nhất và đánh thức encoder (không chặn pipeline).
+    Thread encoder resize/mã hóa frame mới nhất khi có ít nhất một client; mỗi client chờ
+    bytes JPEG mới hơn bytes nó đã gửi, nên client chậm chỉ bỏ lỡ các frame ở giữa.
+    """
+
+    def __init__(self, host="0.0.0.0", port=8080, quality=80, width=None, max_fps=None):
+        """
+        Args:
+            host: Địa chỉ lắng nghe
+            port: Cổng HTTP
+            quality: Chất lượng JPEG (0-100)
+            width: Chiều rộng ảnh phát (giữ tỷ lệ), None để giữ nguyên kích thước frame
+            max_fps: Số frame mã hóa tối đa mỗi giây, None để không giới hạn
+        """
+        self.host = host
+        self.port = port
+        self.quality = quality
+        self.width = width
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.server = None
+        self.thread = None
+        self.encoder_thread = None
+        self.running = False
+
+        self._cond = threading.Condition()
+        self._frame = None  # frame BGR mới nhất chưa mã hóa
+        self._jpeg = None
+        self._sequence = 0  # tăng mỗi lần có bytes JPEG mới
+        self._clients = 0
+
+        self.frames_published = 0
+        self.frames_encoded = 0
+        self.frames_sent = 0
+        self.frames_skipped = 0  # frame client chậm bỏ lỡ
+        self.total_encode_time = 0.0
+
+    def start(self):
+        self.server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self.server.daemon_threads = True
+        self.running = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="mjpeg-server", daemon=True)
+        self.thread.start()
+        self.encoder_thread = threading.Thread(target=self._encode_loop, name="mjpeg-encoder", daemon=True)
+        self.encoder_thread.start()
+        print(f"📺 MJPEG preview on http://{self.host}:{self.port}/video")
+        return self
+
+    def stop(self):
+        self.running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        if self.encoder_thread is not None:
+            self.encoder_thread.join(timeout=2.0)
+
+    @property
+    def client_count(self):
+        return self._clients
+
+    def has_clients(self):
+        return self._clients > 0
+
+    def publish(self, image):
+        """
+        Đưa frame mới cho encoder; trả về ngay (không mã hóa trên thread gọi)
+
+        Args:
+            image: Frame BGR, không được sửa sau khi gửi
+
+        Returns:
+            True nếu có client đang xem (frame sẽ được mã hóa)
+        """
+        if not self._clients:
+            return False
+        with self._cond:
+            self._frame = image
+            self.frames_published += 1
+            self._cond.notify_all()
+        return True
+
+    def on_frame(self, frame):
+        """Listener cho VideoCaptureThread.add_listener: phát frame camera gốc"""
+        self.publish(frame.image)
+
+    def _encode_loop(self):
+        last_encode = 0.0
+        while self.running:
+            with self._cond:
+                self._cond.wait_for(lambda: self._frame is not None or not self.running, timeout=0.5)
+                image, self._frame = self._frame, None
+            if image is None:
+                continue
+
+            wait = last_encode + self.min_interval - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)  # frame mới hơn đến trong lúc chờ sẽ thay frame này ở vòng sau
+                with self._cond:
+                    if self._frame is not None:
+                        image, self._frame = self._frame, None
+
+            start = time.perf_counter()
+            if self.width and image.shape[1] != self.width:
+                height = int(image.shape[0] * self.width / image.shape[1])
+                image = cv2.resize(image, (self.width, height), interpolation=cv2.INTER_AREA)
+            ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            last_encode = time.perf_counter()
+            if not ok:
+                continue
+
+            with self._cond:
+                self._jpeg = buffer.tobytes()
+                self._sequence += 1
+                self.frames_encoded += 1
+                self.total_encode_time += last_encode - start
+                self._cond.notify_all()
+
+    def _wait_frame(self, last_sequence, timeout=1.0):
+        """Chờ bytes JPEG mới hơn last_sequence, trả về (sequence, jpeg) hoặc (last_sequence, None)"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._sequence != last_sequence or not self.running, timeout)
+            if self._sequence == last_sequence or self._jpeg is None:
+                return last_sequence, None
+            if last_sequence:
+                self.frames_skipped += self._sequence - last_sequence - 1
+            return self._sequence, self._jpeg
+
+    def stats(self):
+        return {
+            "clients": self._clients,
+            "frames_published": self.frames_published,
+            "frames_encoded": self.frames_encoded,
+            "frames_sent": self.frames_sent,
+            "frames_skipped": self.frames_skipped,
+            "avg_encode_ms": 1000 * self.total_encode_time / self.frames_encoded if self.frames_encoded else 0.0,
+            "quality": self.quality,
+            "width": self.width,
+        }
+
+    def report(self):
+        stats = self.stats()
+        print(f"📺 MJPEG: {stats['frames_encoded']} frames encoded (avg {stats['avg_encode_ms']:.1f} ms), "
+              f"{stats['frames_sent']} sent, {stats['frames_skipped']} skipped by slow clients")
+
+    def _make_handler(self):
+        streamer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Client không đọc tiếp trong 10 giây bị ngắt thay vì giữ thread mãi
+            timeout = 10
+
+            def log_message(self, format, *args):
+                pass  # không in log cho mỗi request
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path == "/stats":
+                    body = json.dumps(streamer.stats()).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                if path != "/video":
+                    self.send_error(404, "Use /video or /stats")
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+
+                with streamer._cond:
+                    streamer._clients += 1
+                    # Bắt đầu từ frame được mã hóa sau khi kết nối: JPEG đang cache có thể đã cũ
+                    # (ví dụ camera bị treo hoặc chưa ai xem một lúc)
+                    sequence = streamer._sequence
+                try:
+                    while streamer.running:
+                        sequence, jpeg = streamer._wait_frame(sequence)
+                        if jpeg is None:
+                            continue
+                        # Ghi xong một frame mới lấy frame kế tiếp: client chậm bỏ qua frame ở giữa
+                        self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                         f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                        self.wfile.write(jpeg)
+                        self.wfile.write(b"\r\n")
+                        with streamer._cond:
+                            streamer.frames_sent += 1
+                except OSError:
+                    pass  # client đã đóng kết nối hoặc quá timeout
+                finally:
+                    with streamer._cond:
+                        streamer._clients -= 1
+                        if not streamer._clients:
+                            streamer._frame = None  # không mã hóa frame còn chờ khi không ai xem
+
+        return Handler
@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import namedtuple
+
+# Kết quả nhận diện của một nguồn: list dict của process_image, thời điểm chụp frame đã xử lý,
+# thời điểm xử lý xong
+RecognitionResult = namedtuple("RecognitionResult", ["results", "frame_timestamp", "finished_at"])
+
+
+class RecognitionWorker:
+    """
+    Chạy nhận diện trên thread riêng để UI vẽ frame camera theo tốc độ màn hình.
+
+    UI gửi frame mới nhất của mỗi nguồn bằng submit(); nếu worker đang bận, frame chờ trước đó
+    bị thay bằng frame mới (không xếp hàng), nên kết quả luôn ứng với frame gần nhất có thể.
+    """
+
+    def __init__(self, face_system):
+        self.face_system = face_system
+        self.running = False
+        self.thread = None
+
+        self._cond = threading.Condition()
+        self._pending = None  # {source_id: (image, timestamp)} chờ xử lý
+        self._latest = {}  # source_id -> RecognitionResult
+        self._sequence = 0  # tăng mỗi lần có kết quả mới
+
+        self.processed = 0
+        self.replaced = 0
+        self.total_time = 0.0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="recognition-worker", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+
+    def submit(self, frames):
+        """
+        Args:
+            frames: Dict {source_id: (image, capture timestamp)}; ảnh không được sửa sau khi gửi
+        """
+        with self._cond:
+            if self._pending is not None:
+                self.replaced += 1
+                # Giữ frame của các nguồn không có trong lần gửi này
+                frames = {**self._pending, **frames}
+            self._pending = frames
+            self._cond.notify()
+
+    def latest(self):
+        """
+        Returns:
+            Tuple (sequence, {source_id: RecognitionResult}); sequence đổi khi có kết quả mới
+        """
+        with self._cond:
+            return self._sequence, dict(self._latest)
+
+    def _run(self):
+        while self.running:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or not self.running, timeout=0.5)
+                if self._pending is None:
+                    continue
+                frames, self._pending = self._pending, None
+
+            source_ids = list(frames)
+            start = time.perf_counter()
+            try:
+                all_results = self.face_system.process_images([frames[sid][0] for sid in source_ids], source_ids)
+            except Exception as e:
+                print(f"❌ Recognition worker error: {e}")
+                continue
+            self.total_time += time.perf_counter() - start
+            self.processed += 1
+
+            finished_at = time.time()
+            with self._cond:
+                for source_id, results in zip(source_ids, all_results):
+                    self._latest[source_id] = RecognitionResult(results, frames[source_id][1], finished_at)
+                self._sequence += 1
+
+    def stats(self):
+        return {
+            "processed": self.processed,
+            "replaced": self.replaced,
+            "avg_time_ms": 1000 * self.total_time / self.processed if self.processed else 0.0,
+        }
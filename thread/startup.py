@@ -0,0 +1,152 @@
+import threading
+import time
+
+
+class StartupOrchestrator:
+    """
+    Nạp các thành phần nặng (model, database...) song song khi khởi động.
+
+    Mỗi thành phần chạy trong một thread riêng: chờ các thành phần phụ thuộc, gọi loader,
+    sau đó chạy warmup (một lần suy luận giả để interpreter/graph cấp phát bộ nhớ trước frame đầu tiên).
+    Thời gian nạp và warmup của từng thành phần được ghi lại để in báo cáo khởi động.
+    """
+
+    PENDING = "pending"
+    LOADING = "loading"
+    WARMING_UP = "warming up"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(self):
+        self._components = {}
+        self._start_time = None
+        self._lock = threading.Lock()
+
+    def add(self, name, loader, warmup=None, depends_on=(), optional=False):
+        """
+        Đăng ký một thành phần
+
+        Args:
+            name: Tên thành phần, cũng là tên tham số khi truyền cho loader phụ thuộc vào nó
+            loader: Hàm tạo thành phần; nhận các thành phần trong depends_on làm keyword argument
+            warmup: Hàm tùy chọn nhận thành phần vừa tạo và chạy một lần suy luận giả
+            depends_on: Tên các thành phần phải sẵn sàng trước khi gọi loader
+            optional: True nếu hệ thống vẫn chạy được khi thành phần này nạp lỗi (kết quả là None)
+        """
+        self._components[name] = {
+            "loader": loader,
+            "warmup": warmup,
+            "depends_on": tuple(depends_on),
+            "optional": optional,
+            "status": self.PENDING,
+            "result": None,
+            "error": None,
+            "load_time": 0.0,
+            "warmup_time": 0.0,
+            "ready_at": None,
+            "done": threading.Event(),
+        }
+        return self
+
+    def start(self):
+        """Bắt đầu nạp tất cả thành phần trong nền"""
+        self._start_time = time.perf_counter()
+        for name in self._components:
+            threading.Thread(target=self._run, args=(name,), name=f"startup-{name}", daemon=True).start()
+        return self
+
+    def _run(self, name):
+        component = self._components[name]
+        try:
+            deps = {}
+            for dep in component["depends_on"]:
+                dependency = self._components[dep]
+                dependency["done"].wait()
+                if dependency["status"] != self.READY:
+                    raise RuntimeError(f"dependency '{dep}' failed to load")
+                deps[dep] = dependency["result"]
+
+            self._set_status(name, self.LOADING)
+            start = time.perf_counter()
+            result = component["loader"](**deps)
+            component["load_time"] = time.perf_counter() - start
+
+            if component["warmup"] is not None:
+                self._set_status(name, self.WARMING_UP)
+                start = time.perf_counter()
+                component["warmup"](result)
+                component["warmup_time"] = time.perf_counter() - start
+
+            component["result"] = result
+            self._set_status(name, self.READY)
+        except Exception as e:
+            component["error"] = e
+            self._set_status(name, self.FAILED)
+            print(f"❌ Failed to load {name}: {e}")
+        finally:
+            component["ready_at"] = time.perf_counter() - self._start_time
+            component["done"].set()
+
+    def _set_status(self, name, status):
+        with self._lock:
+            self._components[name]["status"] = status
+
+    def status(self):
+        """Trạng thái hiện tại của từng thành phần: {name: status}"""
+        with self._lock:
+            return {name: component["status"] for name, component in self._components.items()}
+
+    def is_done(self):
+        """True khi mọi thành phần đã nạp xong (thành công hoặc lỗi)"""
+        return all(component["done"].is_set() for component in self._components.values())
+
+    def wait(self, timeout=None):
+        """
+        Chờ tất cả thành phần nạp xong
+
+        Returns:
+            Dict {name: component}
+
+        Raises:
+            TimeoutError nếu hết thời gian chờ, RuntimeError nếu có thành phần bắt buộc nạp lỗi
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for name, component in self._components.items():
+            remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            if not component["done"].wait(remaining):
+                raise TimeoutError(f"Timed out waiting for {name} to load")
+
+        failed = {name: c["error"] for name, c in self._components.items()
+                  if c["status"] == self.FAILED and not c["optional"]}
+        if failed:
+            details = ", ".join(f"{name}: {error}" for name, error in failed.items())
+            raise RuntimeError(f"Startup failed ({details})")
+        return {name: component["result"] for name, component in self._components.items()}
+
+    def timings(self):
+        """Thời gian nạp/warmup của từng thành phần, theo thứ tự sẵn sàng"""
+        rows = [
+            {
+                "name": name,
+                "status": component["status"],
+                "load_time": component["load_time"],
+                "warmup_time": component["warmup_time"],
+                "ready_at": component["ready_at"],
+            }
+            for name, component in self._components.items()
+        ]
+        return sorted(rows, key=lambda row: float("inf") if row["ready_at"] is None else row["ready_at"])
+
+    def report(self):
+        """In bảng thời gian khởi động của từng thành phần"""
+        rows = self.timings()
+        print("\n⏱️ STARTUP TIMING")
+        print(f"{'Component':<14}{'Load (s)':>10}{'Warmup (s)':>12}{'Ready at (s)':>14}  Status")
+        for row in rows:
+            ready_at = f"{row['ready_at']:.2f}" if row["ready_at"] is not None else "-"
+            print(f"{row['name']:<14}{row['load_time']:>10.2f}{row['warmup_time']:>12.2f}{ready_at:>14}  {row['status']}")
+
+        serial = sum(row["load_time"] + row["warmup_time"] for row in rows)
+        finished = [row["ready_at"] for row in rows if row["ready_at"] is not None]
+        wall = max(finished) if finished else 0.0
+        print(f"Total: {wall:.2f}s wall clock ({serial:.2f}s if loaded one after another)\n")
@@ -1,34 +1,268 @@
+import os
+import time
+from collections import OrderedDict, deque, namedtuple
+from threading import Condition, Thread
+
 import cv2
-from threading import Thread
+
+# Một frame kèm nguồn của nó: source_id, ảnh BGR, số thứ tự trong nguồn, thời điểm đọc (time.time())
+Frame = namedtuple("Frame", ["source_id", "image", "frame_id", "timestamp"])
+
+# Chính sách khi consumer xử lý chậm hơn camera:
+#   latest       - chỉ giữ frame mới nhất (camera trực tiếp, độ trễ thấp nhất)
+#   drop_oldest  - giữ tối đa buffer_size frame, bỏ frame cũ nhất khi đầy
+#   block        - reader chờ consumer, không bỏ frame nào (video file)
+#   none         - không có consumer gọi get(): không giữ frame nào, chỉ read() và listener
+#                  (ví dụ camera.py chỉ phát qua MjpegStreamer), nên không có frame nào bị tính là bỏ
+DROP_POLICIES = ("latest", "drop_oldest", "block", "none")
+
+
+def parse_source(src):
+    """
+    Chuyển chuỗi nguồn từ command line sang tham số của cv2.VideoCapture:
+    "0" -> 0 (USB), còn RTSP/HTTP MJPEG URL (ví dụ http://pi:8080/video của camera.py) và đường dẫn file giữ nguyên
+    """
+    if isinstance(src, str) and src.isdigit():
+        return int(src)
+    return src
+
 
 class VideoCaptureThread:
-    def __init__(self, src=0):
-        self.cap = cv2.VideoCapture(src)
+    def __init__(self, src=0, source_id=None, drop_policy=None, buffer_size=4, reconnect_delay=2.0, loop=False):
+        """
+        Args:
+            src: Chỉ số USB camera, URL RTSP/HTTP MJPEG hoặc đường dẫn video file
+            source_id: ID gắn vào mỗi Frame, mặc định là str(src)
+            drop_policy: Một trong DROP_POLICIES; mặc định "block" cho file, "latest" cho camera/stream
+            buffer_size: Số frame tối đa chờ consumer với "drop_oldest"/"block"
+            reconnect_delay: Số giây chờ trước khi mở lại stream bị ngắt
+            loop: Phát lại video file từ đầu khi hết
+        """
+        self.src = parse_source(src)
+        self.source_id = source_id if source_id is not None else str(src)
+        self.is_file = isinstance(self.src, str) and os.path.isfile(self.src)
+        if drop_policy is None:
+            drop_policy = "block" if self.is_file else "latest"
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy '{drop_policy}', expected one of {DROP_POLICIES}")
+        self.drop_policy = drop_policy
+        self.reconnect_delay = reconnect_delay
+        self.loop = loop
+
+        self.cap = cv2.VideoCapture(self.src)
         self.running = False
+        self.finished = False  # video file đã đọc hết
+        self.thread = None
         self.frame = None
 
+        self._buffer = deque(maxlen=1 if drop_policy == "latest" else buffer_size)
+        self._cond = Condition()
+        self._frame_id = 0
+        self._listeners = []  # hàm listener(frame) được gọi trên reader thread với mỗi Frame mới
+
+        # Gauges: FPS đọc từ nguồn và độ trễ từ lúc đọc tới lúc consumer lấy frame (EMA)
+        self.fps = 0.0
+        self.latency = 0.0
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.reconnects = 0
+        self._last_read = None
+
     def start(self):
         if not self.cap.isOpened():
-            print("❌ Failed to open camera")
-            return self
+            print(f"❌ Failed to open camera {self.source_id}")
+            if self.is_file:
+                return self
         self.running = True
-        self.thread = Thread(target=self._update, daemon=True)
+        self.thread = Thread(target=self._update, name=f"capture-{self.source_id}", daemon=True)
         self.thread.start()
         return self
 
     def _update(self):
         while self.running:
+            if not self.cap.isOpened():
+                # Stream mạng/USB bị ngắt: thử mở lại sau reconnect_delay
+                time.sleep(self.reconnect_delay)
+                self.cap.release()
+                self.cap = cv2.VideoCapture(self.src)
+                self.reconnects += 1
+                if self.cap.isOpened():
+                    print(f"🔄 Reconnected camera {self.source_id}")
+                continue
+
             ret, frame = self.cap.read()
-            if ret:
-                self.frame = frame
+            if not ret:
+                if self.is_file:
+                    if self.loop:
+                        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        continue
+                    break
+                print(f"⚠️ Lost camera {self.source_id}, reconnecting...")
+                self.cap.release()
+                continue
+            self._push(frame)
+
+        with self._cond:
+            self.finished = True
+            self._cond.notify_all()
+
+    def _push(self, image):
+        now = time.time()
+        if self._last_read is not None and now > self._last_read:
+            self.fps = 0.9 * self.fps + 0.1 / (now - self._last_read) if self.fps else 1.0 / (now - self._last_read)
+        self._last_read = now
+
+        with self._cond:
+            if self.drop_policy == "block":
+                while self.running and len(self._buffer) >= self._buffer.maxlen:
+                    self._cond.wait(0.1)
+            elif self.drop_policy != "none" and len(self._buffer) == self._buffer.maxlen:
+                self.frames_dropped += 1  # deque tự bỏ frame cũ nhất khi append
+            self._frame_id += 1
+            self.frames_read += 1
+            frame = Frame(self.source_id, image, self._frame_id, now)
+            if self.drop_policy != "none":
+                self._buffer.append(frame)
+            self.frame = image
+            self._cond.notify_all()
+
+        for listener in self._listeners:
+            listener(frame)
+
+    def add_listener(self, listener):
+        """
+        Đăng ký listener(frame) nhận mọi Frame đọc được, không phụ thuộc drop policy của consumer
+        (ví dụ MjpegStreamer.on_frame để phát frame gốc mà không mở camera lần nữa).
+        Listener chạy trên reader thread nên phải trả về ngay và không được sửa ảnh.
+        """
+        self._listeners.append(listener)
 
     def read(self):
+        """Frame mới nhất (không lấy ra khỏi buffer), giữ nguyên cách dùng như cv2.VideoCapture"""
         return self.frame
 
+    def get(self, timeout=None):
+        """
+        Lấy frame kế tiếp theo drop policy
+
+        Args:
+            timeout: Số giây chờ frame mới; 0 để không chờ, None để chờ tới khi có
+
+        Returns:
+            Frame hoặc None nếu chưa có frame mới / nguồn đã dừng
+        """
+        with self._cond:
+            if not self._buffer and timeout != 0:
+                self._cond.wait_for(lambda: self._buffer or self.finished or not self.running, timeout)
+            if not self._buffer:
+                return None
+            frame = self._buffer.popleft()
+            self._cond.notify_all()
+
+        age = time.time() - frame.timestamp
+        self.latency = 0.9 * self.latency + 0.1 * age if self.latency else age
+        return frame
+
+    def stats(self):
+        """Gauge của nguồn: FPS đọc, độ trễ tới consumer (ms), số frame đã đọc/bỏ"""
+        return {
+            "source_id": self.source_id,
+            "fps": self.fps,
+            "latency_ms": 1000 * self.latency,
+            "frames_read": self.frames_read,
+            "frames_dropped": self.frames_dropped,
+            "queued": len(self._buffer),
+            "reconnects": self.reconnects,
+            "drop_policy": self.drop_policy,
+            "finished": self.finished,
+        }
+
     def stop(self):
         self.running = False
-        self.thread.join()
+        with self._cond:
+            self._cond.notify_all()
+        if self.thread is not None:
+            self.thread.join()
         self.cap.release()
 
     def release(self):
         self.stop()  # để tương thích với cv2.VideoCapture.release()
+
+
+class CaptureManager:
+    """
+    Mở nhiều nguồn video cùng lúc (USB, RTSP, MJPEG từ camera.py, video file), mỗi nguồn một
+    VideoCaptureThread với reader thread, drop policy và gauge FPS/độ trễ riêng
+    """
+
+    def __init__(self):
+        self.sources = OrderedDict()  # source_id -> VideoCaptureThread
+
+    def add_source(self, src, source_id=None, **kwargs):
+        """
+        Thêm một nguồn; kwargs được truyền cho VideoCaptureThread (drop_policy, buffer_size, loop...)
+
+        Returns:
+            source_id của nguồn
+        """
+        if source_id is None:
+            source_id = f"cam{len(self.sources)}"
+        if source_id in self.sources:
+            raise ValueError(f"Duplicate source id '{source_id}'")
+        self.sources[source_id] = VideoCaptureThread(src, source_id=source_id, **kwargs)
+        return source_id
+
+    def start(self):
+        for source in self.sources.values():
+            source.start()
+        return self
+
+    @property
+    def source_ids(self):
+        return list(self.sources)
+
+    def add_listener(self, listener, source_id=None):
+        """Đăng ký listener(frame) cho một nguồn (mặc định nguồn đầu tiên), xem VideoCaptureThread.add_listener"""
+        if source_id is None:
+            source_id = next(iter(self.sources))
+        self.sources[source_id].add_listener(listener)
+
+    def read(self, source_id=None):
+        """Ảnh mới nhất của một nguồn (mặc định nguồn đầu tiên), giống VideoCaptureThread.read()"""
+        if source_id is None:
+            source_id = next(iter(self.sources))
+        return self.sources[source_id].read()
+
+    def poll(self):
+        """
+        Lấy frame mới (chưa xử lý) của mọi nguồn mà không chờ
+
+        Returns:
+            Dict {source_id: Frame}, chỉ chứa các nguồn có frame mới
+        """
+        frames = OrderedDict()
+        for source_id, source in self.sources.items():
+            frame = source.get(timeout=0)
+            if frame is not None:
+                frames[source_id] = frame
+        return frames
+
+    def is_running(self):
+        """True khi còn ít nhất một nguồn đang đọc (video file đọc hết thì dừng)"""
+        return any(source.running and not source.finished for source in self.sources.values())
+
+    def stats(self):
+        return {source_id: source.stats() for source_id, source in self.sources.items()}
+
+    def report(self):
+        """In gauge của từng nguồn"""
+        for stats in self.stats().values():
+            print(f"📷 {stats['source_id']}: {stats['fps']:.1f} fps, latency {stats['latency_ms']:.0f} ms, "
+                  f"{stats['frames_read']} read / {stats['frames_dropped']} dropped ({stats['drop_policy']})")
+
+    def stop(self):
+        for source in self.sources.values():
+            source.stop()
+
+    def release(self):
+        self.stop()
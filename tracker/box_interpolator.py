@@ -0,0 +1,59 @@
+class BoxInterpolator:
+    """
+    Dự đoán vị trí hộp khuôn mặt tại thời điểm của frame đang hiển thị, dựa trên hai kết quả
+    nhận diện gần nhất của cùng một track (ngoại suy tuyến tính theo vận tốc).
+    Giúp hộp bám theo khuôn mặt khi UI vẽ nhanh hơn tốc độ nhận diện.
+    """
+
+    def __init__(self, max_extrapolation=0.3):
+        """
+        Args:
+            max_extrapolation: Số giây tối đa được ngoại suy sau kết quả cuối; quá thời gian này
+                hộp đứng yên ở vị trí cuối để tránh trôi xa khi nhận diện bị trễ lâu
+        """
+        self.max_extrapolation = max_extrapolation
+        self.results = []
+        self.timestamp = None
+        self._velocities = {}  # track_id -> (vx1, vy1, vx2, vy2) pixel/giây
+        self._previous = {}  # track_id -> (box, timestamp)
+
+    def update(self, results, timestamp):
+        """
+        Args:
+            results: Kết quả process_image của frame chụp lúc timestamp
+            timestamp: Thời điểm chụp frame đã được nhận diện
+        """
+        velocities = {}
+        current = {}
+        for result in results:
+            track_id = result.get("track_id")
+            if track_id is None:
+                continue
+            box = result["box"]
+            current[track_id] = (box, timestamp)
+            previous = self._previous.get(track_id)
+            if previous is not None and timestamp > previous[1]:
+                dt = timestamp - previous[1]
+                velocities[track_id] = tuple((b - p) / dt for b, p in zip(box, previous[0]))
+        self._previous = current
+        self._velocities = velocities
+        self.results = results
+        self.timestamp = timestamp
+
+    def predict(self, timestamp):
+        """Kết quả với hộp đã được dịch tới thời điểm timestamp của frame hiển thị"""
+        if self.timestamp is None or not self._velocities:
+            return self.results
+        dt = min(max(0.0, timestamp - self.timestamp), self.max_extrapolation)
+        if dt == 0.0:
+            return self.results
+
+        predicted = []
+        for result in self.results:
+            velocity = self._velocities.get(result.get("track_id"))
+            if velocity is None:
+                predicted.append(result)
+                continue
+            box = tuple(int(round(b + v * dt)) for b, v in zip(result["box"], velocity))
+            predicted.append({**result, "box": box})
+        return predicted
@@ -0,0 +1,84 @@
+import itertools
+import numpy as np
+
+
+class IoUTracker:
+    """
+    Tracker đơn giản gán ID ổn định cho khuôn mặt giữa các frame liên tiếp
+    bằng cách ghép hộp theo IoU (greedy). Đủ rẻ để chạy mỗi frame trên Raspberry Pi.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_missed=5, id_counter=None):
+        """
+        Args:
+            iou_threshold: IoU tối thiểu để coi hai hộp là cùng một khuôn mặt
+            max_missed: Số frame liên tiếp không thấy trước khi xóa track
+            id_counter: Iterator cấp track ID tùy chọn, dùng chung giữa các tracker của nhiều camera
+                để ID không bị trùng
+        """
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.tracks = {}  # track_id -> {"box": (x1, y1, x2, y2), "missed": int}
+        self._next_id = id_counter if id_counter is not None else itertools.count(1)
+
+    @staticmethod
+    def iou(box_a, box_b):
+        x1 = max(box_a[0], box_b[0])
+        y1 = max(box_a[1], box_b[1])
+        x2 = min(box_a[2], box_b[2])
+        y2 = min(box_a[3], box_b[3])
+        inter = max(0, x2 - x1) * max(0, y2 - y1)
+        if inter == 0:
+            return 0.0
+        area_a = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1])
+        area_b = (box_b[2] - box_b[0]) * (box_b[3] - box_b[1])
+        return inter / float(area_a + area_b - inter)
+
+    def update(self, boxes):
+        """
+        Ghép các hộp của frame hiện tại với các track đang có
+
+        Args:
+            boxes: List các hộp (x1, y1, x2, y2)
+
+        Returns:
+            List track_id tương ứng với từng hộp
+        """
+        track_ids = list(self.tracks.keys())
+        assigned = [None] * len(boxes)
+
+        if track_ids and boxes:
+            ious = np.array([[self.iou(self.tracks[tid]["box"], box) for box in boxes] for tid in track_ids])
+            # Ghép greedy theo IoU giảm dần
+            used_tracks, used_boxes = set(), set()
+            for flat_idx in np.argsort(ious, axis=None)[::-1]:
+                t_idx, b_idx = np.unravel_index(flat_idx, ious.shape)
+                if ious[t_idx, b_idx] < self.iou_threshold:
+                    break
+                if t_idx in used_tracks or b_idx in used_boxes:
+                    continue
+                used_tracks.add(t_idx)
+                used_boxes.add(b_idx)
+                assigned[b_idx] = track_ids[t_idx]
+
+        matched = set()
+        for b_idx, box in enumerate(boxes):
+            track_id = assigned[b_idx]
+            if track_id is None:
+                track_id = next(self._next_id)
+                assigned[b_idx] = track_id
+            self.tracks[track_id] = {"box": tuple(box), "missed": 0}
+            matched.add(track_id)
+
+        # Tăng bộ đếm cho các track không xuất hiện, xóa nếu mất quá lâu
+        for track_id in track_ids:
+            if track_id in matched:
+                continue
+            self.tracks[track_id]["missed"] += 1
+            if self.tracks[track_id]["missed"] > self.max_missed:
+                del self.tracks[track_id]
+
+        return assigned
+
+    def active_ids(self):
+        return set(self.tracks.keys())
@@ -0,0 +1,297 @@
+import signal
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from api.AttendanceAPIClient import AttendanceAPIClient
+from utils.lazy_import import lazy_import
+
+ui_module = lazy_import("ui.ui")
+mjpeg_module = lazy_import("stream.mjpeg")
+
+# Các backend hiển thị:
+#   pygame   - cửa sổ fullscreen của FaceRecognitionUI (mặc định)
+#   headless - không vẽ gì, chỉ ghi nhận sự kiện và điểm danh (kiosk không có màn hình)
+#   mjpeg    - frame đã vẽ kết quả được phát qua HTTP, chỉ mã hóa khi có client đang xem
+DISPLAY_BACKENDS = ("pygame", "headless", "mjpeg")
+
+
+def create_display(backend="pygame", **kwargs):
+    """
+    Tạo backend hiển thị; kwargs được truyền cho constructor của backend
+    (ví dụ width/height cho pygame, host/port/quality cho mjpeg)
+    """
+    if backend == "pygame":
+        return ui_module.FaceRecognitionUI(**kwargs)
+    if backend == "headless":
+        return HeadlessDisplay(**kwargs)
+    if backend == "mjpeg":
+        return MjpegDisplay(**kwargs)
+    raise ValueError(f"Unknown display backend '{backend}', expected one of {DISPLAY_BACKENDS}")
+
+
+class HeadlessDisplay:
+    """
+    Backend không có màn hình: giữ phần không liên quan tới vẽ của UI (cooldown sự kiện,
+    gửi điểm danh qua API, trạng thái điểm danh) với cùng interface như FaceRecognitionUI,
+    còn update_frame/draw_ui không làm gì nên không tốn CPU cho việc vẽ.
+
+    FaceRecognitionUI kế thừa class này và bổ sung cửa sổ pygame.
+    """
+
+    # Có nhận phím từ bàn phím hay không (pygame); backend headless thoát bằng Ctrl+C / SIGTERM
+    interactive = False
+    # Có cần frame hiển thị hay không; vòng lặp chính bỏ qua việc chuẩn bị/vẽ overlay khi False
+    renders_frames = False
+
+    def __init__(self, handle_signals=True):
+        """
+        Args:
+            handle_signals: Bắt SIGINT/SIGTERM để vòng lặp chính thoát và dọn dẹp bình thường
+        """
+        self.status_messages = {}
+        # Ring of recognition events, newest first; expired events are popped from the right
+        self.event_log = deque(maxlen=100)
+        self.recognition_results = []
+        # Tăng mỗi khi sự kiện hoặc trạng thái điểm danh thay đổi (UI chỉ vẽ lại panel khi đổi)
+        self._panel_version = 0
+
+        # For UI feedback on attendance status
+        # key: id_real, value: {"status": "success/error", "message": str, "timestamp": float}
+        self.attendance_status = {}
+        self.attendance_display_time = 60  # Show attendance status for 60 seconds
+        self._status_expiry = deque()  # (expires_at, id_real, timestamp) theo thứ tự ghi
+        self._status_lock = threading.Lock()
+
+        self.user_cooldowns = {}
+        self.display_time = 10  # seconds
+        self.cooldown_period = 10
+        self.current_time = time.time()
+
+        self.key_handlers = {}
+        self.quit_requested = False
+
+        # Text input state for adding faces (chỉ dùng khi interactive)
+        self.input_active = False
+        self.input_text = ""
+        self.input_purpose = None
+        self.captured_frame = None
+
+        self.face_recognition_system = None
+
+        if handle_signals and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self._on_signal)
+            signal.signal(signal.SIGTERM, self._on_signal)
+
+        # Initialize the API client with callbacks
+        self.api_client = AttendanceAPIClient()
+        self.api_client.register_callbacks(
+            success_callback=self.on_attendance_success,
+            error_callback=self.on_attendance_error
+        )
+        self.api_client.start()
+
+    def _on_signal(self, signum, frame):
+        print(f"🛑 Received signal {signum}, shutting down...")
+        self.quit_requested = True
+
+    def on_attendance_success(self, attendance_data, response_data):
+        """Callback for successful attendance recording"""
+        id_real = attendance_data['id_real']
+        name = attendance_data['name']
+
+        # Update status with success message
+        self._set_attendance_status(id_real, "success", f"✅ Recorded: {name}", name)
+
+    def on_attendance_error(self, attendance_data, error_msg):
+        """Callback for attendance recording error"""
+        id_real = attendance_data['id_real']
+        name = attendance_data['name']
+
+        # Update status with error message
+        self._set_attendance_status(id_real, "error", f"❌ Failed: {name}", name)
+
+    def _set_attendance_status(self, id_real, status, message, name):
+        """
+        Ghi trạng thái điểm danh và cập nhật luôn status_messages (gọi được từ thread của API client)
+        """
+        now = time.time()
+        with self._status_lock:
+            self.attendance_status[id_real] = {
+                "status": status,
+                "message": message,
+                "timestamp": now,
+                "name": name
+            }
+            self.status_messages[id_real] = {
+                "color": (0, 255, 0) if status == "success" else (255, 0, 0),
+                "message": message
+            }
+            # Thời điểm ghi tăng dần nên hàng đợi hết hạn luôn được sắp theo thời gian
+            self._status_expiry.append((now + self.attendance_display_time, id_real, now))
+            self._panel_version += 1
+
+    def draw_attendance_status(self):
+        """Expire attendance status notifications; chỉ xét các mục đã đến hạn ở đầu hàng đợi"""
+        now = time.time()
+        with self._status_lock:
+            while self._status_expiry and self._status_expiry[0][0] <= now:
+                _, id_real, timestamp = self._status_expiry.popleft()
+                status_data = self.attendance_status.get(id_real)
+                # Bỏ qua mục cũ nếu trạng thái đã được ghi lại sau đó
+                if status_data is not None and status_data["timestamp"] == timestamp:
+                    del self.attendance_status[id_real]
+                    del self.status_messages[id_real]
+                    self._panel_version += 1
+
+    def expire_events(self):
+        """Bỏ các sự kiện đã hiển thị quá display_time (luôn nằm ở cuối ring)"""
+        now = time.time()
+        while self.event_log and now - self.event_log[-1]["timestamp"] > self.display_time:
+            self.event_log.pop()
+            self._panel_version += 1
+
+    def register_key_handler(self, key, handler_function):
+        """Register a function to be called when a specific key is pressed"""
+        self.key_handlers[key] = handler_function
+
+    def handle_events(self):
+        """Không có bàn phím; quit_requested được đặt bởi signal handler"""
+        pass
+
+    def should_quit(self):
+        """Check if quit was requested"""
+        return self.quit_requested
+
+    def update_frame(self, frame):
+        """Không vẽ frame"""
+        pass
+
+    def update_recognition_results(self, results):
+        """Cập nhật kết quả nhận diện khuôn mặt"""
+        self.recognition_results = results
+
+    def draw_ui(self):
+        """Chỉ dọn sự kiện/trạng thái hết hạn, không vẽ gì"""
+        self.draw_attendance_status()
+        self.expire_events()
+
+    def add_event(self, name, is_real):
+        """Add recognition event with cooldown check and grid positioning"""
+        self.current_time = time.time()
+
+        if name in self.user_cooldowns:
+            last_time = self.user_cooldowns[name]
+            time_elapsed = self.current_time - last_time
+            if time_elapsed < self.cooldown_period:
+                return  # Cooldown active, skip
+
+        self.user_cooldowns[name] = self.current_time
+
+        label = name
+        status = "REAL" if is_real else "FAKE"
+        timestamp = self.current_time
+
+        # Add the event to the beginning of the log
+        # This maintains most recent first order
+        # deque(maxlen) drops the oldest event itself, so memory stays bounded
+        self.event_log.appendleft({"label": label, "status": status, "timestamp": timestamp})
+        self._panel_version += 1
+
+        # Process real faces for attendance
+        if is_real and "FAKE" not in name and name != "Unknown":
+            parts = name.split('_', 1)
+            # Check if first part is alphanumeric ID
+            if len(parts) > 1 and parts[0].isalnum():
+                id_real = parts[0]
+                full_name = parts[1]
+            else:
+                id_real = name
+                full_name = name
+
+            print(f"✅ Sending attendance for ID: {id_real}, Name: {full_name}")
+            self.api_client.mark_attendance(id_real, full_name)
+
+    def add_status_message(self, name, message):
+        """Add a status message to the UI"""
+        # Extract ID from name if possible
+        parts = name.split('_', 1)
+        if len(parts) > 1 and parts[0].isalnum():
+            id_real = parts[0]
+        else:
+            id_real = name
+
+        self._set_attendance_status(id_real, "success" if "success" in message.lower() else "error", message, name)
+
+    def close(self):
+        """Stop the API client"""
+        print("Closing UI and stopping API client...")
+        if self.api_client:
+            self.api_client.stop()
+
+
+def annotate_frame(image, results):
+    """Vẽ hộp, tên và điểm anti-spoofing lên ảnh BGR (sửa trực tiếp ảnh), trả về ảnh"""
+    for result in results:
+        x1, y1, x2, y2 = result["box"]
+        is_real = result.get("is_real", True)
+        color = (0, 255, 0) if is_real else (0, 0, 255)  # Green for real, Red for fake
+
+        cv2.rectangle(image, (x1, y1), (x2, y2), color, 2)
+        label = f"{result.get('name', 'Unknown')}: {result.get('confidence', 0.0):.2f}"
+        cv2.putText(image, label, (x1, max(15, y1 - 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+        if "spoof_score" in result:
+            score = result["spoof_score"]
+            spoof_label = f"Real: {score:.2f}" if is_real else f"FAKE: {score:.2f}"
+            cv2.putText(image, spoof_label, (x1, y2 + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+    return image
+
+
+class MjpegDisplay(HeadlessDisplay):
+    """
+    Backend preview qua HTTP: frame hiển thị được vẽ kết quả nhận diện bằng OpenCV và phát
+    dạng MJPEG. Khi không có ai xem, draw_ui không vẽ cũng không mã hóa gì.
+    """
+
+    def __init__(self, host="0.0.0.0", port=8080, quality=80, width=None, max_fps=None, handle_signals=True):
+        """
+        Args:
+            host, port: Địa chỉ của server MJPEG (xem tại http://host:port/video)
+            quality: Chất lượng JPEG (0-100)
+            width: Chiều rộng ảnh phát, None để giữ nguyên
+            max_fps: Số frame mã hóa tối đa mỗi giây, None để không giới hạn
+            handle_signals: Bắt SIGINT/SIGTERM để thoát vòng lặp chính
+        """
+        super().__init__(handle_signals=handle_signals)
+        self.streamer = mjpeg_module.MjpegStreamer(host=host, port=port, quality=quality,
+                                                   width=width, max_fps=max_fps).start()
+        self._frame = None
+        self._frame_dirty = False
+
+    @property
+    def renders_frames(self):
+        return self.streamer.has_clients()
+
+    def update_frame(self, frame):
+        """Chỉ giữ tham chiếu tới frame; frame không được sửa sau khi gửi"""
+        self._frame = frame
+        self._frame_dirty = True
+
+    def update_recognition_results(self, results):
+        self.recognition_results = results
+        self._frame_dirty = True
+
+    def draw_ui(self):
+        super().draw_ui()
+        if not self._frame_dirty or self._frame is None or not self.streamer.has_clients():
+            return
+        self._frame_dirty = False
+        self.streamer.publish(annotate_frame(self._frame.copy(), self.recognition_results))
+
+    def close(self):
+        self.streamer.report()
+        self.streamer.stop()
+        super().close()
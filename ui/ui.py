@@ -1,12 +1,29 @@
-import pygame
-import time
+import itertools
+from collections import OrderedDict
 import cv2
-from api.AttendanceAPIClient import AttendanceAPIClient
+import numpy as np
+from pipeline.enrollment import EnrollmentSession
+from ui.display import HeadlessDisplay
 import os  # Import os for path operations
+from utils.lazy_import import lazy_import
 
+pygame = lazy_import("pygame")
+
+# Bảng chuyển chữ tiếng Việt có dấu sang ASCII, dùng cho str.translate (mỗi ký tự tra O(1))
+_VIETNAMESE_CHARS = 'ÀÁÂÃÈÉÊÌÍÒÓÔÕÙÚÝàáâãèéêìíòóôõùúýĂăĐđĨĩŨũƠơƯưẠạẢảẤấẦầẨẩẪẫẬậẮắẰằẲẳẴẵẶặẸẹẺẻẼẽẾếỀềỂểỄễỆệỈỉỊịỌọỎỏỐốỒồỔổỖỗỘộỚớỜờỞởỠỡỢợỤụỦủỨứỪừỬửỮữỰự'
+_ASCII_CHARS = 'AAAAEEEIIOOOOUUYaaaaeeeiioooouuyAaDdIiUuOoUuAaAaAaAaAaAaAaAaAaAaAaAaEeEeEeEeEeEeEeEeIiIiOoOoOoOoOoOoOoOoOoOoOoOoUuUuUuUuUuUuUu'
+VIETNAMESE_TO_ASCII = str.maketrans(_VIETNAMESE_CHARS, _ASCII_CHARS)
+
+
+class FaceRecognitionUI(HeadlessDisplay):
+    """Backend hiển thị mặc định: cửa sổ pygame fullscreen với frame camera và panel sự kiện"""
+
+    interactive = True
+    renders_frames = True
 
-class FaceRecognitionUI:
     def __init__(self, width=1280, height=720, hide_cursor=True):
+        # Sự kiện, cooldown, trạng thái điểm danh và API client nằm ở HeadlessDisplay
+        super().__init__(handle_signals=False)
         pygame.init()
         # It's good practice to initialize the font module explicitly,
         # though pygame.init() usually does it.
@@ -57,97 +74,33 @@ class FaceRecognitionUI:
 
         self.bg_color = (30, 30, 30)
         self.frame_surface = None
-        self.event_log = []
-        self.recognition_results = []
-
-        # For UI feedback on attendance status
-        # key: id_real, value: {"status": "success/error", "message": str, "timestamp": float}
-        self.attendance_status = {}
+        # Buffer frame đã resize (BGR và RGB); frame_surface trỏ thẳng vào _display_rgb
+        self._display_bgr = None
+        self._display_rgb = None
+        self._display_size = (0, 0)
+        self._frame_pos = (10, 0)
+        # Dirty-rect rendering: chỉ vẽ lại vùng thay đổi
+        self._full_redraw = True
+        self._frame_dirty = False
+        # Panel chỉ vẽ lại khi version đổi (thêm/hết hạn sự kiện hoặc trạng thái điểm danh)
+        self._drawn_panel_version = -1
+        # LRU cache of rendered text: (text, font, color) -> Surface
+        self._text_cache = OrderedDict()
+        self.text_cache_size = 512
+        self._dim_surface = None  # nền mờ của hộp nhập liệu
 
         self.original_frame_width = 640
         self.original_frame_height = 480
 
-        self.user_cooldowns = {}
-        self.display_time = 10  # seconds
-        self.cooldown_period = 10
-        self.current_time = time.time()
-
-        self.key_handlers = {}
-        self.quit_requested = False
-
-        # Text input state for adding faces
-        self.input_active = False
-        self.input_text = ""
-        self.input_purpose = None  # What the input is for (e.g., "add_face")
-        self.captured_frame = None  # Store the frame where the face was detected
+        # Đăng ký khuôn mặt: frame đã chụp chỉ được xử lý một lần, kết quả dùng cho preview và lưu
+        self.enrollment = None
+        self._enrollment_preview = None  # (session, pygame surface) của ảnh xem trước
 
         #style input
         self.input_color_active = (75, 0, 130)
         self.input_color_inactive = (100, 100, 100)
         self.input_rect = pygame.Rect(self.width // 4, self.height // 2 - 20, self.width // 2, 40)
 
-        self.face_recognition_system = None
-        
-        # Initialize the API client with callbacks
-        self.api_client = AttendanceAPIClient()
-        self.api_client.register_callbacks(
-            success_callback=self.on_attendance_success,
-            error_callback=self.on_attendance_error
-        )
-        self.api_client.start()
-
-    def on_attendance_success(self, attendance_data, response_data):
-        """Callback for successful attendance recording"""
-        id_real = attendance_data['id_real']
-        name = attendance_data['name']
-
-        # Update status with success message
-        self.attendance_status[id_real] = {
-            "status": "success",
-            "message": f"✅ Recorded: {name}",
-            "timestamp": time.time(),
-            "name": name
-        }
-
-    def on_attendance_error(self, attendance_data, error_msg):
-        """Callback for attendance recording error"""
-        id_real = attendance_data['id_real']
-        name = attendance_data['name']
-
-        # Update status with error message
-        self.attendance_status[id_real] = {
-            "status": "error",
-            "message": f"❌ Failed: {name}",
-            "timestamp": time.time(),
-            "name": name
-        }
-    def draw_attendance_status(self):
-        """Draw attendance status notifications on the UI"""
-        now = time.time()
-        
-        # Remove old status messages (keep for longer - 60 seconds instead of 10)
-        expired_ids = []
-        attendance_display_time = 60  # Show attendance status for 60 seconds
-        
-        for id_real, status_data in self.attendance_status.items():
-            if now - status_data["timestamp"] > attendance_display_time:
-                expired_ids.append(id_real)
-        
-        for id_real in expired_ids:
-            del self.attendance_status[id_real]
-        
-        # Update the status_messages dictionary for draw_ui to use
-        self.status_messages = {}
-        for id_real, status_data in self.attendance_status.items():
-            message_prefix = "✅ Điểm danh: " if status_data["status"] == "success" else "❌ Lỗi: "
-            self.status_messages[id_real] = {
-                "color": (0, 255, 0) if status_data["status"] == "success" else (255, 0, 0),
-                "message": status_data["message"]
-            }
-    def register_key_handler(self, key, handler_function):
-        """Register a function to be called when a specific key is pressed"""
-        self.key_handlers[key] = handler_function
-
     def handle_events(self):
         """Handle all pygame events in one place"""
         for event in pygame.event.get():
@@ -167,96 +120,69 @@ class FaceRecognitionUI:
                         self.input_active = True
                         self.input_text = ""
                         self.input_purpose = "add_face"
+                        self.enrollment = None
+                        self._enrollment_preview = None
                         # The frame will be captured when the UI is updated next
                     elif event.key in self.key_handlers:
                         # Call the registered handler
                         self.key_handlers[event.key]()
 
-    def should_quit(self):
-        """Check if quit was requested"""
-        return self.quit_requested
-
     # Removed redundant handle_quit method - use should_quit() and handle_events()
 
     def update_frame(self, frame):
         """Cập nhật khung hình mới từ OpenCV (BGR numpy)"""
-        self.original_frame_height, self.original_frame_width = frame.shape[:2]
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        frame_surface = pygame.surfarray.make_surface(frame_rgb.swapaxes(0, 1))
+        frame_height, frame_width = frame.shape[:2]
+        if (frame_width, frame_height) != (self.original_frame_width, self.original_frame_height) or self._display_rgb is None:
+            self._allocate_frame_buffers(frame_width, frame_height)
+
+        # Resize một lần bằng OpenCV rồi đổi BGR->RGB thẳng vào buffer mà frame_surface đang trỏ tới:
+        # không tạo Surface mới, không swapaxes, không smoothscale mỗi frame
+        cv2.resize(frame, self._display_size, dst=self._display_bgr, interpolation=cv2.INTER_LINEAR)
+        cv2.cvtColor(self._display_bgr, cv2.COLOR_BGR2RGB, dst=self._display_rgb)
+        self._frame_dirty = True
+
+    def _allocate_frame_buffers(self, frame_width, frame_height):
+        """Tính kích thước hiển thị và tạo buffer/Surface dùng lại cho các frame cùng kích thước"""
+        self.original_frame_width, self.original_frame_height = frame_width, frame_height
         display_width = int(self.width * 0.65)
         # Maintain aspect ratio for scaling
-        original_aspect = self.original_frame_width / self.original_frame_height
+        original_aspect = frame_width / frame_height
         display_height = int(display_width / original_aspect)
         # Ensure scaled height doesn't exceed window height
         if display_height > self.height:
             display_height = self.height
             display_width = int(display_height * original_aspect)
 
-        # frame_surface = pygame.transform.scale(frame_surface, (display_width, display_height))
-        frame_surface = pygame.transform.smoothscale(frame_surface, (display_width, display_height))
-        self.frame_surface = frame_surface
+        self._display_size = (display_width, display_height)
+        self._display_bgr = np.empty((display_height, display_width, 3), dtype=np.uint8)
+        self._display_rgb = np.empty((display_height, display_width, 3), dtype=np.uint8)
+        # Surface dùng chung bộ nhớ với _display_rgb, ghi vào buffer là cập nhật Surface
+        self.frame_surface = pygame.image.frombuffer(self._display_rgb, self._display_size, "RGB")
+        # Calculate position to center the frame vertically
+        self._frame_pos = (10, (self.height - display_height) // 2)
+        self._full_redraw = True
 
     def update_recognition_results(self, results):
         """Cập nhật kết quả nhận diện khuôn mặt"""
         self.recognition_results = results
-
-    def add_event(self, name, is_real):
-        """Add recognition event with cooldown check and grid positioning"""
-        self.current_time = time.time()
-
-        if name in self.user_cooldowns:
-            last_time = self.user_cooldowns[name]
-            time_elapsed = self.current_time - last_time
-            if time_elapsed < self.cooldown_period:
-                return  # Cooldown active, skip
-        
-        self.user_cooldowns[name] = self.current_time
-
-        label = name
-        status = "REAL" if is_real else "FAKE"
-        timestamp = self.current_time
-        
-        # Add the event to the beginning of the log
-        # This maintains most recent first order
-        self.event_log.insert(0, {"label": label, "status": status, "timestamp": timestamp})
-        
-        # Limit event log size to prevent memory growth over time
-        max_events = 100  # Reasonable upper bound
-        if len(self.event_log) > max_events:
-            self.event_log = self.event_log[:max_events]
-        
-        # Process real faces for attendance
-        if is_real and "FAKE" not in name and name != "Unknown":
-            parts = name.split('_', 1)
-            # Check if first part is alphanumeric ID
-            if len(parts) > 1 and parts[0].isalnum():
-                id_real = parts[0]
-                full_name = parts[1]
-            else:
-                id_real = name
-                full_name = name
-                
-            print(f"✅ Sending attendance for ID: {id_real}, Name: {full_name}")
-            self.api_client.mark_attendance(id_real, full_name)
+        self._frame_dirty = True
 
     def draw_recognition_results(self):
-        """Vẽ kết quả nhận diện khuôn mặt trên Pygame Surface"""
+        """Vẽ kết quả nhận diện khuôn mặt lên cửa sổ, đè lên vùng frame (buffer frame giữ nguyên)"""
         if not self.frame_surface or not self.recognition_results:
             return
 
-        # Ensure frame surface exists before getting dimensions
-        if not self.frame_surface:
-            return
-        surface_width = self.frame_surface.get_width()
-        surface_height = self.frame_surface.get_height()
-
+        surface_width, surface_height = self._display_size
         # Check for division by zero if original dimensions are somehow zero
         if self.original_frame_width == 0 or self.original_frame_height == 0:
             return
 
         scale_x = surface_width / self.original_frame_width
         scale_y = surface_height / self.original_frame_height
+        offset_x, offset_y = self._frame_pos
 
+        # Không vẽ tràn ra ngoài vùng frame
+        self.window.set_clip(pygame.Rect(self._frame_pos, self._display_size))
         for result in self.recognition_results:
             x1, y1, x2, y2 = result["box"]
             # Ensure name is a string
@@ -273,80 +199,103 @@ class FaceRecognitionUI:
 
             color = (0, 255, 0) if is_real else (255, 0, 0)
 
-            pygame.draw.rect(self.frame_surface, color, (x1_scaled,
-                             y1_scaled, x2_scaled-x1_scaled, y2_scaled-y1_scaled), 2)
+            pygame.draw.rect(self.window, color, (offset_x + x1_scaled,
+                             offset_y + y1_scaled, x2_scaled-x1_scaled, y2_scaled-y1_scaled), 2)
 
             # Render text using the loaded (hopefully UTF-8) font
             # Python 3 strings are unicode, just pass them to render
             label = f"{name}: {confidence:.2f}"
-            text_surface = self.small_font.render(
-                label, True, color)  # Antialias = True
+            text_surface = self.render_text(
+                label, self.small_font, color)  # Antialias = True, cached
             # Position text above the box, ensure it stays within bounds
             # Small gap
             text_y = max(0, y1_scaled - text_surface.get_height() - 2)
-            self.frame_surface.blit(text_surface, (x1_scaled, text_y))
+            self.window.blit(text_surface, (offset_x + x1_scaled, offset_y + text_y))
 
             if "spoof_score" in result:
                 score = result["spoof_score"]
                 spoof_label = f"Real: {score:.2f}" if is_real else f"FAKE: {score:.2f}"
-                spoof_text = self.small_font.render(spoof_label, True, color)
+                spoof_text = self.render_text(spoof_label, self.small_font, color)
                 # Position below the box
                 text_y_spoof = min(
                     surface_height - spoof_text.get_height(), y2_scaled + 5)
-                self.frame_surface.blit(spoof_text, (x1_scaled, text_y_spoof))
+                self.window.blit(spoof_text, (offset_x + x1_scaled, offset_y + text_y_spoof))
+        self.window.set_clip(None)
 
     def draw_ui(self):
-        """Draw the complete user interface with grid layout for recognition events"""
+        """
+        Draw the complete user interface with grid layout for recognition events.
+        Chỉ vẽ lại và cập nhật những vùng thay đổi (frame khi có frame/kết quả mới, panel khi
+        danh sách sự kiện đổi); cả cửa sổ chỉ được vẽ lại khi cần (lần đầu, khi hộp nhập liệu mở/đóng)
+        """
         # Make sure attendance status is processed before drawing UI
         self.draw_attendance_status()  # <-- Add this line to update status_messages
-        
-        self.window.fill(self.bg_color)
-        
+
+        full_redraw = self._full_redraw or self.input_active
+        dirty_rects = []
+        if full_redraw:
+            self.window.fill(self.bg_color)
+
         # Draw camera frame on the left with proper alignment
-        if self.frame_surface:
-            # Draw recognition results on frame
-            self.draw_recognition_results() #Bỏ đi nếu cần
-            
-            # Calculate position to center the frame vertically
-            frame_width = self.frame_surface.get_width()
-            frame_height = self.frame_surface.get_height()
-            
-            x_pos = 10  # Left padding
-            y_pos = (self.height - frame_height) // 2  # Vertical centering
-            
-            # Draw background for the camera frame
-            pygame.draw.rect(self.window, (40, 40, 40), 
-                            (x_pos - 10, y_pos - 10, 
-                            frame_width + 20, frame_height + 20))
-            
+        if self.frame_surface and (full_redraw or self._frame_dirty):
+            x_pos, y_pos = self._frame_pos
+            frame_width, frame_height = self._display_size
+            if full_redraw:
+                # Draw background for the camera frame
+                pygame.draw.rect(self.window, (40, 40, 40),
+                                (x_pos - 10, y_pos - 10,
+                                frame_width + 20, frame_height + 20))
+
             # Display the frame at calculated position
             self.window.blit(self.frame_surface, (x_pos, y_pos))
-        
-        # Draw the right panel with grid layout
+            # Draw recognition results on frame
+            self.draw_recognition_results() #Bỏ đi nếu cần
+            dirty_rects.append(pygame.Rect(x_pos, y_pos, frame_width, frame_height))
+            self._frame_dirty = False
+
+        # Events are newest first, so expired ones are always at the right end of the ring
+        self.expire_events()
+        if full_redraw or self._panel_version != self._drawn_panel_version:
+            dirty_rects.append(self.draw_event_panel(self.event_log))
+            self._drawn_panel_version = self._panel_version
+
+        # Draw input interface if active
+        if self.input_active:
+            self.draw_text_input()
+            # Hộp nhập liệu phủ cả màn hình: vẽ lại toàn bộ sau khi đóng
+            self._full_redraw = True
+        elif full_redraw:
+            self._full_redraw = False
+
+        # Update the display
+        if full_redraw:
+            pygame.display.update()
+        elif dirty_rects:
+            pygame.display.update(dirty_rects)
+
+    def draw_event_panel(self, recent_events):
+        """Draw the right panel with grid layout, returns the panel rect"""
         panel_x = int(self.width * 0.68)
         panel_y = 20
         panel_width = self.width - panel_x - 20
         panel_height = self.height - 40
         
         # Draw background for the right panel
-        pygame.draw.rect(self.window, (50, 50, 50), (panel_x - 20, panel_y, panel_width, panel_height))
+        panel_rect = pygame.Rect(panel_x - 20, panel_y, panel_width, panel_height)
+        pygame.draw.rect(self.window, (50, 50, 50), panel_rect)
         
         # Draw panel title
         title = self.render_text("Recent Recognitions", self.font, (255, 255, 255))
         self.window.blit(title, (panel_x, panel_y + 5))
         
         # Grid configuration
-        now = time.time()
         grid_start_y = panel_y + 50
         cell_width = panel_width // 2 - 10
         cell_height = 75
         max_rows = (panel_height - 50) // (cell_height + 5)
         
-        # Filter event log to only show recent events
-        recent_events = [e for e in self.event_log if now - e["timestamp"] <= self.display_time]
-        
         # Arrange events in a grid (2 columns)
-        for i, entry in enumerate(recent_events[:max_rows * 2]):  # Limit to what can fit
+        for i, entry in enumerate(itertools.islice(recent_events, max_rows * 2)):  # Limit to what can fit
             row = i // 2
             col = i % 2
             
@@ -373,7 +322,7 @@ class FaceRecognitionUI:
             entry_id = parts[0] if len(parts) > 1 else entry["label"]
             
             # Draw attendance status if available
-            if hasattr(self, 'status_messages') and entry_id in self.status_messages:
+            if entry_id in self.status_messages:
                 status_info = self.status_messages[entry_id]
                 status_text = self.render_text(status_info["message"], self.small_font, text_color)
                 self.window.blit(status_text, (cell_x + 10, cell_y + cell_height - 25))
@@ -382,17 +331,28 @@ class FaceRecognitionUI:
                 if entry["status"] == "REAL" and entry["label"] != "Unknown":
                     pending_text = self.render_text("Đang xử lý...", self.small_font, (200, 200, 200))
                     self.window.blit(pending_text, (cell_x + 10, cell_y + cell_height - 25))
-        
-        # Draw input interface if active
-        if self.input_active:
-            self.draw_text_input()
-        
-        # Update the display
-        pygame.display.update()
+        return panel_rect
 
     # handle_quit is integrated into handle_events now
     def render_text(self, text, font, color):
-        """Safely render text with fallback for Vietnamese characters"""
+        """
+        Safely render text with fallback for Vietnamese characters.
+        Surface được cache theo (text, font, color) trong LRU có giới hạn, nên tên, trạng thái
+        và nhãn lặp lại giữa các frame chỉ được render một lần
+        """
+        key = (text, id(font), color)
+        surface = self._text_cache.get(key)
+        if surface is not None:
+            self._text_cache.move_to_end(key)
+            return surface
+
+        surface = self._render_text_uncached(text, font, color)
+        self._text_cache[key] = surface
+        if len(self._text_cache) > self.text_cache_size:
+            self._text_cache.popitem(last=False)
+        return surface
+
+    def _render_text_uncached(self, text, font, color):
         try:
             # Try to render with the current font
             return font.render(text, True, color)
@@ -409,22 +369,11 @@ class FaceRecognitionUI:
 
     def transliterate_vietnamese(self, text):
         """Convert Vietnamese characters to ASCII equivalents"""
-        vietnamese_chars = 'ÀÁÂÃÈÉÊÌÍÒÓÔÕÙÚÝàáâãèéêìíòóôõùúýĂăĐđĨĩŨũƠơƯưẠạẢảẤấẦầẨẩẪẫẬậẮắẰằẲẳẴẵẶặẸẹẺẻẼẽẾếỀềỂểỄễỆệỈỉỊịỌọỎỏỐốỒồỔổỖỗỘộỚớỜờỞởỠỡỢợỤụỦủỨứỪừỬửỮữỰự'
-        ascii_chars = 'AAAAEEEIIOOOOUUYaaaaeeeiioooouuyAaDdIiUuOoUuAaAaAaAaAaAaAaAaAaAaEeEeEeEeEeEeEeEeIiIiOoOoOoOoOoOoOoOoOoOoOoOoUuUuUuUuUuUuUu'
-        
-        result = ''
-        for char in text:
-            if char in vietnamese_chars:
-                idx = vietnamese_chars.index(char)
-                result += ascii_chars[idx]
-            else:
-                result += char
-        return result
+        return text.translate(VIETNAMESE_TO_ASCII)
+
     def close(self):
         """Close pygame and any resources"""
-        print("Closing UI and stopping API client...")
-        if self.api_client:
-            self.api_client.stop()
+        super().close()
         pygame.quit()
     
     def process_event(self, event):
@@ -443,10 +392,14 @@ class FaceRecognitionUI:
                     self.input_text = self.input_text[:-1]
                 elif event.key == pygame.K_ESCAPE:
                     # Cancel input
+                    if self.enrollment is not None:
+                        self.enrollment.cancel()
                     self.input_active = False
                     self.input_text = ""
                     self.input_purpose = None
                     self.captured_frame = None
+                    self.enrollment = None
+                    self._enrollment_preview = None
                 else:
                     # Add character to input text - proper UTF-8 handling
                     if event.unicode:  # This handles unicode properly
@@ -458,33 +411,43 @@ class FaceRecognitionUI:
         """Complete the face addition process"""
         name = self.input_text.strip()
         if name and self.captured_frame is not None:
-            if hasattr(self, 'face_recognition_system') and self.face_recognition_system:
+            enrollment = self._enrollment_session()
+            if enrollment is not None:
                 print(f"Adding face: {name}")
-                success = self.face_recognition_system.add_face_to_database(self.captured_frame, name)
-                if success:
-                    self.add_status_message(name, "Face added successfully!")
-                else:
-                    self.add_status_message(name, "Failed to add face")
+                # Lưu trong nền bằng embedding đã tính cho preview, UI không bị chặn khi gọi API
+                enrollment.commit(name, callback=self._on_face_saved)
             else:
                 print("Error: No face_recognition_system reference available")
                 self.add_status_message(name, "System error: Cannot add face")
         self.captured_frame = None
+        self.enrollment = None
+        self._enrollment_preview = None
 
-    def add_status_message(self, name, message):
-        """Add a status message to the UI"""
-        # Extract ID from name if possible
-        parts = name.split('_', 1)
-        if len(parts) > 1 and parts[0].isalnum():
-            id_real = parts[0]
+    def _on_face_saved(self, name, success):
+        if success:
+            self.add_status_message(name, "Face added successfully!")
         else:
-            id_real = name
-            
-        self.attendance_status[id_real] = {
-            "status": "success" if "success" in message.lower() else "error",
-            "message": message,
-            "timestamp": time.time(),
-            "name": name
-        }
+            self.add_status_message(name, "Failed to add face")
+
+    def _enrollment_session(self):
+        """EnrollmentSession của frame đã chụp, tạo (và bắt đầu xử lý) ở lần gọi đầu tiên"""
+        if self.enrollment is None and self.captured_frame is not None:
+            system = self.face_recognition_system
+            if system is None or not system.is_ready():
+                return None
+            self.enrollment = EnrollmentSession(system, self.captured_frame).start()
+        return self.enrollment
+
+    def _enrollment_preview_surface(self, enrollment):
+        """Ảnh 120x120 của khuôn mặt sẽ được đăng ký, chỉ tạo một lần cho mỗi session"""
+        if enrollment.state != EnrollmentSession.READY:
+            return None
+        if self._enrollment_preview is None or self._enrollment_preview[0] is not enrollment:
+            x1, y1, x2, y2 = enrollment.result["box"]
+            face_img = cv2.resize(enrollment.frame[y1:y2, x1:x2], (120, 120))
+            face_rgb = cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB)
+            self._enrollment_preview = (enrollment, pygame.surfarray.make_surface(face_rgb.swapaxes(0, 1)))
+        return self._enrollment_preview[1]
 
     def start_face_input(self, frame):
         """Initialize the text input for adding a face"""
@@ -492,15 +455,18 @@ class FaceRecognitionUI:
         self.input_text = ""
         self.input_purpose = "add_face"
         self.captured_frame = frame.copy()
+        self.enrollment = None
+        self._enrollment_preview = None
     def draw_text_input(self):
         """Draw the text input interface"""
         if not self.input_active:
             return
             
         # Dim background
-        dim_surface = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
-        dim_surface.fill((0, 0, 0, 180))  # Semi-transparent black
-        self.window.blit(dim_surface, (0, 0))
+        if self._dim_surface is None:
+            self._dim_surface = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
+            self._dim_surface.fill((0, 0, 0, 180))  # Semi-transparent black
+        self.window.blit(self._dim_surface, (0, 0))
         
         # Draw input box
         pygame.draw.rect(self.window, self.input_color_active if self.input_active else self.input_color_inactive, self.input_rect, 2)
@@ -511,22 +477,21 @@ class FaceRecognitionUI:
         
         # Draw purpose text
         if self.input_purpose == "add_face":
-            purpose_text = self.font.render("Enter name for the face (format: ID_Name):", True, (255, 255, 255))
+            purpose_text = self.render_text("Enter name for the face (format: ID_Name):", self.font, (255, 255, 255))
             self.window.blit(purpose_text, (self.input_rect.x, self.input_rect.y - 40))
             
             # Draw instruction text
-            instruction_text = self.font.render("Press ENTER to confirm, ESC to cancel", True, (200, 200, 200))
+            instruction_text = self.render_text("Press ENTER to confirm, ESC to cancel", self.font, (200, 200, 200))
             self.window.blit(instruction_text, (self.input_rect.x, self.input_rect.y + 50))
             
             # Show preview of captured face if available
-            if self.captured_frame is not None and hasattr(self, 'face_recognition_system'):
-                # Process the frame to show the detected face
-                results = self.face_recognition_system.process_image(self.captured_frame)
-                if results:
-                    # Extract and display the face
-                    x1, y1, x2, y2 = results[0]["box"]
-                    face_img = self.captured_frame[y1:y2, x1:x2]
-                    face_img = cv2.resize(face_img, (120, 120))
-                    face_rgb = cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB)
-                    face_surface = pygame.surfarray.make_surface(face_rgb.swapaxes(0, 1))
+            if self.captured_frame is not None:
+                # Frame đã chụp được xử lý một lần trong nền; mỗi lần vẽ chỉ đọc kết quả đã cache
+                enrollment = self._enrollment_session()
+                status = enrollment.status_text() if enrollment is not None else "Loading models..."
+                status_text = self.render_text(status, self.small_font, (200, 200, 200))
+                self.window.blit(status_text, (self.input_rect.x, self.input_rect.y + 80))
+
+                face_surface = self._enrollment_preview_surface(enrollment) if enrollment is not None else None
+                if face_surface is not None:
                     self.window.blit(face_surface, (self.input_rect.x - 140, self.input_rect.y - 40))
\ No newline at end of file
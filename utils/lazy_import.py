@@ -0,0 +1,73 @@
+import importlib
+import importlib.util
+import threading
+import time
+
+# Registry các module nặng được import trễ: tên module -> LazyModule
+_registry = {}
+_lock = threading.RLock()
+
+
+class LazyModule:
+    """
+    Đại diện cho một module chỉ được import thật sự ở lần truy cập thuộc tính đầu tiên,
+    ví dụ `pygame = lazy_import("pygame")` rồi `pygame.init()` mới nạp pygame.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._import_time = None
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    @property
+    def import_time(self):
+        """Số giây tốn cho lần import thật sự, None nếu chưa import"""
+        return self._import_time
+
+    def _load(self):
+        if self._module is None:
+            with _lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    self._import_time = time.perf_counter() - start
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        # Chỉ được gọi với thuộc tính không có sẵn trên LazyModule, tức là thuộc tính của module thật
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    """Trả về LazyModule dùng chung cho `name`; module chưa được import cho tới khi dùng"""
+    with _lock:
+        module = _registry.get(name)
+        if module is None:
+            module = _registry[name] = LazyModule(name)
+        return module
+
+
+def is_available(name):
+    """Kiểm tra module có cài đặt không mà không import nó"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def import_stats():
+    """Thời gian import của các module trong registry: {name: seconds hoặc None nếu chưa dùng}"""
+    with _lock:
+        return {name: module.import_time for name, module in _registry.items()}
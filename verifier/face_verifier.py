@@ -31,4 +31,72 @@ class FaceVerifier:
         if best_score > threshold:
             return (best_name, best_score)
         else:
-            return ("Unknown", best_score)
\ No newline at end of file
+            return ("Unknown", best_score)
+
+class MatrixFaceVerifier:
+    """
+    Cùng kết quả với FaceVerifier nhưng database được xếp thành ma trận (N, D) các embedding đã
+    chuẩn hóa L2: mỗi truy vấn là một phép nhân ma trận-vector thay vì vòng lặp Python qua từng
+    mục, và find_best_matches xử lý nhiều truy vấn trong một phép nhân ma trận.
+
+    Ma trận được dựng lại khi số mục trong db thay đổi; sau khi sửa embedding của một tên đã có
+    thì gọi refresh().
+    """
+
+    def __init__(self, db_embeddings, dtype=np.float32):
+        """
+        Args:
+            db_embeddings: Dict tên -> embedding hoặc {"embedding": ...} (định dạng của FaceDatabaseManager.face_db)
+            dtype: Kiểu dữ liệu của ma trận (float32 dùng một nửa bộ nhớ so với float64)
+        """
+        self.db = db_embeddings
+        self.dtype = dtype
+        self.names = []
+        self.matrix = None
+        self._size = -1
+        self.refresh()
+
+    def refresh(self):
+        """Dựng lại ma trận từ db"""
+        self.names = list(self.db)
+        if not self.names:
+            self.matrix = None
+        else:
+            vectors = [face_data["embedding"] if isinstance(face_data, dict) and "embedding" in face_data
+                       else face_data for face_data in self.db.values()]
+            matrix = np.asarray(vectors, dtype=self.dtype)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix /= norms + 1e-10
+            self.matrix = matrix
+        self._size = len(self.db)
+
+    @property
+    def memory_bytes(self):
+        """Bộ nhớ của ma trận embedding"""
+        return self.matrix.nbytes if self.matrix is not None else 0
+
+    def find_best_match(self, embedding, threshold=0.5):
+        return self.find_best_matches(np.asarray(embedding)[np.newaxis], threshold)[0]
+
+    def find_best_matches(self, embeddings, threshold=0.5):
+        """
+        Args:
+            embeddings: Mảng (Q, D) các embedding cần tìm
+            threshold: Ngưỡng cosine similarity
+
+        Returns:
+            List (name, score) cho từng embedding, "Unknown" khi điểm cao nhất không vượt threshold
+        """
+        if len(self.db) != self._size:
+            self.refresh()
+        if self.matrix is None:
+            return [("Unknown", -1) for _ in range(len(embeddings))]
+
+        queries = np.asarray(embeddings, dtype=self.dtype)
+        scores = queries @ self.matrix.T
+        scores /= np.linalg.norm(queries, axis=1, keepdims=True) + 1e-10
+        best = np.argmax(scores, axis=1)
+        best_scores = scores[np.arange(len(queries)), best]
+
+        return [(self.names[index] if score > threshold else "Unknown", float(score))
+                for index, score in zip(best, best_scores)]